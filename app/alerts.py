@@ -0,0 +1,52 @@
+import threading
+import time
+from collections import deque
+
+from app.config import ALERT_COOLDOWN, ALERT_MAX_PER_HOUR, ALERT_HISTORY
+from app.metrics import METRICS
+
+class AlertPolicy:
+    """
+    Edge-triggered alert gate. An item alerts when it goes from sold out (or
+    unseen) to in stock, at most once per `cooldown` seconds per item, and
+    the whole monitor sends at most `max_per_hour` alerts in any rolling hour.
+    """
+
+    def __init__(self, cooldown=ALERT_COOLDOWN, max_per_hour=ALERT_MAX_PER_HOUR):
+        self.cooldown = cooldown
+        self.max_per_hour = max_per_hour
+        self.suppressed = 0
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def check(self, record, was_sold_out, sold_out, now=None):
+        """
+        Returns (should_alert, reason). record is the item's seen entry (or None
+        for a new item); was_sold_out is its state before this check.
+        """
+        now = now or time.time()
+        if sold_out:
+            return False, "sold out"
+        if was_sold_out is False:
+            return False, "still in stock"
+
+        alerts = (record or {}).get("alerts") or []
+        with self._lock:
+            if alerts and now - alerts[-1] < self.cooldown:
+                self.suppressed += 1
+                METRICS.inc("alerts_suppressed", reason="cooldown")
+                return False, "cooldown"
+            while self._recent and now - self._recent[0] >= 3600:
+                self._recent.popleft()
+            if self.max_per_hour and len(self._recent) >= self.max_per_hour:
+                self.suppressed += 1
+                METRICS.inc("alerts_suppressed", reason="hourly cap")
+                return False, "hourly alert cap"
+            self._recent.append(now)
+        return True, "restock" if record else "new"
+
+def record_alert(record, now=None):
+    """Returns the item's alert history with this alert (epoch seconds) appended."""
+    alerts = list((record or {}).get("alerts") or [])
+    alerts.append(int(now or time.time()))
+    return alerts[-ALERT_HISTORY:]
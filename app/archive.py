@@ -0,0 +1,200 @@
+import glob
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+
+from app.config import (
+    ARCHIVE_DIR, ARCHIVE_MAX_MB, ARCHIVE_SEGMENT_MB, ARCHIVE_FLUSH_INTERVAL, ARCHIVE_QUEUE_MB,
+    ARCHIVE_COMPRESS_LEVEL
+)
+from app.fingerprint import FingerprintCache, fingerprint
+from app.metrics import METRICS
+
+SEGMENT_GLOB = "snapshots-*.jsonl.gz"
+
+
+def segment_paths(path=ARCHIVE_DIR):
+    """The archive's segment files, oldest first. `path` may also be a single segment."""
+    if os.path.isfile(path):
+        return [path]
+    return sorted(glob.glob(os.path.join(path, SEGMENT_GLOB)))
+
+
+def snapshot_size(page=None, cards=None):
+    """Roughly what a queued snapshot holds in memory: its page text or card fields."""
+    if page is not None:
+        return len(page)
+    return sum(len(field or "") for card in cards or () for field in card if isinstance(field, str))
+
+
+class SnapshotArchive:
+    """
+    Keeps a copy of what the detectors saw: each product page or listing
+    card set is written with the verdict it got to gzipped JSON-lines
+    segments, from a background thread so a check never waits on disk or
+    compression. A snapshot identical to the last one of the same URL (same
+    content, same verdict) is skipped. Once the segments add up to more than
+    `max_mb`, the oldest are deleted. Snapshots waiting for the writer are
+    capped at `queue_mb` of page text; past that, new ones are dropped.
+
+    Records look like {"t", "kind", "url", "source", "verdict", ...} with
+    "page" (HTML or catalog JSON) or "cards" (rows of Card fields); see
+    app.replay for how each kind is re-evaluated.
+    """
+
+    def __init__(self, path=ARCHIVE_DIR, log_callback=None, max_mb=ARCHIVE_MAX_MB, segment_mb=ARCHIVE_SEGMENT_MB,
+                 flush_interval=ARCHIVE_FLUSH_INTERVAL, queue_mb=ARCHIVE_QUEUE_MB):
+        self.path = path
+        self.log_callback = log_callback
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.segment_bytes = int(segment_mb * 1024 * 1024)
+        self.flush_interval = flush_interval
+        self.queue_bytes = int(queue_mb * 1024 * 1024)
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue()
+        self._queued_bytes = 0
+        self._queued_lock = threading.Lock()
+        self._last = FingerprintCache()
+        self._raw = None
+        self._gz = None
+        self._segments = 0
+        self._thread = threading.Thread(target=self._run, name="snapshot-archive", daemon=True)
+
+    def start(self):
+        os.makedirs(self.path, exist_ok=True)
+        self._prune()
+        self._thread.start()
+        return self
+
+    def record(self, kind, url, verdict, page=None, cards=None, source="http", evidence=None):
+        """Queues one snapshot and returns immediately; dropped (and counted) if the writer is behind."""
+        content = fingerprint(page) if page is not None else fingerprint(*(fingerprint(*card) for card in cards or ()))
+        snap_fp = fingerprint(content, verdict)
+        if self._last.get((kind, url))[0] == snap_fp:
+            METRICS.inc("snapshots", kind=kind, result="unchanged")
+            return
+        self._last.put((kind, url), snap_fp)
+
+        snapshot = {"t": round(time.time(), 3), "kind": kind, "url": url, "source": source, "verdict": verdict}
+        if page is not None:
+            snapshot["page"] = page
+        if cards is not None:
+            snapshot["cards"] = [list(card) for card in cards]
+        if evidence:
+            snapshot["evidence"] = evidence
+        size = snapshot_size(page, cards)
+        with self._queued_lock:
+            # A page larger than the cap still goes through when nothing else is waiting
+            if self._queued_bytes and self._queued_bytes + size > self.queue_bytes:
+                self.dropped += 1
+                METRICS.inc("snapshots", kind=kind, result="dropped")
+                return
+            self._queued_bytes += size
+        self._queue.put((snapshot, size))
+
+    def close(self, timeout=10):
+        """Writes whatever is still queued and closes the current segment."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _log(self, message, color=None):
+        if self.log_callback:
+            self.log_callback(message, color)
+
+    def _open_segment(self):
+        self._segments += 1
+        name = f"snapshots-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._segments:04d}.jsonl.gz"
+        self._raw = open(os.path.join(self.path, name), "ab")
+        self._gz = gzip.GzipFile(fileobj=self._raw, mode="ab", compresslevel=ARCHIVE_COMPRESS_LEVEL)
+
+    def _close_segment(self):
+        if self._gz is not None:
+            self._gz.close()
+            self._raw.close()
+            self._gz = self._raw = None
+
+    def _prune(self):
+        """Deletes the oldest segments (of any process) until the archive fits in max_bytes."""
+        segments = [(p, os.path.getsize(p)) for p in segment_paths(self.path)]
+        total = sum(size for _, size in segments)
+        current = self._raw.name if self._raw is not None else None
+        for path, size in segments:
+            if total <= self.max_bytes:
+                break
+            if path == current:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def _write(self, snapshot):
+        if self._gz is None:
+            self._open_segment()
+        line = json.dumps(snapshot, separators=(",", ":"), ensure_ascii=False).encode("utf-8", "surrogatepass") + b"\n"
+        self._gz.write(line)
+        self.written += 1
+        METRICS.inc("snapshots", kind=snapshot["kind"], result="written")
+        if self._raw.tell() >= self.segment_bytes:
+            self._close_segment()
+            self._prune()
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = (False, 0)
+            if item is None:
+                break
+            snapshot, size = item
+            if size:
+                with self._queued_lock:
+                    self._queued_bytes -= size
+            try:
+                if snapshot:
+                    self._write(snapshot)
+                if self._gz is not None and time.monotonic() - last_flush >= self.flush_interval:
+                    # A sync flush makes everything written so far readable, even if the process dies
+                    self._gz.flush()
+                    last_flush = time.monotonic()
+            except OSError as e:
+                METRICS.inc("errors", stage="archive")
+                self._log(f"Snapshot archive write failed: {e}", "red")
+                self._close_segment()
+        try:
+            self._close_segment()
+        except OSError:
+            pass
+
+
+def read_snapshots(path=ARCHIVE_DIR, kinds=None, url=None, since=None):
+    """
+    Yields archived snapshots oldest first, optionally only the given kinds,
+    URLs containing `url` and snapshots taken at or after epoch `since`.
+    A segment cut short by a crash yields what it holds up to the cut.
+    """
+    for segment in segment_paths(path):
+        try:
+            with gzip.open(segment, "rb") as f:
+                for line in f:
+                    try:
+                        snapshot = json.loads(line)
+                    except ValueError:
+                        continue
+                    if kinds and snapshot.get("kind") not in kinds:
+                        continue
+                    if url and url not in snapshot.get("url", ""):
+                        continue
+                    if since and snapshot.get("t", 0) < since:
+                        continue
+                    yield snapshot
+        except (EOFError, OSError):
+            continue
@@ -0,0 +1,106 @@
+import json
+from collections import namedtuple
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+
+from app.dom import Card, card_sold_out
+from app.fingerprint import FingerprintCache, fingerprint
+from app.metrics import METRICS
+
+# One listing entry from the store's catalog JSON
+CatalogItem = namedtuple("CatalogItem", ["item_id", "title", "price", "in_stock", "url"])
+
+CATALOG_HEADERS = {
+    "Accept": "application/json, text/plain, */*",
+    "X-Requested-With": "XMLHttpRequest",
+}
+
+
+class CatalogUnavailable(Exception):
+    """The listing didn't come back as catalog JSON (captcha, login wall, markup page...)."""
+
+
+def catalog_url(listing_url):
+    """The ajax=true form of a store listing URL, which returns the item list as JSON."""
+    parts = urlsplit(listing_url)
+    query = dict(parse_qsl(parts.query, keep_blank_values=True))
+    query["ajax"] = "true"
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def parse_catalog(payload, base_url):
+    """
+    Reads the listItems of a catalog response into CatalogItems.
+    Raises CatalogUnavailable when the payload isn't a catalog listing.
+    """
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        raise CatalogUnavailable("response is not JSON")
+    mods = data.get("mods") if isinstance(data, dict) else None
+    if not isinstance(mods, dict) or "listItems" not in mods:
+        # Anti-bot responses carry a redirect instead of the listing
+        reason = "captcha" if isinstance(data, dict) and data.get("rgv587_flag") else "no listItems"
+        raise CatalogUnavailable(reason)
+
+    items = []
+    for entry in mods["listItems"] or ():
+        url = entry.get("productUrl") or entry.get("itemUrl") or ""
+        item_id = str(entry.get("itemId") or entry.get("nid") or "")
+        if not url or not item_id:
+            continue
+        in_stock = entry.get("inStock")
+        items.append(CatalogItem(
+            item_id,
+            " ".join((entry.get("name") or "").split()),
+            entry.get("priceShow") or entry.get("price") or "",
+            True if in_stock is None else bool(in_stock),
+            urljoin(base_url, url),
+        ))
+    return items
+
+
+def catalog_card(item):
+    """Presents a CatalogItem as a listing Card for the keyword and seen logic."""
+    return Card(f"{item.title}\n{item.price}", item.title, item.url, item.item_id, not item.in_stock)
+
+
+class CatalogSource:
+    """
+    Store listing pages fetched as catalog JSON over the pooled HTTP client,
+    instead of rendering the shop in Chrome. Pages are revalidated with
+    conditional requests and a 304 or identical body reuses the parsed cards.
+    fetch_cards(listing_url) plugs into StoreCrawler.crawl(). Parsed pages
+    are copied to the SnapshotArchive, if one is given.
+    """
+
+    def __init__(self, http_client, cache=None, archive=None):
+        self.http_client = http_client
+        self.cache = cache if cache is not None else FingerprintCache()
+        self.archive = archive
+
+    def fetch_cards(self, listing_url):
+        url = catalog_url(listing_url)
+        with METRICS.span("http_fetch"):
+            resp = self.http_client.get(url, headers=CATALOG_HEADERS, conditional=True)
+        last_fp, last_cards = self.cache.get(url)
+        if resp.not_modified:
+            if last_fp is not None:
+                METRICS.inc("unchanged", level="not_modified")
+                return last_cards
+            self.http_client.forget(url)
+            with METRICS.span("http_fetch"):
+                resp = self.http_client.get(url, headers=CATALOG_HEADERS, conditional=True)
+        if resp.status != 200:
+            raise CatalogUnavailable(f"HTTP {resp.status}")
+
+        page_fp = fingerprint(resp.body)
+        if page_fp == last_fp:
+            return last_cards
+        text = resp.text
+        with METRICS.span("card_extraction"):
+            cards = [catalog_card(item) for item in parse_catalog(text, url)]
+        if self.archive is not None:
+            self.archive.record("catalog", url, [card_sold_out(card) for card in cards], page=text)
+        self.cache.put(url, page_fp, cards)
+        return cards
+
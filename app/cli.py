@@ -0,0 +1,303 @@
+import time
+
+STARTED = time.perf_counter()
+
+import argparse
+import os
+import signal
+import sys
+import threading
+
+# Heavy modules that should stay unloaded until a job actually needs them
+HEAVY_MODULES = ("selenium", "webdriver_manager", "tkinter", "dotenv")
+
+COLORS = {
+    "red": "RED", "green": "GREEN", "blue": "BLUE",
+    "yellow": "YELLOW", "cyan": "CYAN",
+}
+
+def make_console_logger(use_color=True, to_file=True):
+    """Log callback for headless runs: colored console output plus (unless to_file=False) the rotating file log."""
+    from app.logs import get_file_logger, log_level_for
+    file_log = get_file_logger() if to_file else None
+    lock = threading.Lock()
+
+    fore = reset = None
+    if use_color and sys.stdout.isatty():
+        try:
+            from colorama import Fore, Style, just_fix_windows_console
+            just_fix_windows_console()
+            fore, reset = Fore, Style.RESET_ALL
+        except ImportError:
+            pass
+
+    def log(message, color=None):
+        text = (message or "").strip("\n")
+        if text == "\a":
+            return
+        if file_log is not None:
+            file_log.log(log_level_for(color), text)
+        stamp = time.strftime("%H:%M:%S")
+        line = f"[{stamp}] {text}"
+        if fore and color in COLORS:
+            line = getattr(fore, COLORS[color]) + line + reset
+        with lock:
+            print(line, flush=True)
+
+    return log
+
+def load_job_file(path):
+    try:
+        import tomllib
+    except ImportError:  # Python < 3.11
+        import tomli as tomllib
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+def email_config_from(section):
+    """Builds the email_config dict; missing values fall back to the same env vars/.env as the GUI."""
+    section = section or {}
+    if not all(k in section for k in ("sender", "password", "recipients")):
+        try:
+            from dotenv import load_dotenv
+            load_dotenv()
+        except ImportError:
+            pass
+    recipients = section.get("recipients")
+    if recipients is None:
+        recipients = [r.strip() for r in os.getenv("RECIPIENTS", "").split(",") if r.strip()]
+    password = section.get("password")
+    if password is None:
+        password = os.getenv(section.get("password_env", "SENDER_PASSWORD"), "")
+
+    config = {
+        "SENDER_EMAIL": section.get("sender", os.getenv("SENDER_EMAIL", "")),
+        "SENDER_PASSWORD": password,
+        "RECIPIENT_EMAILS": list(recipients),
+    }
+    if "smtp_server" in section:
+        config["SMTP_SERVER"] = section["smtp_server"]
+    if "smtp_port" in section:
+        config["SMTP_PORT"] = section["smtp_port"]
+    return config
+
+def jobs_from(config):
+    from app.jobs import MonitorJob
+    jobs = config.get("jobs") or []
+    if not jobs:
+        raise ValueError("no [[jobs]] defined")
+    built = []
+    for i, job in enumerate(jobs):
+        built.append(MonitorJob(
+            job.get("name") or f"job{i + 1}", job.get("mode", "store"),
+            target_urls=job.get("targets", []), store_url=job.get("store_url", ""),
+            keywords=job.get("keywords", []), recipients=job.get("recipients"),
+            interval=job.get("interval"),
+        ))
+    names = [job.name for job in built]
+    if len(set(names)) != len(names):
+        raise ValueError("job names must be unique")
+    return built
+
+def archive_dir_from(option, config_value=None):
+    """--archive [DIR] or jobs.toml's `archive` (true or a directory); otherwise ARCHIVE_ENABLED decides."""
+    from app.config import ARCHIVE_ENABLED, ARCHIVE_DIR
+    value = option if option is not None else config_value
+    if value is None:
+        value = ARCHIVE_ENABLED
+    return ARCHIVE_DIR if value is True else value or None
+
+def cmd_run(args):
+    t_parsed = time.perf_counter()
+    log = make_console_logger(use_color=not args.no_color)
+
+    try:
+        config = load_job_file(args.config)
+        email_config = email_config_from(config.get("email"))
+        jobs = jobs_from(config)
+    except Exception as e:
+        log(f"Invalid config {args.config}: {e}", "red")
+        return 2
+
+    from app.config import METRICS_PORT, METRICS_LOG_INTERVAL
+    from app.jobs import JobManager
+    t_ready = time.perf_counter()
+    workers = args.workers if args.workers is not None else config.get("workers", 0)
+    archive_dir = archive_dir_from(args.archive, config.get("archive"))
+
+    if args.timing:
+        loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+        log(f"Startup: cli import {(t_parsed - STARTED) * 1000:.1f} ms, "
+            f"config+monitor import {(t_ready - t_parsed) * 1000:.1f} ms, "
+            f"total {(t_ready - STARTED) * 1000:.1f} ms; heavy modules loaded: {', '.join(loaded) or 'none'}", "blue")
+
+    stop_event = threading.Event()
+
+    def request_stop(signum, frame):
+        log(f"Received signal {signum}, stopping...", "yellow")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    metrics_port = args.metrics_port if args.metrics_port is not None else config.get("metrics_port", METRICS_PORT)
+    metrics_log_interval = (args.metrics_log_interval if args.metrics_log_interval is not None
+                            else config.get("metrics_log_interval", METRICS_LOG_INTERVAL))
+    local_workers = None
+    if args.listen:
+        from app.cluster import cluster_key
+        from app.config import CLUSTER_KEY_ENV
+        if cluster_key() is None:
+            log(f"--listen needs a cluster key shared with the workers: set {CLUSTER_KEY_ENV}.", "red")
+            return 2
+    try:
+        if workers or args.listen:
+            from app.cluster import Coordinator, LocalWorkers, cluster_key, parse_address
+            from app.config import CLUSTER_HOST, CLUSTER_PORT
+            address = parse_address(args.listen) if args.listen else (CLUSTER_HOST, config.get("cluster_port", CLUSTER_PORT))
+            manager = Coordinator(jobs, email_config, log, address=address, authkey=cluster_key(),
+                                  metrics_port=metrics_port, metrics_log_interval=metrics_log_interval).start()
+            if workers:
+                local_workers = LocalWorkers(manager, workers, log, archive_dir=archive_dir).start()
+        else:
+            manager = JobManager(email_config, log, headless=config.get("headless", True),
+                                 metrics_port=metrics_port, metrics_log_interval=metrics_log_interval,
+                                 archive_dir=archive_dir)
+            manager.sync(jobs)
+    except Exception as e:
+        log(f"Failed to start monitor: {e}", "red")
+        return 1
+
+    # Edits to the config file add, remove or restart jobs without touching the others
+    config_mtime = os.path.getmtime(args.config)
+    while not stop_event.is_set():
+        stop_event.wait(1.0)
+        if local_workers is not None:
+            local_workers.check()
+        try:
+            mtime = os.path.getmtime(args.config)
+            if mtime != config_mtime:
+                config_mtime = mtime
+                jobs = jobs_from(load_job_file(args.config))
+                if local_workers is not None or args.listen:
+                    manager.set_jobs(jobs)
+                else:
+                    manager.sync(jobs)
+                log(f"Reloaded {args.config}: running {', '.join(job.name for job in jobs)}", "blue")
+        except Exception as e:
+            log(f"Ignoring config change: {e}", "red")
+
+    if local_workers is not None:
+        local_workers.stop()
+    manager.close()
+
+    from app.logs import stop_file_logger
+    stop_file_logger()
+    return 0
+
+def cmd_worker(args):
+    log = make_console_logger(use_color=not args.no_color, to_file=not args.no_file_log)
+    from app.cluster import run_worker, cluster_key, parse_address
+    from app.config import CLUSTER_KEY_ENV
+    authkey = cluster_key()
+    if authkey is None:
+        log(f"Set {CLUSTER_KEY_ENV} to the coordinator's cluster key.", "red")
+        return 2
+
+    stop_event = threading.Event()
+
+    def request_stop(signum, frame):
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    run_worker(parse_address(args.connect), authkey, stop_event, worker_id=args.id, log_callback=log,
+               pool_size=args.browsers, metrics_port=args.metrics_port or 0, archive_dir=archive_dir_from(args.archive))
+
+    from app.logs import stop_file_logger
+    stop_file_logger()
+    return 0
+
+def verdict_text(kind, value):
+    if not isinstance(value, bool) and value is not None:
+        return str(value)
+    if kind == "target":
+        return {True: "in stock", False: "sold out"}.get(value, "unknown")
+    return "sold out" if value else "in stock"
+
+def cmd_replay(args):
+    log = make_console_logger(use_color=not args.no_color, to_file=False)
+    from app.archive import read_snapshots
+    from app.config import ARCHIVE_DIR
+    from app.matcher import KeywordMatcher
+    from app.replay import replay
+
+    kinds = {"target": ("target",), "store": ("catalog", "cards")}.get(args.kind)
+    try:
+        since = time.mktime(time.strptime(args.since, "%Y-%m-%d")) if args.since else None
+    except ValueError:
+        log(f"--since must be YYYY-MM-DD, got {args.since!r}", "red")
+        return 2
+    matcher = KeywordMatcher(args.keywords.split(",")) if args.keywords else None
+    paths = args.paths or [ARCHIVE_DIR]
+    snapshots = (snapshot for path in paths for snapshot in read_snapshots(path, kinds, args.url, since))
+
+    stats, diffs = replay(snapshots, matcher)
+    rate = stats["snapshots"] / stats["seconds"] if stats["seconds"] else 0
+    log(f"Replayed {stats['snapshots']} snapshot(s) from {', '.join(paths)}: {stats['pages']} product page(s), "
+        f"{stats['card_sets']} card set(s) with {stats['cards']} card(s) in {stats['seconds']:.2f}s ({rate:.0f}/s)", "blue")
+    if matcher is not None:
+        log(f"{stats['matches']} card(s) match the keywords.", "blue")
+    for diff in diffs[:args.show]:
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(diff.t or 0))
+        label = f" [{diff.label}]" if diff.label else ""
+        log(f"{when} {diff.kind} {diff.url}{label}: recorded {verdict_text(diff.kind, diff.recorded)}, "
+            f"now {verdict_text(diff.kind, diff.replayed)}", "yellow")
+    if len(diffs) > args.show:
+        log(f"... and {len(diffs) - args.show} more.", "yellow")
+    if diffs:
+        log(f"{len(diffs)} verdict(s) differ from the recorded ones.", "red")
+        return 1
+    log("All verdicts match the recorded ones.", "green")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m app", description="Lazada stock monitor (headless)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="run the jobs in a TOML config without the GUI")
+    run.add_argument("--config", "-c", required=True, help="path to jobs.toml")
+    run.add_argument("--timing", action="store_true", help="log import/startup timing")
+    run.add_argument("--no-color", action="store_true", help="plain console output")
+    run.add_argument("--metrics-port", type=int, help="serve /metrics and /metrics.json on this local port")
+    run.add_argument("--metrics-log-interval", type=float, help="log a metrics summary every N seconds")
+    run.add_argument("--workers", type=int, help="shard the jobs over N local worker processes")
+    run.add_argument("--listen", help="coordinate workers connecting to HOST:PORT (e.g. other machines)")
+    run.add_argument("--archive", nargs="?", const=True, metavar="DIR",
+                     help="archive parsed pages and card sets for `replay` (default dir: data/snapshots)")
+    run.set_defaults(func=cmd_run)
+
+    worker = sub.add_parser("worker", help="check jobs handed out by a coordinator (run --workers/--listen)")
+    worker.add_argument("--connect", required=True, help="coordinator address, HOST:PORT")
+    worker.add_argument("--id", help="worker name (default: hostname-pid)")
+    worker.add_argument("--browsers", type=int, default=1, help="Chrome sessions for browser fallbacks")
+    worker.add_argument("--metrics-port", type=int, help="serve this worker's /metrics on this local port")
+    worker.add_argument("--no-color", action="store_true", help="plain console output")
+    worker.add_argument("--no-file-log", action="store_true", help="console only, no data/monitor.log")
+    worker.add_argument("--archive", nargs="?", const=True, metavar="DIR", help="archive parsed pages for `replay`")
+    worker.set_defaults(func=cmd_worker)
+
+    rep = sub.add_parser("replay", help="re-run the stock detectors over archived snapshots (no browser or network)")
+    rep.add_argument("paths", nargs="*", help="archive directories or segment files (default: data/snapshots)")
+    rep.add_argument("--kind", choices=("target", "store"), help="only product pages or only listing card sets")
+    rep.add_argument("--url", help="only snapshots whose URL contains this")
+    rep.add_argument("--since", help="only snapshots from this date on (YYYY-MM-DD)")
+    rep.add_argument("--keywords", help="comma-separated keywords; report how many cards they match")
+    rep.add_argument("--show", type=int, default=20, help="list at most this many differences")
+    rep.add_argument("--no-color", action="store_true", help="plain console output")
+    rep.set_defaults(func=cmd_replay)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
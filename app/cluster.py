@@ -0,0 +1,419 @@
+import hashlib
+import os
+import secrets
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.managers import BaseManager
+
+from app.config import (
+    CLUSTER_HOST, CLUSTER_PORT, CLUSTER_HEARTBEAT, CLUSTER_WORKER_TIMEOUT, CLUSTER_RESPAWN_DELAY,
+    CLUSTER_KEY_ENV, DRIVER_POOL_SIZE, METRICS_PORT, METRICS_LOG_INTERVAL
+)
+from app.fingerprint import FingerprintCache
+from app.jobs import JobManager, MonitorJob, job_logger
+from app.matcher import KeywordMatcher
+from app.metrics import METRICS
+from app.monitor import process_target_result, process_store_cards, target_identity
+from app.services import MonitorServices
+from app.storage import save_seen
+
+# What workers may call on the coordinator
+COORDINATOR_METHODS = ("join", "poll", "leave", "report_target", "report_cards", "history")
+
+
+class _CoordinatorServer(BaseManager):
+    pass
+
+
+class CoordinatorClient(BaseManager):
+    pass
+
+
+CoordinatorClient.register("coordinator", exposed=COORDINATOR_METHODS)
+
+
+def cluster_key():
+    """The shared cluster key from CLUSTER_KEY_ENV, or None (the coordinator then makes one up)."""
+    key = os.getenv(CLUSTER_KEY_ENV)
+    return key.encode() if key else None
+
+def parse_address(text, default_host=CLUSTER_HOST):
+    """ "host:port" or ":port" -> (host, port)."""
+    host, _, port = (text or "").rpartition(":")
+    return host or default_host, int(port)
+
+def owner_of(unit, workers):
+    """
+    Rendezvous hashing: the worker with the highest hash for the unit owns it,
+    so when a worker joins or leaves only its own share of units moves.
+    """
+    return max(workers, key=lambda w: hashlib.blake2b(f"{w}|{unit[0]}|{unit[1]}".encode(), digest_size=8).digest())
+
+
+class Coordinator:
+    """
+    Shards jobs over worker processes and records what they find. Each target
+    URL and each store job is one unit of work, owned by one live worker
+    (owner_of). Workers only fetch and parse: their verdicts and listing cards
+    come back here and go through the usual process_target_result /
+    process_store_cards against the one seen store, alert policy and email
+    dispatcher, so stock edges and alerts are decided once.
+
+    Reports from a worker that no longer owns the unit, or older than the
+    last recorded check of the same item, are dropped. A worker that misses
+    heartbeats for `worker_timeout` seconds is dropped and its units move to
+    the remaining workers on their next poll.
+    """
+
+    def __init__(self, jobs, email_config, log_callback=None, address=(CLUSTER_HOST, CLUSTER_PORT), authkey=None,
+                 worker_timeout=CLUSTER_WORKER_TIMEOUT, metrics_port=METRICS_PORT,
+                 metrics_log_interval=METRICS_LOG_INTERVAL):
+        self.log_callback = log_callback
+        self.authkey = authkey or secrets.token_hex(16).encode()
+        self.worker_timeout = worker_timeout
+        # The coordinator never opens a browser; the pool stays empty
+        self.services = MonitorServices(email_config, log_callback, headless=True, pool_size=1,
+                                        metrics_port=metrics_port, metrics_log_interval=metrics_log_interval,
+                                        archive_dir=None)
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._jobs = {}
+        self._store_state = {}      # store job name -> (KeywordMatcher, FingerprintCache)
+        self._workers = {}          # worker id -> monotonic time of its last poll
+        self._assignment = {}       # (job name, url or "") -> worker id
+        self._last_checked = {}     # seen key -> checked_at of the last recorded verdict
+        self._version = 0
+        self.set_jobs(jobs)
+
+        # A registry of this coordinator's own, so several coordinators can live in one process
+        server_class = type("CoordinatorServer", (_CoordinatorServer,), {})
+        server_class.register("coordinator", callable=lambda: self, exposed=COORDINATOR_METHODS)
+        self._server = server_class(address=address, authkey=self.authkey).get_server()
+        # Read by the connection threads; never set, close() ends serving through _stop
+        self._server.stop_event = threading.Event()
+        self.address = self._server.address
+        self._threads = [
+            threading.Thread(target=self._serve, name="cluster-server", daemon=True),
+            threading.Thread(target=self._watch, name="cluster-watch", daemon=True),
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        if self.log_callback:
+            self.log_callback(f"Coordinator listening on {self.address[0]}:{self.address[1]}", "blue")
+        return self
+
+    def _log(self, message, color=None):
+        if self.log_callback:
+            self.log_callback(message, color)
+
+    def _serve(self):
+        # Server.serve_forever's accept loop can't be stopped; this one ends with close()
+        listener = self._server.listener
+        while not self._stop.is_set():
+            try:
+                conn = listener.accept()
+            except OSError:
+                continue
+            if self._stop.is_set():
+                conn.close()
+                break
+            threading.Thread(target=self._server.handle_request, args=(conn,), daemon=True).start()
+
+    def _check_open(self):
+        # Workers still connected when the coordinator closes take this as a lost coordinator
+        if self._stop.is_set():
+            raise EOFError("coordinator closed")
+
+    # --- jobs and assignment ------------------------------------------------
+
+    def set_jobs(self, jobs):
+        with self._lock:
+            wanted = {job.name: job for job in jobs}
+            for name, job in wanted.items():
+                current = self._jobs.get(name)
+                if job.scan_mode == "store" and (current is None or current.spec() != job.spec()):
+                    self._store_state[name] = (KeywordMatcher(job.keywords), FingerprintCache())
+            for name in set(self._store_state) - set(wanted):
+                del self._store_state[name]
+            self._jobs = wanted
+            self._rebalance()
+
+    def _units(self):
+        for job in self._jobs.values():
+            if job.scan_mode == "target":
+                for line in job.target_urls:
+                    url = line.lstrip("!").strip()
+                    if url:
+                        yield (job.name, url)
+            else:
+                yield (job.name, "")
+
+    def _rebalance(self):
+        live = sorted(self._workers)
+        assignment = {unit: owner_of(unit, live) for unit in self._units()} if live else {}
+        moved = sum(1 for unit, worker in assignment.items() if self._assignment.get(unit) not in (None, worker))
+        self._assignment = assignment
+        self._version += 1
+        return moved
+
+    def _jobs_for(self, worker_id):
+        """The slice of every job this worker owns, as MonitorJob keyword arguments."""
+        shards = []
+        for job in self._jobs.values():
+            if job.scan_mode == "target":
+                lines = [line for line in job.target_urls
+                         if self._assignment.get((job.name, line.lstrip("!").strip())) == worker_id]
+                if not lines:
+                    continue
+            elif self._assignment.get((job.name, "")) != worker_id:
+                continue
+            else:
+                lines = []
+            shards.append({"name": job.name, "scan_mode": job.scan_mode, "target_urls": lines,
+                           "store_url": job.store_url, "keywords": job.keywords, "interval": job.interval})
+        return shards
+
+    def _add_worker(self, worker_id, note):
+        self._workers[worker_id] = time.monotonic()
+        moved = self._rebalance()
+        METRICS.inc("cluster_workers", event="joined")
+        self._log(f"Worker {worker_id} {note}; {len(self._workers)} worker(s), {moved} unit(s) moved.", "blue")
+
+    def drop_worker(self, worker_id, reason):
+        with self._lock:
+            if self._workers.pop(worker_id, None) is None:
+                return
+            owned = sum(1 for worker in self._assignment.values() if worker == worker_id)
+            self._rebalance()
+            METRICS.inc("cluster_workers", event="lost")
+            self._log(f"Worker {worker_id} {reason}; {owned} unit(s) reassigned to "
+                      f"{len(self._workers)} remaining worker(s).", "yellow")
+
+    def _watch(self):
+        while not self._stop.wait(CLUSTER_HEARTBEAT):
+            now = time.monotonic()
+            with self._lock:
+                silent = [w for w, last in self._workers.items() if now - last > self.worker_timeout]
+            for worker_id in silent:
+                self.drop_worker(worker_id, f"missed heartbeats for {self.worker_timeout:.0f}s")
+            with self._lock:
+                save_seen(self.services.seen, self.log_callback)
+
+    # --- called by workers --------------------------------------------------
+
+    def join(self, worker_id, host=None, pid=None):
+        with self._lock:
+            self._check_open()
+            if worker_id not in self._workers:
+                self._add_worker(worker_id, f"joined from {host or '?'} (pid {pid or '?'})")
+            return self._version
+
+    def poll(self, worker_id, version=None):
+        """Heartbeat. Returns (version, shards), with shards None when the worker's assignment is current."""
+        with self._lock:
+            self._check_open()
+            if worker_id not in self._workers:
+                self._add_worker(worker_id, "checked in")
+            self._workers[worker_id] = time.monotonic()
+            if version == self._version:
+                return self._version, None
+            return self._version, self._jobs_for(worker_id)
+
+    def leave(self, worker_id):
+        self.drop_worker(worker_id, "left")
+
+    def history(self, target_url):
+        with self._lock:
+            self._check_open()
+            record = self.services.seen.get(target_identity(target_url)[0])
+            return record.get("changes") if record else None
+
+    def report_target(self, worker_id, job_name, target_url, verdict, checked_at):
+        """Records one target check. Returns (changed, stock-change history) for the worker's scheduler."""
+        services = self.services
+        with self._lock:
+            self._check_open()
+            job = self._jobs.get(job_name)
+            if job is None or self._assignment.get((job_name, target_url)) != worker_id:
+                METRICS.inc("cluster_reports", result="stale")
+                return False, None
+            key = target_identity(target_url)[0]
+            if checked_at <= self._last_checked.get(key, 0):
+                METRICS.inc("cluster_reports", result="duplicate")
+                return False, None
+            self._last_checked[key] = checked_at
+            changed = process_target_result(target_url, verdict, services.seen, services.alert_policy,
+                                            services.notifier, recipients=job.recipients,
+                                            log_callback=job_logger(self.log_callback, job_name))
+            METRICS.inc("cluster_reports", result="recorded")
+            record = services.seen.get(key)
+            return changed, record.get("changes") if record else None
+
+    def report_cards(self, worker_id, job_name, cards):
+        """Records one pass over a store listing. Returns the number of new items."""
+        services = self.services
+        with self._lock:
+            self._check_open()
+            job = self._jobs.get(job_name)
+            if job is None or self._assignment.get((job_name, "")) != worker_id:
+                METRICS.inc("cluster_reports", result="stale")
+                return 0
+            matcher, item_prints = self._store_state[job_name]
+            new_items = process_store_cards(cards, matcher, services.seen, services.alert_policy,
+                                            services.notifier, recipients=job.recipients,
+                                            log_callback=job_logger(self.log_callback, job_name),
+                                            item_prints=item_prints)
+            METRICS.inc("cluster_reports", result="recorded")
+            return new_items
+
+    # ------------------------------------------------------------------------
+
+    def workers(self):
+        with self._lock:
+            return sorted(self._workers)
+
+    def close(self):
+        with self._lock:
+            self._stop.set()
+        # Wake the accept loop, then stop listening before the services go
+        try:
+            socket.create_connection(self.address[:2], timeout=1).close()
+        except OSError:
+            pass
+        for thread in self._threads:
+            if thread.is_alive():
+                thread.join(5)
+        self._server.listener.close()
+        self.services.close()
+
+
+class LocalWorkers:
+    """Worker processes on this machine: started with the coordinator's address and key, restarted if they exit."""
+
+    def __init__(self, coordinator, count, log_callback=None, stdout=None, archive_dir=None):
+        self.coordinator = coordinator
+        self.count = count
+        self.log_callback = log_callback
+        self.stdout = stdout
+        self.archive_dir = archive_dir
+        self._procs = {}        # worker id -> Popen
+        self._restart_at = {}   # worker id -> monotonic time to respawn
+
+    def _spawn(self, worker_id):
+        host, port = self.coordinator.address[:2]
+        env = dict(os.environ, **{CLUSTER_KEY_ENV: self.coordinator.authkey.decode()})
+        cmd = [sys.executable, "-m", "app", "worker", "--connect", f"{host}:{port}", "--id", worker_id, "--no-file-log"]
+        if self.archive_dir:
+            cmd += ["--archive", self.archive_dir]
+        self._procs[worker_id] = subprocess.Popen(cmd, env=env, stdout=self.stdout, stderr=self.stdout,
+                                                  cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    def start(self):
+        for i in range(self.count):
+            self._spawn(f"{socket.gethostname()}-w{i + 1}")
+        return self
+
+    def check(self):
+        """Reassigns the shards of workers that exited (without waiting for the heartbeat timeout) and restarts them."""
+        now = time.monotonic()
+        for worker_id, proc in list(self._procs.items()):
+            code = proc.poll()
+            if code is None:
+                continue
+            if worker_id not in self._restart_at:
+                self.coordinator.drop_worker(worker_id, f"exited with code {code}")
+                self._restart_at[worker_id] = now + CLUSTER_RESPAWN_DELAY
+            elif now >= self._restart_at[worker_id]:
+                del self._restart_at[worker_id]
+                if self.log_callback:
+                    self.log_callback(f"Restarting worker {worker_id}", "blue")
+                self._spawn(worker_id)
+
+    def pids(self):
+        return {worker_id: proc.pid for worker_id, proc in self._procs.items()}
+
+    def stop(self, timeout=30):
+        for proc in self._procs.values():
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+        deadline = time.monotonic() + timeout
+        for proc in self._procs.values():
+            try:
+                proc.wait(max(0.1, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+class ClusterReporter:
+    """The recording side of run_monitor on a worker: results are sent to the coordinator."""
+
+    def __init__(self, coordinator, worker_id, job_name):
+        self.coordinator = coordinator
+        self.worker_id = worker_id
+        self.job_name = job_name
+        self._history = {}
+
+    def target_result(self, target_url, verdict):
+        changed, changes = self.coordinator.report_target(self.worker_id, self.job_name, target_url, verdict, time.time())
+        self._history[target_url] = changes
+        return changed
+
+    def store_cards(self, cards):
+        return self.coordinator.report_cards(self.worker_id, self.job_name, list(cards))
+
+    def history(self, target_url):
+        if target_url not in self._history:
+            self._history[target_url] = self.coordinator.history(target_url)
+        return self._history[target_url]
+
+
+def run_worker(address, authkey, stop_event, worker_id=None, log_callback=None, headless=True,
+               pool_size=DRIVER_POOL_SIZE, metrics_port=METRICS_PORT, archive_dir=None):
+    """
+    Runs a cluster worker until stop_event is set: keeps polling the
+    coordinator and runs whatever slice of the jobs it is given, reporting
+    every result back. Reconnects if the coordinator goes away. With an
+    `archive_dir`, the pages this worker parses are archived there.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    coordinator = None
+    jobs = JobManager(None, log_callback, headless=headless, pool_size=pool_size, metrics_port=metrics_port,
+                      reporter_factory=lambda name: ClusterReporter(coordinator, worker_id, name), archive_dir=archive_dir)
+    version = None
+    while not stop_event.is_set():
+        try:
+            if coordinator is None:
+                client = CoordinatorClient(address=address, authkey=authkey)
+                client.connect()
+                coordinator = client.coordinator()
+                coordinator.join(worker_id, socket.gethostname(), os.getpid())
+                if log_callback: log_callback(f"Worker {worker_id} connected to {address[0]}:{address[1]}", "blue")
+            version, shards = coordinator.poll(worker_id, version)
+            if shards is not None:
+                jobs.sync([MonitorJob(**shard) for shard in shards])
+                if log_callback:
+                    count = sum(len(shard["target_urls"]) or 1 for shard in shards)
+                    log_callback(f"Worker {worker_id} assigned {count} unit(s): {', '.join(jobs.names()) or 'idle'}", "blue")
+        except AuthenticationError:
+            if log_callback: log_callback(f"Coordinator rejected the cluster key (set {CLUSTER_KEY_ENV}).", "red")
+            break
+        except (OSError, EOFError) as e:
+            if coordinator is not None and log_callback:
+                log_callback(f"Lost the coordinator ({e}); stopping jobs and reconnecting...", "yellow")
+            coordinator, version = None, None
+            jobs.sync([])
+        stop_event.wait(CLUSTER_HEARTBEAT)
+
+    if coordinator is not None:
+        try:
+            coordinator.leave(worker_id)
+        except (OSError, EOFError):
+            pass
+    jobs.close()
@@ -1,10 +1,147 @@
 import os
 
-DATA_DIR = "data"
-SEEN_FILE = os.path.join(DATA_DIR, "seen_items.json")
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+SEEN_FILE = os.path.join(DATA_DIR, "seen_items.json")  # legacy store, migrated on first load
+SEEN_DB = os.path.join(DATA_DIR, "seen_items.db")
+
+# Seen store commits changed items once this many are pending or this many seconds have passed
+SEEN_FLUSH_BATCH = 200
+SEEN_FLUSH_INTERVAL = 5.0
+# Bookkeeping-only updates (e.g. last_seen on an unchanged item) are written at most this often
+SEEN_REFRESH_INTERVAL = 300
+# Items not seen for this many days are dropped from the seen store (0 keeps everything);
+# the check runs at load and then at most once per SEEN_EVICT_INTERVAL seconds
+SEEN_RETENTION_DAYS = 90
+SEEN_EVICT_INTERVAL = 3600
 
 CHECK_DELAY_MIN = 8
 CHECK_DELAY_MAX = 15
 
 SMTP_SERVER = "smtp.gmail.com"
 SMTP_PORT = 587
+SMTP_TIMEOUT = 30
+
+# Alert emails: alerts queued within EMAIL_COALESCE_WINDOW seconds are sent as one digest
+EMAIL_COALESCE_WINDOW = 5.0
+EMAIL_MAX_RETRIES = 3
+EMAIL_RETRY_BACKOFF = 2.0
+EMAIL_IDLE_TIMEOUT = 240
+
+# HTTP fast path for target checks (Selenium is only used as a fallback)
+HTTP_FAST_PATH = True
+HTTP_TIMEOUT = 10
+HTTP_POOL_SIZE = 4
+HTTP_MAX_REDIRECTS = 5
+# Remember ETag/Last-Modified per URL and revalidate with conditional requests
+HTTP_CONDITIONAL = True
+HTTP_VALIDATOR_CACHE = 20000
+HTTP_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# Target mode concurrency
+TARGET_CONCURRENCY = 8
+TARGET_PER_HOST = 4
+TARGET_HOST_DELAY = 0.1
+
+# Page and item fingerprints remembered to skip re-parsing/re-recording unchanged content
+FINGERPRINT_CACHE_SIZE = 20000
+
+# Browser pool
+DRIVER_POOL_SIZE = 2
+# Page loads and scripts time out after DRIVER_NAV_TIMEOUT seconds; a session that doesn't
+# answer a probe within DRIVER_PROBE_TIMEOUT is treated as dead and replaced
+DRIVER_NAV_TIMEOUT = 30
+DRIVER_PROBE_TIMEOUT = 10
+# After Chrome fails to start, sessions aren't tried again for this many seconds
+DRIVER_START_COOLDOWN = 60
+# Sessions are recycled after this many page loads, or once Chrome's RSS passes this (0 disables)
+DRIVER_MAX_NAVIGATIONS = 500
+DRIVER_MAX_RSS_MB = 1500
+# Resolved chromedriver path, so new sessions (and restarts) skip the webdriver-manager lookup
+DRIVER_PATH_CACHE = os.path.join(DATA_DIR, "chromedriver_path.txt")
+
+# Store mode keyword matching ("-word" entries are negative keywords)
+KEYWORD_WORD_BOUNDARY = False
+# Below this many keywords a plain substring scan per keyword is cheaper than the automaton
+# (they cost about the same at ~100, see bench/bench_matcher.py)
+KEYWORD_AUTOMATON_MIN = 100
+
+# Lean page-load profile: eager loading, blocked heavy resources, condition-based waits
+DRIVER_LEAN = True
+PAGE_WAIT_TIMEOUT = 8
+LEAN_BLOCKED_URLS = [
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.mp4", "*.webm", "*.m3u8",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*facebook.net*", "*facebook.com/tr*", "*analytics.tiktok.com*", "*hotjar.com*",
+]
+
+# Store mode crawling: walk up to STORE_MAX_PAGES listing pages, reading every card of a
+# page but not going past a page with STORE_KNOWN_RUN consecutive cards seen in an earlier
+# pass (or already in the seen store). STORE_SORT, if set, is sent as the listing's
+# "sort" parameter (use the shop's newest-first key).
+STORE_MAX_PAGES = 5
+STORE_KNOWN_RUN = 8
+STORE_SORT = ""
+# Read store listings from the shop's catalog JSON (ajax=true) over HTTP; Chrome is
+# only used when that fails, and then for STORE_CATALOG_RETRY seconds before retrying.
+STORE_CATALOG_JSON = True
+STORE_CATALOG_RETRY = 600
+
+# Target mode scheduling: per-target intervals (seconds) adapt between MIN and MAX
+# from stock-change history; hot targets ("!" before the URL) stay at HOT_INTERVAL.
+SCHED_MIN_INTERVAL = 15
+SCHED_MAX_INTERVAL = 600
+SCHED_HOT_INTERVAL = 10
+SCHED_BACKOFF = 1.5
+SCHED_BUDGET_PER_MINUTE = 120    # checks per minute over all targets; 0 = unlimited
+SCHED_HISTORY = 20
+SCHED_BATCH_WINDOW = 1.0
+
+# Alerting: only sold-out -> in-stock transitions alert, at most once per
+# ALERT_COOLDOWN seconds per item and ALERT_MAX_PER_HOUR across the monitor.
+ALERT_COOLDOWN = 1800
+ALERT_MAX_PER_HOUR = 30
+ALERT_HISTORY = 20
+
+# Logging: the GUI keeps the last LOG_MAX_LINES lines; the full history goes to a rotating file
+LOG_MAX_LINES = 2000
+LOG_DRAIN_INTERVAL_MS = 100
+LOG_DRAIN_BATCH = 500
+LOG_TO_FILE = True
+LOG_FILE = os.path.join(DATA_DIR, "monitor.log")
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+# Metrics: per-stage timings and counters. METRICS_PORT > 0 serves /metrics (Prometheus
+# text) and /metrics.json on METRICS_HOST; METRICS_LOG_INTERVAL > 0 logs a summary
+# line every that many seconds.
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 0
+METRICS_LOG_INTERVAL = 0
+
+# Cluster mode (`run --workers N`, `worker --connect HOST:PORT`): the coordinator listens on
+# CLUSTER_HOST:CLUSTER_PORT (0 picks a free port), workers check in every CLUSTER_HEARTBEAT
+# seconds and lose their share of the jobs after CLUSTER_WORKER_TIMEOUT seconds of silence.
+# Workers on other hosts need the coordinator's key in the CLUSTER_KEY_ENV environment variable.
+CLUSTER_HOST = "127.0.0.1"
+CLUSTER_PORT = 0
+CLUSTER_HEARTBEAT = 2.0
+CLUSTER_WORKER_TIMEOUT = 10.0
+CLUSTER_RESPAWN_DELAY = 5.0
+CLUSTER_KEY_ENV = "LAZWATCH_CLUSTER_KEY"
+
+# Snapshot archive (off unless ARCHIVE_ENABLED, `run --archive` or `archive = true` in jobs.toml):
+# every product page and listing card set the monitor parses is written with its verdict to
+# gzipped JSON-lines segments in ARCHIVE_DIR, rolled over at ARCHIVE_SEGMENT_MB and pruned
+# oldest-first to ARCHIVE_MAX_MB. `python -m app replay` re-runs the detectors over them.
+ARCHIVE_ENABLED = False
+ARCHIVE_DIR = os.path.join(DATA_DIR, "snapshots")
+ARCHIVE_MAX_MB = 500
+ARCHIVE_SEGMENT_MB = 16
+ARCHIVE_COMPRESS_LEVEL = 6
+# Written segments are flushed this often; snapshots arriving while ARCHIVE_QUEUE_MB of pages
+# are already waiting to be written are dropped
+ARCHIVE_FLUSH_INTERVAL = 5.0
+ARCHIVE_QUEUE_MB = 32
@@ -0,0 +1,85 @@
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from app.config import STORE_MAX_PAGES, STORE_KNOWN_RUN, STORE_SORT
+from app.utils import normalize_title
+
+def listing_page_url(store_url, page, sort=STORE_SORT):
+    parts = urlsplit(store_url)
+    query = dict(parse_qsl(parts.query, keep_blank_values=True))
+    if page > 1:
+        query["page"] = str(page)
+    else:
+        query.pop("page", None)
+    if sort:
+        query["sort"] = sort
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def card_key(card):
+    return card.item_id or normalize_title(card.title) or card.url
+
+
+class StoreCrawler:
+    """
+    Walks a store's listing pages newest-first. Every card of a fetched page
+    is returned; once a page holds a run of `known_run` cards seen before,
+    the pages after it are skipped, so a quiet store costs one page per
+    cycle while drops below the fold of that page are still found.
+
+    A card is known if an earlier pass walked it or `is_known(card)` says so
+    (e.g. it is in the seen store), so a restart doesn't walk every page again.
+    """
+
+    def __init__(self, store_url, max_pages=STORE_MAX_PAGES, known_run=STORE_KNOWN_RUN, is_known=None):
+        self.store_url = store_url
+        self.max_pages = max(1, max_pages)
+        self.known_run = max(1, known_run)
+        self.is_known = is_known
+        self.known = set()
+
+    def _known(self, card, key):
+        return key in self.known or (self.is_known is not None and self.is_known(card))
+
+    def crawl(self, fetch_cards, stop_event=None):
+        """
+        fetch_cards(url) must return the cards rendered at that listing URL.
+        Returns (cards, fresh_count, pages) for this pass; cards are in listing order.
+        """
+        walked = []
+        pass_keys = set()
+        fresh = 0
+        run = 0
+        pages = 0
+
+        for page in range(1, self.max_pages + 1):
+            if stop_event is not None and stop_event.is_set():
+                break
+            try:
+                cards = fetch_cards(listing_page_url(self.store_url, page))
+            except Exception:
+                if page == 1:
+                    raise
+                break
+            pages += 1
+            keys = [card_key(c) for c in cards]
+            # An empty page, or one we've already walked (sites often repeat the last page), ends the listing
+            if not cards or all(k in pass_keys for k in keys):
+                break
+
+            reached_known = False
+            for card, key in zip(cards, keys):
+                if key in pass_keys:
+                    continue
+                pass_keys.add(key)
+                walked.append(card)
+                if self._known(card, key):
+                    run += 1
+                    if run >= self.known_run:
+                        reached_known = True
+                else:
+                    run = 0
+                    fresh += 1
+            if reached_known:
+                break
+
+        self.known.update(pass_keys)
+        return walked, fresh, pages
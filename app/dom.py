@@ -0,0 +1,116 @@
+from collections import namedtuple
+
+from app.config import PAGE_WAIT_TIMEOUT
+
+PRODUCT_CARD_SELECTOR = "div[data-tracking='product-card'], div[data-qa-locator='productItem'], div.c2prKC"
+PRODUCT_LINK_SELECTOR = "a[href*='/products/'], a[href*='/product/']"
+
+Card = namedtuple("Card", ["text", "title", "url", "item_id", "sold_out"])
+
+# Reads every product card in one round-trip instead of 4-5 WebDriver calls per card.
+# Each card comes back as [text, title, url, item_id, sold_out_marker].
+EXTRACT_CARDS_JS = r"""
+const cardSelector = arguments[0], linkSelector = arguments[1];
+const out = [];
+for (const card of document.querySelectorAll(cardSelector)) {
+    const link = card.querySelector(linkSelector);
+    let title = "", url = "";
+    if (link) {
+        url = link.href || "";
+        title = (link.innerText || "").trim();
+        if (!title) {
+            const img = card.querySelector("img");
+            if (img) title = img.getAttribute("alt") || img.getAttribute("title") || "";
+        }
+    }
+    const m = url.match(/-i(\d+)(?:-s\d+)?\.html/);
+    const soldOut = !!card.querySelector("[class*='sold-out' i], [class*='soldout' i], [class*='sold_out' i]");
+    out.push([card.innerText || "", title, url, m ? m[1] : "", soldOut]);
+}
+return out;
+"""
+
+def is_sold_out_text(card_text: str):
+    card_text = (card_text or "").lower()
+    return any(x in card_text for x in ["sold out", "out of stock", "no stock", "unavailable", "temporarily unavailable"])
+
+def card_sold_out(card):
+    return card.sold_out or is_sold_out_text(card.text)
+
+def extract_cards(driver, card_selector=PRODUCT_CARD_SELECTOR):
+    rows = driver.execute_script(EXTRACT_CARDS_JS, card_selector, PRODUCT_LINK_SELECTOR) or []
+    return [Card(text or "", (title or "").strip(), url or "", item_id or "", bool(sold_out))
+            for text, title, url, item_id, sold_out in rows]
+
+BUY_KEYWORDS = ["add to cart", "buy now", "add to bag", "purchase", "checkout", "buy"]
+SOLD_OUT_BUTTON_KEYWORDS = ["sold out", "out of stock", "notify me", "unavailable"]
+
+# Walks the page's buttons in document order and stops at the first visible,
+# enabled one whose label matches a buy or sold-out keyword.
+# Returns [verdict, evidence] where verdict is true/false/null.
+CLASSIFY_AVAILABILITY_JS = r"""
+const buyKeywords = arguments[0], soldKeywords = arguments[1];
+const isVisible = (el) => {
+    if (!el.getClientRects().length) return false;
+    const style = window.getComputedStyle(el);
+    return style.visibility !== "hidden" && style.display !== "none" && style.opacity !== "0";
+};
+for (const el of document.querySelectorAll("button, a[role='button'], input[type='button']")) {
+    if (!isVisible(el)) continue;
+    const label = (el.innerText || el.value || el.textContent || "").trim().toLowerCase();
+    if (!label) continue;
+    if (el.disabled || el.hasAttribute("disabled")) continue;
+    const evidence = {tag: el.tagName.toLowerCase(), label: label.slice(0, 80)};
+    let kw = buyKeywords.find((k) => label.includes(k));
+    if (kw) return [true, Object.assign(evidence, {keyword: kw})];
+    kw = soldKeywords.find((k) => label.includes(k));
+    if (kw) return [false, Object.assign(evidence, {keyword: kw})];
+}
+return [null, null];
+"""
+
+def classify_availability(driver):
+    """Returns (verdict, evidence) for the currently loaded product page in one script call."""
+    verdict, evidence = driver.execute_script(CLASSIFY_AVAILABILITY_JS, BUY_KEYWORDS, SOLD_OUT_BUTTON_KEYWORDS) or (None, None)
+    return verdict, evidence
+
+def classify_label(label):
+    """The verdict CLASSIFY_AVAILABILITY_JS gives a button with this label (used to re-score archived evidence)."""
+    label = (label or "").strip().lower()
+    if any(k in label for k in BUY_KEYWORDS):
+        return True
+    if any(k in label for k in SOLD_OUT_BUTTON_KEYWORDS):
+        return False
+    return None
+
+# Conditions polled after navigation on the lean profile, instead of fixed sleeps
+GRID_READY_JS = "return !!document.querySelector(arguments[0]);"
+STOCK_READY_JS = r"""
+const buttonLabels = arguments[0];
+for (const s of document.scripts) {
+    if (/"stock"\s*:|"is_?sold_?out"\s*:|"available"\s*:\s*false/i.test(s.text)) return true;
+}
+if (document.readyState === "loading") return false;
+for (const el of document.querySelectorAll("button, a[role='button'], input[type='button']")) {
+    const label = (el.innerText || el.value || "").toLowerCase();
+    if (buttonLabels.some((k) => label.includes(k))) return true;
+}
+return false;
+"""
+
+def wait_for_script(driver, script, *args, timeout=PAGE_WAIT_TIMEOUT):
+    """Polls script until it returns truthy. Returns False on timeout instead of raising."""
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(lambda d: d.execute_script(script, *args))
+        return True
+    except TimeoutException:
+        return False
+
+def wait_for_product_grid(driver, card_selector=PRODUCT_CARD_SELECTOR, timeout=PAGE_WAIT_TIMEOUT):
+    return wait_for_script(driver, GRID_READY_JS, card_selector, timeout=timeout)
+
+def wait_for_stock_state(driver, timeout=PAGE_WAIT_TIMEOUT):
+    return wait_for_script(driver, STOCK_READY_JS, BUY_KEYWORDS + SOLD_OUT_BUTTON_KEYWORDS, timeout=timeout)
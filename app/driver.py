@@ -1,22 +1,376 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+from app.config import (
+    DRIVER_POOL_SIZE, DRIVER_LEAN, HTTP_USER_AGENT, LEAN_BLOCKED_URLS, DRIVER_NAV_TIMEOUT,
+    DRIVER_PROBE_TIMEOUT, DRIVER_MAX_NAVIGATIONS, DRIVER_MAX_RSS_MB, DRIVER_PATH_CACHE, DRIVER_START_COOLDOWN
+)
+from app.metrics import METRICS
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+def resolve_driver_path(refresh=False):
+    """
+    The chromedriver binary, resolved through webdriver-manager once and then
+    remembered in memory and in DRIVER_PATH_CACHE. refresh=True looks it up again.
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if not refresh:
+            if _driver_path and os.path.exists(_driver_path):
+                return _driver_path
+            try:
+                with open(DRIVER_PATH_CACHE, "r", encoding="utf-8") as f:
+                    cached = f.read().strip()
+                if cached and os.path.exists(cached):
+                    _driver_path = cached
+                    return cached
+            except OSError:
+                pass
+
+        from webdriver_manager.chrome import ChromeDriverManager
+        _driver_path = ChromeDriverManager().install()
+        try:
+            os.makedirs(os.path.dirname(DRIVER_PATH_CACHE), exist_ok=True)
+            with open(DRIVER_PATH_CACHE, "w", encoding="utf-8") as f:
+                f.write(_driver_path)
+        except OSError:
+            pass
+        return _driver_path
+
+def is_version_mismatch(error):
+    """True if Chrome refused the session because chromedriver was built for another Chrome version."""
+    from selenium.common.exceptions import SessionNotCreatedException
+    return isinstance(error, SessionNotCreatedException) and "version" in str(error).lower()
+
+def setup_driver(headless=False, log_callback=None, lean=DRIVER_LEAN):
+    # Imported here so code paths that never open a browser don't pay for selenium
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
 
-def setup_driver(headless=False):
     options = Options()
     if headless:
         options.add_argument("--headless=new")
-
+    if lean:
+        # Hand control back at DOMContentLoaded; callers wait for what they need explicitly
+        options.page_load_strategy = "eager"
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.managed_default_content_settings.fonts": 2,
+        })
     options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_argument(f"user-agent={HTTP_USER_AGENT}")
     options.add_argument("--start-maximized")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+
+    try:
+        try:
+            driver = webdriver.Chrome(service=Service(resolve_driver_path()), options=options)
+        except Exception as e:
+            # A remembered driver may no longer match the installed Chrome; other failures aren't the driver's
+            if not is_version_mismatch(e):
+                raise
+            driver = webdriver.Chrome(service=Service(resolve_driver_path(refresh=True)), options=options)
+        driver.set_page_load_timeout(DRIVER_NAV_TIMEOUT)
+        driver.set_script_timeout(DRIVER_NAV_TIMEOUT)
+        if lean:
+            block_heavy_resources(driver)
+        else:
+            driver.implicitly_wait(5)
+        return driver
+    except Exception as e:
+        if log_callback:
+            log_callback(f"Failed to initialize WebDriver: {e}", "red")
+        return None
+
+def block_heavy_resources(driver, patterns=LEAN_BLOCKED_URLS):
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns)})
+    except Exception:
+        pass
+
+def is_driver_alive(driver):
+    try:
+        driver.execute_script("return 1;")
+        return True
+    except Exception:
+        return False
+
+def _with_timeout(fn, timeout):
+    """Runs fn() on a helper thread. Returns its result, or None if it raised or didn't finish in time."""
+    result = []
+    def run():
+        try:
+            result.append(fn())
+        except Exception:
+            pass
+    worker = threading.Thread(target=run, name="driver-probe", daemon=True)
+    worker.start()
+    worker.join(timeout)
+    return result[0] if result else None
+
+def probe_driver(driver, timeout=DRIVER_PROBE_TIMEOUT):
+    """Liveness probe that also catches a hung session: it has to answer within `timeout` seconds."""
+    return bool(_with_timeout(lambda: is_driver_alive(driver), timeout))
+
+def _driver_pid(driver):
+    process = getattr(getattr(driver, "service", None), "process", None)
+    return getattr(process, "pid", None)
+
+def _process_tree(root_pid):
+    """PIDs of root_pid and all its descendants (read from /proc, so Linux only; [] elsewhere)."""
+    children = {}
+    try:
+        for name in os.listdir("/proc"):
+            if not name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{name}/stat", "rb") as f:
+                    stat = f.read()
+            except OSError:
+                continue
+            # The command name may contain spaces, the fields after it don't
+            ppid = int(stat[stat.rindex(b")") + 2:].split()[1])
+            children.setdefault(ppid, []).append(int(name))
+    except OSError:
+        return []
+    tree, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        tree.append(pid)
+        stack.extend(children.get(pid, ()))
+    return tree
+
+def browser_rss_mb(driver):
+    """Resident memory of chromedriver and every Chrome process under it, or None if it can't be read."""
+    pid = _driver_pid(driver)
+    if pid is None or not os.path.isdir("/proc"):
+        return None
+    page_kb = os.sysconf("SC_PAGE_SIZE") // 1024
+    total = 0
+    for child in _process_tree(pid):
+        try:
+            with open(f"/proc/{child}/statm") as f:
+                total += int(f.read().split()[1]) * page_kb
+        except (OSError, IndexError, ValueError):
+            continue
+    return total / 1024
+
+def quit_driver(driver, timeout=DRIVER_PROBE_TIMEOUT):
+    """Quits the session; if that hangs or fails, kills chromedriver and its Chrome processes."""
+    target = getattr(driver, "driver", driver)
+    pid = _driver_pid(target)
+    tree = _process_tree(pid) if pid is not None else []
+    if _with_timeout(lambda: target.quit() or True, timeout):
+        return
+    for child in reversed(tree):
+        try:
+            os.kill(child, getattr(signal, "SIGKILL", signal.SIGTERM))
+        except OSError:
+            pass
+
+
+class BrowserSession:
+    """
+    A pooled WebDriver plus its bookkeeping. Attribute access goes through
+    to the driver; get() also counts navigations and marks the session as
+    suspect when a page load fails, so the pool probes it on release.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.started = time.monotonic()
+        self.navigations = 0
+        self.suspect = False
+
+    def get(self, url):
+        self.navigations += 1
+        try:
+            return self.driver.get(url)
+        except Exception:
+            self.suspect = True
+            raise
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+
+class DriverPool:
+    """
+    Holds up to `size` Chrome sessions and leases them to worker threads.
+    Sessions are started lazily and kept across cycles until close(). A
+    session that fails the liveness probe on lease, or after a failed page
+    load, is replaced; one that has done `max_navigations` page loads or
+    grown past `max_rss_mb` is recycled when it comes back. After Chrome
+    fails to start, no new session is tried for `start_cooldown` seconds.
+    """
+
+    def __init__(self, size=DRIVER_POOL_SIZE, headless=False, log_callback=None,
+                 max_navigations=DRIVER_MAX_NAVIGATIONS, max_rss_mb=DRIVER_MAX_RSS_MB,
+                 start_cooldown=DRIVER_START_COOLDOWN):
+        self.size = max(1, size)
+        self.headless = headless
+        self.log_callback = log_callback
+        self.max_navigations = max_navigations
+        self.max_rss_mb = max_rss_mb
+        self.start_cooldown = start_cooldown
+        self._start_retry_at = 0.0
+        self._cond = threading.Condition()
+        self._idle = []
+        self._live = 0
+        self._in_use = 0
+        self._closed = False
+        self.leases = 0
+        self.replaced = 0
+        self.recycled = 0
+        self.lease_wait_total = 0.0
+        self.lease_wait_max = 0.0
+
+    def acquire(self, timeout=None):
+        """Returns a live BrowserSession, or None if the pool is closed, timed out or Chrome failed to start."""
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+                if self._idle:
+                    driver = self._idle.pop()
+                    break
+                if self._live < self.size:
+                    # Reserve a slot; the session itself is started outside the lock
+                    self._live += 1
+                    driver = None
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            self._in_use += 1
+
+        if driver is not None and not probe_driver(driver):
+            self._replace(driver)
+            driver = None
+
+        if driver is None:
+            raw = self._start()
+            if raw is None:
+                with self._cond:
+                    self._live -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                return None
+            driver = BrowserSession(raw)
+
+        waited = time.monotonic() - started
+        with self._cond:
+            self.leases += 1
+            self.lease_wait_total += waited
+            self.lease_wait_max = max(self.lease_wait_max, waited)
+        return driver
+
+    def _start(self):
+        """A new Chrome session, or None if it failed to start (now or within the last start_cooldown seconds)."""
+        if time.monotonic() < self._start_retry_at:
+            return None
+        raw = setup_driver(headless=self.headless, log_callback=self.log_callback)
+        if raw is None:
+            self._start_retry_at = time.monotonic() + self.start_cooldown
+            METRICS.inc("browser_sessions", event="start_failed")
+            if self.log_callback:
+                self.log_callback(f"Not starting Chrome again for {self.start_cooldown:.0f}s.", "yellow")
+        return raw
+
+    def _replace(self, driver):
+        quit_driver(driver)
+        with self._cond:
+            self.replaced += 1
+        METRICS.inc("browser_sessions", event="replaced")
+        if self.log_callback:
+            self.log_callback("Browser session died or hung, starting a new one...", "yellow")
+
+    def _worn_out(self, driver):
+        """Why a healthy session should be recycled now, or None."""
+        if self.max_navigations and driver.navigations >= self.max_navigations:
+            return f"{driver.navigations} page loads"
+        if self.max_rss_mb:
+            rss = browser_rss_mb(driver)
+            if rss is not None and rss >= self.max_rss_mb:
+                return f"{rss:.0f} MB RSS"
+        return None
+
+    def release(self, driver, discard=False):
+        if not discard and not self._closed:
+            if driver.suspect and not probe_driver(driver):
+                with self._cond:
+                    self._in_use -= 1
+                    self._live -= 1
+                    self._cond.notify()
+                self._replace(driver)
+                return
+            driver.suspect = False
+            reason = self._worn_out(driver)
+            if reason:
+                discard = True
+                with self._cond:
+                    self.recycled += 1
+                METRICS.inc("browser_sessions", event="recycled")
+                if self.log_callback:
+                    self.log_callback(f"Recycling browser session after {reason}.", "default")
+        with self._cond:
+            self._in_use -= 1
+            keep = not discard and not self._closed
+            if keep:
+                self._idle.append(driver)
+            else:
+                self._live -= 1
+            self._cond.notify()
+        if not keep:
+            quit_driver(driver)
+
+    @contextmanager
+    def lease(self, timeout=None):
+        driver = self.acquire(timeout)
+        try:
+            yield driver
+        except BaseException:
+            # Whatever went wrong may have taken the session with it; release() probes it
+            if driver is not None:
+                driver.suspect = True
+            raise
+        finally:
+            if driver is not None:
+                self.release(driver)
 
-    driver = webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()),
-        options=options
-    )
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "live": self._live,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "leases": self.leases,
+                "replaced": self.replaced,
+                "recycled": self.recycled,
+                "lease_wait_avg": self.lease_wait_total / self.leases if self.leases else 0.0,
+                "lease_wait_max": self.lease_wait_max,
+            }
 
-    driver.implicitly_wait(5)
-    return driver
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._live -= len(idle)
+            self._cond.notify_all()
+        for driver in idle:
+            quit_driver(driver)
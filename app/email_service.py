@@ -1,37 +1,171 @@
+import queue
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
 
-def send_notification_email(subject, body, email_config, log_callback=None):
-    """
-    Sends an email notification using the provided configuration.
-    email_config must contain: SENDER_EMAIL, SENDER_PASSWORD, RECIPIENT_EMAILS
-    """
-    sender = email_config.get("SENDER_EMAIL")
-    password = email_config.get("SENDER_PASSWORD")
-    recipients = email_config.get("RECIPIENT_EMAILS")
-    
-    if not sender or not password or not recipients:
-        if log_callback:
-            log_callback("Email configuration missing. Skipping email.", "red")
-        return
-
-    # Join multiple recipients into a comma-separated string
-    to_list = ", ".join(recipients)
+from app.config import (
+    SMTP_SERVER, SMTP_PORT, SMTP_TIMEOUT, EMAIL_COALESCE_WINDOW,
+    EMAIL_MAX_RETRIES, EMAIL_RETRY_BACKOFF, EMAIL_IDLE_TIMEOUT
+)
+from app.metrics import METRICS
 
+def build_message(sender, recipients, subject, body):
     msg = MIMEText(body)
     msg['Subject'] = subject
     msg['From'] = sender
-    msg['To'] = to_list
+    # Join multiple recipients into a comma-separated string
+    msg['To'] = ", ".join(recipients)
+    return msg
 
-    try:
-        server = smtplib.SMTP('smtp.gmail.com', 587)
+def open_smtp(email_config):
+    server = smtplib.SMTP(email_config.get("SMTP_SERVER", SMTP_SERVER),
+                          int(email_config.get("SMTP_PORT", SMTP_PORT)), timeout=SMTP_TIMEOUT)
+    server.ehlo()
+    if server.has_extn("starttls"):
         server.starttls()
-        server.login(sender, password)
-        server.sendmail(sender, recipients, msg.as_string())
-        server.quit()
-        if log_callback:
-            log_callback(f"Email notification sent to {len(recipients)} recipient(s)!", "yellow")
-    except Exception as e:
-        if log_callback:
-            log_callback(f"Failed to send email: {e}", "red")
-            log_callback("HINT: Ensure 'Less secure app access' or 'App Password' is enabled.", "red")
\ No newline at end of file
+        server.ehlo()
+    if server.has_extn("auth"):
+        server.login(email_config.get("SENDER_EMAIL"), email_config.get("SENDER_PASSWORD"))
+    return server
+
+
+class NotificationDispatcher:
+    """
+    Sends alert emails from a background thread so the scan loop never waits
+    on SMTP. One authenticated session is kept open and re-established when
+    it drops. Alerts queued within `coalesce_window` seconds of each other go
+    out as a single digest, and failed sends are retried with backoff.
+    """
+
+    def __init__(self, email_config, log_callback=None, coalesce_window=EMAIL_COALESCE_WINDOW,
+                 max_retries=EMAIL_MAX_RETRIES, retry_backoff=EMAIL_RETRY_BACKOFF, idle_timeout=EMAIL_IDLE_TIMEOUT):
+        self.email_config = email_config
+        self.log_callback = log_callback
+        self.coalesce_window = coalesce_window
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.idle_timeout = idle_timeout
+        self.sent = 0
+        self.failed = 0
+        self._queue = queue.Queue()
+        self._smtp = None
+        self._last_used = 0.0
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="email-dispatcher", daemon=True)
+
+    def _has_credentials(self):
+        return bool(self.email_config.get("SENDER_EMAIL") and self.email_config.get("SENDER_PASSWORD"))
+
+    def start(self):
+        if not self._has_credentials() and self.log_callback:
+            self.log_callback("Email configuration missing. Alerts will not be emailed.", "red")
+        self._thread.start()
+        return self
+
+    def notify(self, subject, body, recipients=None):
+        """Queues an alert and returns immediately. recipients overrides RECIPIENT_EMAILS for this alert."""
+        self._queue.put((subject, body, tuple(recipients) if recipients else None))
+
+    def stop(self, timeout=10):
+        """Sends whatever is still queued (waiting up to `timeout` seconds), then closes the session."""
+        self._stopping.set()
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _log(self, message, color=None):
+        if self.log_callback:
+            self.log_callback(message, color)
+
+    def _collect_batch(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.coalesce_window
+        while True:
+            # When stopping, take what is already queued without waiting out the window
+            remaining = 0 if self._stopping.is_set() else deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                if self._smtp is not None and time.monotonic() - self._last_used > self.idle_timeout:
+                    self._disconnect()
+                continue
+            if item is None:
+                # Drain anything queued before stop() was called
+                pending = []
+                while not self._queue.empty():
+                    extra = self._queue.get_nowait()
+                    if extra is not None:
+                        pending.append(extra)
+                if pending:
+                    self._deliver_grouped(pending)
+                self._disconnect()
+                return
+            self._deliver_grouped(self._collect_batch(item))
+
+    def _deliver_grouped(self, batch):
+        # One digest per distinct recipient list
+        groups = {}
+        for subject, body, recipients in batch:
+            groups.setdefault(recipients, []).append((subject, body))
+        for recipients, alerts in groups.items():
+            self._deliver(alerts, list(recipients) if recipients else self.email_config.get("RECIPIENT_EMAILS"))
+
+    def _deliver(self, batch, recipients):
+        if not self._has_credentials() or not recipients:
+            return
+        if len(batch) == 1:
+            subject, body = batch[0]
+        else:
+            subject = f"{len(batch)} alerts: {batch[0][0]} (+{len(batch) - 1} more)"
+            body = "\n\n----------------------------------------\n\n".join(b for _, b in batch)
+
+        sender = self.email_config.get("SENDER_EMAIL")
+        msg = build_message(sender, recipients, subject, body).as_string()
+
+        for attempt in range(self.max_retries + 1):
+            reused = self._smtp is not None
+            try:
+                with METRICS.span("email_send"):
+                    if self._smtp is None:
+                        self._smtp = open_smtp(self.email_config)
+                    self._smtp.sendmail(sender, recipients, msg)
+                self._last_used = time.monotonic()
+                self.sent += 1
+                METRICS.inc("emails", result="sent")
+                self._log(f"Email notification ({len(batch)} alert(s)) sent to {len(recipients)} recipient(s)!", "yellow")
+                return
+            except Exception as e:
+                self._disconnect()
+                if attempt >= self.max_retries:
+                    self.failed += 1
+                    METRICS.inc("emails", result="failed")
+                    self._log(f"Failed to send email after {attempt + 1} attempt(s): {e}", "red")
+                    self._log("HINT: Ensure 'Less secure app access' or 'App Password' is enabled.", "red")
+                    return
+                if reused:
+                    # The kept-alive session went stale; reconnect straight away
+                    continue
+                delay = self.retry_backoff * (2 ** attempt)
+                self._log(f"Email send failed ({e}), retrying in {delay:.0f}s...", "yellow")
+                self._stopping.wait(delay)  # returns early when shutting down
+
+    def _disconnect(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            pass
+        self._smtp = None
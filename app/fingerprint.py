@@ -0,0 +1,66 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from app.config import FINGERPRINT_CACHE_SIZE
+from app.dom import card_sold_out
+
+PRICE_RE = re.compile(r"(?:₱|PHP|RM|Rp|S\$|฿|₫)\s?[\d.,]+", re.IGNORECASE)
+
+
+def fingerprint(*parts):
+    """Short digest of the given parts (bytes are hashed as-is, anything else via str())."""
+    h = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode("utf-8", "surrogatepass"))
+        h.update(b"\x1f")
+    return h.digest()
+
+
+def card_price(text):
+    m = PRICE_RE.search(text or "")
+    return m.group(0).replace(" ", "") if m else ""
+
+
+def card_fingerprint(card):
+    """What a listing card says about the item: title, price and stock state."""
+    return fingerprint(card.title, card.url, card_price(card.text), card_sold_out(card))
+
+
+def grid_fingerprint(cards):
+    """The whole listing as walked this pass: card order plus each card's fingerprint."""
+    return fingerprint(*(card_fingerprint(card) for card in cards))
+
+
+class FingerprintCache:
+    """
+    Remembers the last fingerprint (and optionally a derived value, such as a
+    verdict) per key, so unchanged pages and items can skip the work that
+    would only reproduce the previous result. Holds at most `max_entries`
+    keys, dropping the least recently used.
+    """
+
+    def __init__(self, max_entries=FINGERPRINT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns (fingerprint, value), or (None, None) if the key isn't known."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, fp, value=None):
+        with self._lock:
+            self._entries[key] = (fp, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
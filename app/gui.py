@@ -1,10 +1,13 @@
 import os
 import tkinter as tk
 from tkinter import messagebox, scrolledtext
+import queue
 import threading
 from datetime import datetime
 from dotenv import load_dotenv
 
+from app.config import LOG_MAX_LINES, LOG_DRAIN_INTERVAL_MS, LOG_DRAIN_BATCH
+from app.logs import get_file_logger, log_level_for, stop_file_logger
 from app.monitor import run_monitor
 
 # Load environment variables from .env file
@@ -14,26 +17,50 @@ load_dotenv()
 monitor_thread = None
 stop_event = threading.Event()
 GUI_LOG_WIDGET = None
+LOG_QUEUE = queue.SimpleQueue()
+FILE_LOG = None  # started by create_gui, so importing this module opens no log file
 
 def log_to_gui(message, color=None):
-    """Callback function to update the GUI log from the monitor thread."""
-    if GUI_LOG_WIDGET:
-        tag = color if color else "default"
-        timestamp = datetime.now().strftime('%H:%M:%S')
-        full_msg = f"[{timestamp}] {message}\n"
-        
+    """
+    Callback used by the monitor thread. It only queues the line; the Tk
+    loop renders queued lines in batches (see drain_log_queue).
+    """
+    tag = color if color else "default"
+    timestamp = datetime.now().strftime('%H:%M:%S')
+    LOG_QUEUE.put((f"[{timestamp}] {message}\n", tag))
+    text = message.strip()
+    # The alarm bell ('\a') is for the console only
+    if FILE_LOG is not None and text and text != "\a":
+        FILE_LOG.log(log_level_for(color), text)
+
+    # Print to console as backup
+    print(f"[{color}] {message}")
+
+def drain_log_queue(root):
+    """Runs on the Tk loop: writes queued log lines in one batch and trims old lines."""
+    batch = []
+    try:
+        while len(batch) < LOG_DRAIN_BATCH:
+            batch.append(LOG_QUEUE.get_nowait())
+    except queue.Empty:
+        pass
+
+    if batch and GUI_LOG_WIDGET:
         try:
             # Enable widget temporarily to write to it
             GUI_LOG_WIDGET.config(state=tk.NORMAL)
-            GUI_LOG_WIDGET.insert(tk.END, full_msg, tag)
+            for full_msg, tag in batch:
+                GUI_LOG_WIDGET.insert(tk.END, full_msg, tag)
+            line_count = int(GUI_LOG_WIDGET.index("end-1c").split(".")[0])
+            if line_count > LOG_MAX_LINES:
+                GUI_LOG_WIDGET.delete("1.0", f"{line_count - LOG_MAX_LINES + 1}.0")
             GUI_LOG_WIDGET.see(tk.END)
             # Disable it again to make it read-only
             GUI_LOG_WIDGET.config(state=tk.DISABLED)
         except Exception:
             pass
-            
-    # Print to console as backup
-    print(f"[{color}] {message}")
+
+    root.after(LOG_DRAIN_INTERVAL_MS, drain_log_queue, root)
 
 def start_monitor_action(mode, url_input, keyword_input, start_btn, stop_btn, email_entries):
     global monitor_thread, stop_event
@@ -118,8 +145,17 @@ def stop_monitor_action(start_btn, stop_btn):
     stop_btn.config(state=tk.DISABLED)
     start_btn.config(state=tk.NORMAL)
 
+def close_gui(root, start_btn, stop_btn):
+    """Stops the monitor, lets it log its shutdown, flushes the file log and closes the window."""
+    stop_monitor_action(start_btn, stop_btn)
+    if monitor_thread is not None:
+        monitor_thread.join(timeout=5)
+    stop_file_logger()
+    root.destroy()
+
 def create_gui():
-    global GUI_LOG_WIDGET
+    global GUI_LOG_WIDGET, FILE_LOG
+    FILE_LOG = get_file_logger()
     root = tk.Tk()
     root.title("Lazada Stock Monitor (Modular)")
 
@@ -242,8 +278,9 @@ def create_gui():
     GUI_LOG_WIDGET.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
 
     update_ui()
+    drain_log_queue(root)
     
-    root.protocol("WM_DELETE_WINDOW", lambda: (stop_monitor_action(start_btn, stop_btn), root.destroy()))
+    root.protocol("WM_DELETE_WINDOW", lambda: close_gui(root, start_btn, stop_btn))
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,191 @@
+import gzip
+import http.client
+import threading
+import zlib
+from collections import OrderedDict
+from urllib.parse import urljoin, urlsplit
+
+from app.config import (
+    HTTP_TIMEOUT, HTTP_POOL_SIZE, HTTP_MAX_REDIRECTS, HTTP_USER_AGENT,
+    HTTP_CONDITIONAL, HTTP_VALIDATOR_CACHE
+)
+
+# Errors that mean a pooled keep-alive connection was closed by the server
+# between two requests; the request is safe to retry on a fresh connection.
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+def inflate(body):
+    """Decodes a deflate body, zlib-wrapped (per the spec) or raw (as many servers send it)."""
+    try:
+        return zlib.decompress(body)
+    except zlib.error:
+        return zlib.decompress(body, -zlib.MAX_WBITS)
+
+
+class HttpResponse:
+    def __init__(self, url, status, headers, body):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def not_modified(self):
+        return self.status == 304
+
+    @property
+    def text(self):
+        charset = "utf-8"
+        content_type = self.headers.get("content-type", "")
+        if "charset=" in content_type:
+            charset = content_type.split("charset=", 1)[1].split(";")[0].strip() or charset
+        return self.body.decode(charset, errors="replace")
+
+
+class HttpClient:
+    """
+    Thread-safe HTTP client that keeps idle keep-alive connections per host
+    so repeated checks against the same site skip the TCP/TLS handshake.
+    Conditional gets remember each URL's ETag/Last-Modified and revalidate
+    with them, so an unchanged page comes back as an empty 304.
+    """
+
+    def __init__(self, timeout=HTTP_TIMEOUT, pool_size=HTTP_POOL_SIZE, headers=None,
+                 conditional=HTTP_CONDITIONAL, validator_cache=HTTP_VALIDATOR_CACHE):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.conditional = conditional
+        self.validator_cache = validator_cache
+        self._validators = OrderedDict()
+        self.headers = {
+            "User-Agent": HTTP_USER_AGENT,
+            "Accept": "text/html,application/xhtml+xml,application/json;q=0.9,*/*;q=0.8",
+            "Accept-Encoding": "gzip, deflate",
+            "Accept-Language": "en-US,en;q=0.9",
+            "Connection": "keep-alive",
+        }
+        if headers:
+            self.headers.update(headers)
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _new_connection(self, scheme, netloc):
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def _acquire(self, scheme, netloc):
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                return idle.pop(), True
+        return self._new_connection(scheme, netloc), False
+
+    def _release(self, scheme, netloc, conn):
+        with self._lock:
+            idle = self._idle.setdefault((scheme, netloc), [])
+            if len(idle) < self.pool_size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _request_once(self, url, headers):
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        conn, reused = self._acquire(scheme, parts.netloc)
+        try:
+            conn.request("GET", path, headers=headers)
+            resp = conn.getresponse()
+            body = resp.read()
+        except STALE_CONNECTION_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+            conn = self._new_connection(scheme, parts.netloc)
+            try:
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+                body = resp.read()
+            except Exception:
+                conn.close()
+                raise
+        except Exception:
+            conn.close()
+            raise
+
+        resp_headers = {k.lower(): v for k, v in resp.getheaders()}
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(scheme, parts.netloc, conn)
+
+        encoding = resp_headers.get("content-encoding", "").lower()
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        elif encoding == "deflate":
+            body = inflate(body)
+        return HttpResponse(url, resp.status, resp_headers, body)
+
+    def get(self, url, headers=None, conditional=False):
+        """
+        GETs `url`, following redirects. With conditional=True the request
+        carries the validators from the last 200 for this URL, and the caller
+        must handle a 304 (resp.not_modified) by reusing its earlier result.
+        """
+        merged = dict(self.headers)
+        if headers:
+            merged.update(headers)
+        conditional = conditional and self.conditional
+        requested = url
+        if conditional:
+            with self._lock:
+                etag, modified = self._validators.get(requested, (None, None))
+            if etag:
+                merged["If-None-Match"] = etag
+            if modified:
+                merged["If-Modified-Since"] = modified
+
+        for _ in range(HTTP_MAX_REDIRECTS + 1):
+            resp = self._request_once(url, merged)
+            location = resp.headers.get("location")
+            if resp.status in (301, 302, 303, 307, 308) and location:
+                url = urljoin(url, location)
+                continue
+            break
+        if conditional and resp.status == 200:
+            self._remember(requested, resp.headers.get("etag"), resp.headers.get("last-modified"))
+        return resp
+
+    def _remember(self, url, etag, modified):
+        with self._lock:
+            if not (etag or modified):
+                self._validators.pop(url, None)
+                return
+            self._validators[url] = (etag, modified)
+            self._validators.move_to_end(url)
+            while len(self._validators) > self.validator_cache:
+                self._validators.popitem(last=False)
+
+    def forget(self, url):
+        """Drops the stored validators, so the next conditional get fetches the full page."""
+        with self._lock:
+            self._validators.pop(url, None)
+
+    def close(self):
+        with self._lock:
+            pools = list(self._idle.values())
+            self._idle = {}
+        for idle in pools:
+            for conn in idle:
+                conn.close()
@@ -0,0 +1,117 @@
+import threading
+
+from app.config import DRIVER_POOL_SIZE, METRICS_PORT, METRICS_LOG_INTERVAL, ARCHIVE_ENABLED, ARCHIVE_DIR
+from app.monitor import run_monitor
+from app.services import MonitorServices
+
+
+class MonitorJob:
+    def __init__(self, name, scan_mode, target_urls=(), store_url="", keywords=(), recipients=None, interval=None):
+        if scan_mode not in ("store", "target"):
+            raise ValueError(f"job {name!r}: mode must be 'store' or 'target'")
+        if scan_mode == "target" and not target_urls:
+            raise ValueError(f"job {name!r}: target jobs need target URLs")
+        if scan_mode == "store" and not (store_url and keywords):
+            raise ValueError(f"job {name!r}: store jobs need a store URL and keywords")
+        self.name = name
+        self.scan_mode = scan_mode
+        self.target_urls = list(target_urls)
+        self.store_url = store_url
+        self.keywords = list(keywords)
+        self.recipients = list(recipients) if recipients else None
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def spec(self):
+        """Everything that defines the job, used to tell whether a reloaded config changed it."""
+        return (self.scan_mode, tuple(self.target_urls), self.store_url, tuple(self.keywords),
+                tuple(self.recipients or ()), self.interval)
+
+
+def job_logger(log_callback, name):
+    """Wraps log_callback so every line is prefixed with the job name."""
+    if log_callback is None:
+        return None
+    def job_log(message, color=None):
+        if message == '\a':
+            return log_callback(message, color)
+        return log_callback(f"[{name}] {message.lstrip()}", color)
+    return job_log
+
+
+class JobManager:
+    """
+    Runs many store and target jobs in one process. Jobs share one browser
+    pool, seen store, HTTP client and email dispatcher, and can be added or
+    removed while the others keep running. With a `reporter_factory` (cluster
+    workers), each job hands its results to reporter_factory(job name)
+    instead of recording them locally.
+    """
+
+    def __init__(self, email_config, log_callback=None, headless=True, pool_size=DRIVER_POOL_SIZE,
+                 metrics_port=METRICS_PORT, metrics_log_interval=METRICS_LOG_INTERVAL, reporter_factory=None,
+                 archive_dir=ARCHIVE_DIR if ARCHIVE_ENABLED else None):
+        self.email_config = email_config
+        self.log_callback = log_callback
+        self.headless = headless
+        self.reporter_factory = reporter_factory
+        self.services = MonitorServices(email_config, log_callback, headless=headless, pool_size=pool_size,
+                                        metrics_port=metrics_port, metrics_log_interval=metrics_log_interval,
+                                        local_state=reporter_factory is None, archive_dir=archive_dir)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _job_log(self, name):
+        return job_logger(self.log_callback, name)
+
+    def add_job(self, job):
+        with self._lock:
+            if job.name in self._jobs:
+                raise ValueError(f"job {job.name!r} is already running")
+            job.thread = threading.Thread(
+                target=run_monitor, name=f"job-{job.name}", daemon=True,
+                args=(job.stop_event, job.scan_mode, job.target_urls, job.store_url, job.keywords,
+                      self.email_config, self._job_log(job.name)),
+                kwargs={"headless": self.headless, "services": self.services,
+                        "recipients": job.recipients, "interval": job.interval,
+                        "reporter": self.reporter_factory(job.name) if self.reporter_factory else None},
+            )
+            self._jobs[job.name] = job
+            job.thread.start()
+        return job
+
+    def remove_job(self, name, timeout=30):
+        with self._lock:
+            job = self._jobs.pop(name, None)
+        if job is None:
+            return False
+        job.stop_event.set()
+        job.thread.join(timeout)
+        return True
+
+    def sync(self, jobs):
+        """Makes the running set match `jobs`: starts new ones, stops dropped ones, restarts changed ones."""
+        wanted = {job.name: job for job in jobs}
+        for name in self.names():
+            current = self._jobs.get(name)
+            if name not in wanted or (current is not None and current.spec() != wanted[name].spec()):
+                self.remove_job(name)
+        for name, job in wanted.items():
+            if name not in self._jobs:
+                self.add_job(job)
+
+    def names(self):
+        with self._lock:
+            return list(self._jobs)
+
+    def alive(self):
+        with self._lock:
+            return [name for name, job in self._jobs.items() if job.thread.is_alive()]
+
+    def close(self, timeout=30):
+        for name in self.names():
+            self._jobs[name].stop_event.set()
+        for name in self.names():
+            self.remove_job(name, timeout)
+        self.services.close()
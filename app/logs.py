@@ -0,0 +1,42 @@
+import logging
+import logging.handlers
+import os
+import queue
+
+from app.config import LOG_TO_FILE, LOG_FILE, LOG_FILE_MAX_BYTES, LOG_FILE_BACKUPS
+
+_listener = None
+_queue_handler = None
+
+def get_file_logger():
+    """
+    Returns the "lazwatch" logger that keeps the full monitor history in a
+    rotating file. Records are handed to a background listener through a
+    queue, so callers never wait on disk I/O.
+    """
+    global _listener, _queue_handler
+    logger = logging.getLogger("lazwatch")
+    if _listener is None and LOG_TO_FILE:
+        os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding="utf-8")
+        file_handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+        records = queue.SimpleQueue()
+        _queue_handler = logging.handlers.QueueHandler(records)
+        logger.addHandler(_queue_handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        _listener = logging.handlers.QueueListener(records, file_handler)
+        _listener.start()
+    return logger
+
+def log_level_for(color):
+    return logging.ERROR if color == "red" else logging.WARNING if color == "yellow" else logging.INFO
+
+def stop_file_logger():
+    global _listener, _queue_handler
+    if _listener is not None:
+        logging.getLogger("lazwatch").removeHandler(_queue_handler)
+        _listener.stop()
+        _listener = None
+        _queue_handler = None
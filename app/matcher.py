@@ -0,0 +1,125 @@
+from collections import deque
+
+from app.config import KEYWORD_WORD_BOUNDARY, KEYWORD_AUTOMATON_MIN
+
+def normalize_text(text: str):
+    return ' '.join((text or "").split()).lower()
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over all watched keywords, built once per monitor
+    run. Scanning a card costs one pass over its text no matter how many
+    keywords are watched. Below `automaton_min` keywords a plain substring
+    search per keyword is cheaper, and is used instead.
+
+    Keywords prefixed with "-" are negative: a card containing one of them
+    never matches. With word_boundary=True a keyword only counts when it is
+    not glued to other letters or digits ("ps5" won't hit "ps5x").
+    """
+
+    def __init__(self, keywords, word_boundary=KEYWORD_WORD_BOUNDARY, automaton_min=KEYWORD_AUTOMATON_MIN):
+        self.word_boundary = word_boundary
+        self.keywords = []      # original spelling, indexed by keyword id
+        self.negative = []      # parallel flags
+        self._phrases = []      # normalized, parallel
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]        # keyword ids ending exactly at this node
+        self._out_link = [0]    # nearest suffix node that has outputs
+
+        for raw in keywords:
+            raw = (raw or "").strip()
+            is_negative = raw.startswith("-")
+            phrase = normalize_text(raw[1:] if is_negative else raw)
+            if not phrase:
+                continue
+            self.keywords.append(raw[1:].strip() if is_negative else raw)
+            self.negative.append(is_negative)
+            self._phrases.append(phrase)
+        self._lengths = [len(phrase) for phrase in self._phrases]
+        self.use_automaton = len(self._phrases) >= automaton_min
+        self._spaced = any(" " in phrase for phrase in self._phrases)
+        if self.use_automaton:
+            for kid, phrase in enumerate(self._phrases):
+                self._add(phrase, kid)
+            self._build()
+
+    def _add(self, phrase, kid):
+        node = 0
+        for ch in phrase:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._out_link.append(0)
+            node = nxt
+        self._out[node].append(kid)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                fail = self._fail[child]
+                self._out_link[child] = fail if self._out[fail] else self._out_link[fail]
+
+    def _is_bounded(self, text, start, end):
+        before = text[start - 1] if start > 0 else " "
+        after = text[end + 1] if end + 1 < len(text) else " "
+        return not before.isalnum() and not after.isalnum()
+
+    def _scan_plain(self, text):
+        # Whitespace runs only matter to keywords of several words; lower() is enough for the rest
+        text = normalize_text(text) if self._spaced else (text or "").lower()
+        found = {kid for kid, phrase in enumerate(self._phrases) if phrase in text}
+        if self.word_boundary:
+            found = {kid for kid in found if self._bounded_anywhere(text, self._phrases[kid])}
+        return found
+
+    def _bounded_anywhere(self, text, phrase):
+        start = text.find(phrase)
+        while start >= 0:
+            if self._is_bounded(text, start, start + len(phrase) - 1):
+                return True
+            start = text.find(phrase, start + 1)
+        return False
+
+    def scan(self, text):
+        """Returns the set of keyword ids found in text."""
+        if not self.use_automaton:
+            return self._scan_plain(text)
+        text = normalize_text(text)
+        goto, fail, out, out_link = self._goto, self._fail, self._out, self._out_link
+        found = set()
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            hit = node if out[node] else out_link[node]
+            while hit:
+                for kid in out[hit]:
+                    if kid in found:
+                        continue
+                    if self.word_boundary and not self._is_bounded(text, i - self._lengths[kid] + 1, i):
+                        continue
+                    found.add(kid)
+                hit = out_link[hit]
+        return found
+
+    def find(self, text):
+        """Returns the positive keywords hit by text, or [] if a negative keyword is present."""
+        found = self.scan(text)
+        if any(self.negative[kid] for kid in found):
+            return []
+        return [self.keywords[kid] for kid in sorted(found)]
@@ -0,0 +1,173 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.config import METRICS_HOST
+
+# Histogram bucket upper bounds in seconds, shared by every stage
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class MetricsRegistry:
+    """
+    In-process counters and per-stage timing histograms. Everything in the
+    monitor reports into the module-level METRICS instance; it can be read
+    as a dict, as Prometheus text, or summarised into the log.
+    """
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._stages = {}
+        self.started = time.time()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            s = self._stages.get(stage)
+            if s is None:
+                s = self._stages[stage] = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(self.buckets)}
+            s["count"] += 1
+            s["sum"] += seconds
+            s["max"] = max(s["max"], seconds)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    s["buckets"][i] += 1
+                    break
+
+    @contextmanager
+    def span(self, stage):
+        """Times the enclosed block as one sample of `stage`, whether or not it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            counters = {}
+            for (name, labels), value in sorted(self._counters.items()):
+                counters.setdefault(name, []).append({"labels": dict(labels), "value": value})
+            stages = {}
+            for stage, s in sorted(self._stages.items()):
+                stages[stage] = {
+                    "count": s["count"], "sum": round(s["sum"], 6), "max": round(s["max"], 6),
+                    "avg": round(s["sum"] / s["count"], 6) if s["count"] else 0.0,
+                    "buckets": dict(zip([str(b) for b in self.buckets], s["buckets"])),
+                }
+        return {"uptime": round(time.time() - self.started, 1), "counters": counters, "stages": stages}
+
+    def counter_total(self, name, **labels):
+        want = set(labels.items())
+        with self._lock:
+            return sum(v for (n, lbls), v in self._counters.items() if n == name and want <= set(lbls))
+
+    def prometheus_text(self):
+        snap = self.snapshot()
+        lines = []
+        for name, series in snap["counters"].items():
+            metric = f"lazwatch_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for entry in series:
+                lines.append(f"{metric}{format_labels(entry['labels'])} {entry['value']}")
+        if snap["stages"]:
+            lines.append("# TYPE lazwatch_stage_seconds histogram")
+        for stage, s in snap["stages"].items():
+            cumulative = 0
+            for bound, n in s["buckets"].items():
+                cumulative += n
+                lines.append(f'lazwatch_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'lazwatch_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {s["count"]}')
+            lines.append(f'lazwatch_stage_seconds_sum{{stage="{stage}"}} {s["sum"]}')
+            lines.append(f'lazwatch_stage_seconds_count{{stage="{stage}"}} {s["count"]}')
+        lines.append("# TYPE lazwatch_uptime_seconds gauge")
+        lines.append(f"lazwatch_uptime_seconds {snap['uptime']}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """One log line: the headline counters and the stages that took the most time."""
+        snap = self.snapshot()
+        verdicts = {e["labels"].get("verdict"): e["value"] for e in snap["counters"].get("verdicts", [])}
+        parts = [
+            f"checks {self.counter_total('checks')}",
+            f"in/out/unknown {verdicts.get('in_stock', 0)}/{verdicts.get('sold_out', 0)}/{verdicts.get('unknown', 0)}",
+            f"errors {self.counter_total('errors')}",
+            f"alerts {self.counter_total('alerts')}",
+        ]
+        busiest = sorted(snap["stages"].items(), key=lambda kv: kv[1]["sum"], reverse=True)[:5]
+        if busiest:
+            parts.append("time: " + ", ".join(f"{stage} {s['sum']:.1f}s/{s['count']} (avg {s['avg'] * 1000:.0f} ms)"
+                                              for stage, s in busiest))
+        return "Metrics: " + "; ".join(parts)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._stages.clear()
+            self.started = time.time()
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}"
+
+
+METRICS = MetricsRegistry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body, ctype = METRICS.prometheus_text().encode(), "text/plain; version=0.0.4"
+        elif path == "/metrics.json":
+            body, ctype = json.dumps(METRICS.snapshot()).encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host=METRICS_HOST):
+    """Serves /metrics (Prometheus text) and /metrics.json on a daemon thread. Returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+class MetricsLogger:
+    """Writes METRICS.summary() to the log every `interval` seconds until stopped."""
+
+    def __init__(self, log_callback, interval):
+        self.log_callback = log_callback
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-log", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.log_callback(METRICS.summary(), "cyan")
+
+    def stop(self):
+        self._stop.set()
@@ -1,184 +1,402 @@
 import time
 import random
-import re
-from selenium.webdriver.common.by import By
+from concurrent.futures import ThreadPoolExecutor
 
 # REMOVED 'log_to_gui' from this import list
 from app.utils import (
-    setup_driver, load_seen, save_seen, now_iso, play_alarm, 
-    human_like_wait, human_like_scroll, normalize_title
+    now_iso, play_alarm,
+    human_like_wait, human_like_scroll
 )
-from app.email_service import send_notification_email
-
-def is_sold_out_text(card_text: str):
-    card_text = (card_text or "").lower()
-    return any(x in card_text for x in ["sold out", "out of stock", "no stock", "unavailable", "temporarily unavailable"])
+from app.dom import card_sold_out, extract_cards, classify_availability, wait_for_product_grid, wait_for_stock_state
+from app.storage import save_seen, seen_key, stable_key, target_key, item_id_from_url
+from app.config import (
+    DRIVER_POOL_SIZE, DRIVER_LEAN, STORE_CATALOG_JSON, STORE_CATALOG_RETRY, SEEN_REFRESH_INTERVAL, TARGET_CONCURRENCY
+)
+from app.services import MonitorServices
+from app.driver import BrowserSession
+from app.pdp import parse_availability, url_says_out_of_stock, check_product_availability_http, target_variant
+from app.scanner import scan_targets
+from app.matcher import KeywordMatcher
+from app.crawler import StoreCrawler, card_key
+from app.catalog import CatalogSource
+from app.fingerprint import FingerprintCache, card_fingerprint, grid_fingerprint
+from app.scheduler import TargetScheduler, record_change
+from app.alerts import record_alert
+from app.metrics import METRICS
 
-def title_matches_any_keyword(text: str, keywords: list):
-    text = (text or "").lower()
-    return any(kw.lower() in text for kw in keywords)
+def target_identity(target_url: str):
+    """
+    The seen key and display title of a target. Targets never share a key
+    with store listings of the same item (see target_key), and a "#sku=" /
+    "#variant=" target is tracked apart from its product.
+    """
+    page_url = target_url.split("#", 1)[0]
+    item_id = item_id_from_url(page_url)
+    title = f"[TARGET] Product ID {item_id}" if item_id is not None else f"[TARGET] {page_url.split('/')[-1]}"
+    sku_id, variant = target_variant(target_url)
+    if sku_id is None and not variant:
+        return target_key(page_url), title
+    label = f"SKU {sku_id}" if sku_id is not None else variant
+    return stable_key(f"{item_id or page_url}#{label.lower()}"), f"{title} ({label})"
 
-def extract_title_and_url(card):
-    title = ""
-    url = ""
-    try:
-        link = card.find_element(By.CSS_SELECTOR, "a[href*='/products/'], a[href*='/product/']")
-        url = link.get_attribute("href") or ""
-        title = (link.text or "").strip()
-        if not title:
-            img = card.find_element(By.CSS_SELECTOR, "img")
-            title = img.get_attribute("alt") or img.get_attribute("title") or ""
-    except Exception:
-        pass
-    return title or "Unknown Title", url or ""
+def split_hot_targets(target_urls):
+    """Lines starting with "!" mark hot targets that are always polled at the fastest interval."""
+    urls, hot = [], []
+    for line in target_urls:
+        url = line.lstrip("!").strip()
+        if not url: continue
+        urls.append(url)
+        if line.startswith("!"):
+            hot.append(url)
+    return urls, hot
 
-def check_product_availability_lazada(url: str, driver) -> bool:
+def check_product_availability_lazada(url: str, driver, http_client=None, archive=None) -> bool:
     if not url: return None
-    try:
-        if re.search(r"(?:[?&]|%3F|%26)stock(?:=|%3D)0", url, re.IGNORECASE):
-            return False
-        driver.get(url)
-        time.sleep(random.uniform(2.0, 4.0))
-        page_src = driver.page_source.lower()
-
-        m = re.search(r'"stock"\s*:\s*(\d+)', page_src)
-        if m:
-            return int(m.group(1)) > 0
-
-        if any(x in page_src for x in ['"issoldout":true', '"is_sold_out":true', '"available":false']):
-            return False
-        
-        # Check Buttons
-        buy_keywords = ["add to cart", "buy now", "add to bag", "purchase", "checkout", "buy"]
-        sold_keywords = ["sold out", "out of stock", "notify me", "unavailable"]
-
-        candidates = driver.find_elements(By.XPATH, "//button | //a[@role='button'] | //input[@type='button']")
-        for el in candidates:
-            try:
-                if not el.is_displayed(): continue
-                txt = (el.text or el.get_attribute("value") or "").strip().lower()
-                if not txt:
-                    txt = driver.execute_script("return arguments[0].innerText;", el).strip().lower()
-                
-                if (el.get_attribute("disabled") or "").lower() in ("true", "disabled"): continue
-
-                if any(k in txt for k in buy_keywords): return True
-                if any(k in txt for k in sold_keywords): return False
-            except Exception: continue
-            
+    if url_says_out_of_stock(url):
+        return False
+
+    # Fast path: the embedded stock JSON is usually in the raw HTML already
+    if http_client is not None:
+        verdict = check_product_availability_http(url, http_client, archive=archive)
+        if verdict is not None:
+            return verdict
+
+    if driver is None:
         return None
+
+    try:
+        with METRICS.span("navigation"):
+            driver.get(url)
+        with METRICS.span("page_wait"):
+            if DRIVER_LEAN:
+                wait_for_stock_state(driver)
+            else:
+                time.sleep(random.uniform(2.0, 4.0))
+        sku_id, variant = target_variant(url)
+        page_src = driver.page_source
+        with METRICS.span("parse"):
+            verdict = parse_availability(page_src, sku_id, variant)
+        evidence = None
+        # Check Buttons (they only describe whichever variant the page preselected)
+        if verdict is None and sku_id is None and not variant:
+            with METRICS.span("classification"):
+                verdict, evidence = classify_availability(driver)
+        if archive is not None:
+            archive.record("target", url, verdict, page=page_src, source="browser", evidence=evidence)
+        return verdict
     except Exception:
+        METRICS.inc("errors", stage="browser_check")
+        if isinstance(driver, BrowserSession):
+            driver.suspect = True
         return None
 
-def run_monitor(stop_event, scan_mode, target_urls, store_url, keywords, email_config, log_callback):
+def fetch_store_cards(driver, page_url, archive=None):
+    with METRICS.span("navigation"):
+        driver.get(page_url)
+    with METRICS.span("page_wait"):
+        if DRIVER_LEAN:
+            wait_for_product_grid(driver)
+        else:
+            time.sleep(random.uniform(2, 4))
+    with METRICS.span("card_extraction"):
+        cards = extract_cards(driver)
+    if archive is not None:
+        archive.record("cards", page_url, [card_sold_out(card) for card in cards], cards=cards, source="browser")
+    return cards
+
+def process_target_result(target_url, page_avail, seen, alert_policy, notifier, recipients=None, log_callback=None):
+    """Records one target check and alerts on a sold-out -> in-stock edge. Returns True if the stock state changed."""
+    changed = False
+    title_key, title = target_identity(target_url)
+    METRICS.inc("checks", mode="target")
+    METRICS.inc("verdicts", verdict={True: "in_stock", False: "sold_out"}.get(page_avail, "unknown"))
+
+    record = seen.get(title_key)
+    was_sold_out = record.get("sold_out") if record else None
+    now, stamp = now_iso(), int(time.time())
+
+    # An inconclusive check keeps the last known state so it can't fake an edge
+    if page_avail is True: sold_out = False
+    elif page_avail is False: sold_out = True
+    else: sold_out = was_sold_out if was_sold_out is not None else True
+
+    # Save Data
+    if record is None:
+        seen[title_key] = {"title": title, "url": target_url, "first_seen": stamp, "last_seen": stamp, "sold_out": sold_out}
+    elif was_sold_out != sold_out:
+        changed = True
+        seen.touch(title_key, last_seen=stamp, sold_out=sold_out, changes=record_change(record, stamp))
+    else:
+        # Nothing changed, so this needn't cost a write of its own
+        seen.refresh(title_key, last_seen=stamp)
+
+    # Notify only when it comes back IN STOCK
+    should_alert, reason = alert_policy.check(record, was_sold_out, sold_out)
+    if should_alert:
+        seen.touch(title_key, alerts=record_alert(seen[title_key]))
+        METRICS.inc("alerts", kind="restock")
+        subject = f"AVAILABLE: {title} @ {now}"
+        body = f"Target product IN STOCK!\n\nTitle: {title}\nTime: {now}\nURL: {target_url}"
+        notifier.notify(subject, body, recipients)
+        if log_callback: log_callback(f"!!! READY TO BUY !!! {title}", "green")
+        play_alarm(log_callback)
+    elif not sold_out:
+        if log_callback: log_callback(f"In stock ({reason}, no alert): {title}", "green")
+    elif page_avail is None:
+        if log_callback: log_callback(f"?? STOCK UNKNOWN ?? {title}", "yellow")
+    else:
+        if log_callback: log_callback(f":: OUT OF STOCK :: {title}", "red")
+    return changed
+
+def process_store_cards(product_cards, matcher, seen, alert_policy, notifier, recipients=None,
+                        log_callback=None, stop_event=None, item_prints=None):
+    """
+    Matches listing cards against the keywords, records them and alerts on
+    new listings. Returns the new item count. With a FingerprintCache in
+    `item_prints`, cards whose title, price and stock state are unchanged
+    since the last pass skip matching and recording.
+    """
+    new_items_found = 0
+    matching = 0.0
+    skipped = 0
+    for card in product_cards:
+        if stop_event is not None and stop_event.is_set(): break
+        try:
+            if item_prints is not None:
+                ckey, card_fp = card_key(card), card_fingerprint(card)
+                last_fp, title_key = item_prints.get(ckey)
+                if last_fp == card_fp and (title_key is None or title_key in seen):
+                    skipped += 1
+                    if title_key is not None:
+                        seen.refresh(title_key, last_seen=int(time.time()))
+                    continue
+
+            started = time.perf_counter()
+            hits = matcher.find(card.text)
+            matching += time.perf_counter() - started
+            if not hits or not card.url:
+                if item_prints is not None: item_prints.put(ckey, card_fp)
+                continue
+
+            title, url = card.title or "Unknown Title", card.url
+            sold_out = card_sold_out(card)
+
+            title_key = seen_key(url, title)
+            now, stamp = now_iso(), int(time.time())
+
+            if title_key not in seen:
+                # New Item Found
+                new_items_found += 1
+                seen[title_key] = {"title": title, "url": url, "first_seen": stamp, "last_seen": stamp, "sold_out": sold_out}
+
+                should_alert, reason = alert_policy.check(None, None, False)
+                if should_alert:
+                    seen.touch(title_key, alerts=record_alert(None))
+                    METRICS.inc("alerts", kind="new_listing")
+                    subject = f"NEW LISTING: {title}"
+                    body = f"NEW product detected!\n\nTitle: {title}\nKeywords: {', '.join(hits)}\nTime: {now}\nURL: {url}"
+                    notifier.notify(subject, body, recipients)
+                    if log_callback: log_callback(f"!!! NEW LISTING !!! {title}", "green")
+                    play_alarm(log_callback)
+                elif log_callback:
+                    log_callback(f"New listing ({reason}, no alert): {title}", "green")
+                save_seen(seen, log_callback)
+            else:
+                if seen[title_key].get("sold_out") != sold_out:
+                    seen.touch(title_key, last_seen=stamp, sold_out=sold_out)
+                else:
+                    seen.refresh(title_key, last_seen=stamp)
+                if log_callback: log_callback(f"Tracking: {title}", "default")
+            if item_prints is not None: item_prints.put(ckey, card_fp, title_key)
+
+        except Exception:
+            METRICS.inc("errors", stage="store_card")
+            continue
+    METRICS.observe("keyword_matching", matching)
+    if skipped:
+        METRICS.inc("unchanged", skipped, level="item")
+    return new_items_found
+
+def refresh_store_cards(product_cards, seen):
+    """
+    Bumps last_seen of the listed items already in the seen store, for a pass
+    whose grid was unchanged and so skipped process_store_cards; otherwise a
+    quiet store's listings age out of the store and alert as new later.
+    """
+    keys = [seen_key(card.url, card.title or "Unknown Title") for card in product_cards if card.url]
+    return seen.refresh_many(keys, last_seen=int(time.time()))
+
+def run_monitor(stop_event, scan_mode, target_urls, store_url, keywords, email_config, log_callback,
+                headless=False, services=None, recipients=None, interval=None, reporter=None):
+    """
+    Runs one store or target job until stop_event is set. Jobs started by a
+    JobManager pass its shared `services`; otherwise the job opens (and
+    closes) its own. `recipients` overrides the alert recipients for this job
+    and `interval` its base polling interval in seconds. A `reporter` (see
+    app.cluster.ClusterReporter) takes over recording: the job only checks
+    and passes on its verdicts and listing cards.
+    """
     if log_callback:
         log_callback(f"Starting monitor in **{scan_mode.upper()}** mode.", "blue")
-    
-    seen = load_seen()
-    driver = setup_driver(headless=False, log_callback=log_callback)
-    if not driver:
-        return
+
+    owns_services = services is None
+    if owns_services:
+        try:
+            # Store mode only ever renders one page at a time
+            services = MonitorServices(email_config, log_callback, headless=headless,
+                                       pool_size=DRIVER_POOL_SIZE if scan_mode == 'target' else 1)
+        except Exception as e:
+            if log_callback: log_callback(f"Failed to start monitor: {e}", "red")
+            return
+    seen, http_client, pool = services.seen, services.http_client, services.pool
+    notifier, alert_policy, archive = services.notifier, services.alert_policy, services.archive
+
+    # Target mode on the HTTP fast path and store mode on the catalog JSON only open a browser for fallbacks
+    catalog = CatalogSource(http_client, archive=archive) if scan_mode == 'store' and STORE_CATALOG_JSON and http_client else None
+    if http_client is None or (scan_mode == 'store' and catalog is None):
+        with pool.lease() as driver:
+            if driver is None:
+                if owns_services: services.close()
+                return
+
+    def check_target(target_url):
+        verdict = check_product_availability_http(target_url, http_client, services.page_cache, archive) if http_client else None
+        if verdict is None:
+            METRICS.inc("browser_fallbacks")
+            with pool.lease() as driver:
+                verdict = check_product_availability_lazada(target_url, driver, archive=archive)
+        return verdict
+
+    target_urls, hot_urls = split_hot_targets(target_urls)
+
+    def target_history(target_url):
+        if reporter is not None:
+            return reporter.history(target_url)
+        record = seen.get(target_identity(target_url)[0])
+        return record.get("changes") if record else None
+
+    def save():
+        if reporter is None:
+            save_seen(seen, log_callback)
+
+    # The request budget and per-host limit are the process's, shared with every other job
+    if interval:
+        scheduler = TargetScheduler(target_urls, target_history, hot=hot_urls, min_interval=interval,
+                                    budget=services.request_budget)
+    else:
+        scheduler = TargetScheduler(target_urls, target_history, hot=hot_urls, budget=services.request_budget)
+    # One worker pool for every batch of this job
+    executor = ThreadPoolExecutor(TARGET_CONCURRENCY, thread_name_prefix="target") if scan_mode == 'target' else None
+
+    def handle_target_result(target_url, page_avail):
+        changed = False
+        try:
+            if reporter is not None:
+                changed = reporter.target_result(target_url, page_avail)
+            else:
+                changed = process_target_result(target_url, page_avail, seen, alert_policy, notifier,
+                                                recipients=recipients, log_callback=log_callback)
+        except Exception as e:
+            METRICS.inc("errors", stage="target")
+            if log_callback: log_callback(f"Error checking target: {e}", "red")
+        finally:
+            scheduler.record(target_url, changed)
+
+    matcher = KeywordMatcher(keywords)
+    # Listings recorded in the seen store count as known, so a restart doesn't walk every page again
+    is_known = (lambda card: seen_key(card.url, card.title) in seen) if seen is not None else None
+    crawler = StoreCrawler(store_url, is_known=is_known)
+    item_prints = FingerprintCache()
+    last_grid = None
+    last_reported = 0.0
+    catalog_retry_at = 0.0
+
+    def run_store_cycle(fetch_cards, driver=None):
+        """Returns the number of new items found, or None if the store page failed to load."""
+        nonlocal last_grid, last_reported
+        METRICS.inc("checks", mode="store")
+        try:
+            product_cards, fresh, pages = crawler.crawl(fetch_cards, stop_event)
+        except Exception as e:
+            METRICS.inc("errors", stage="navigation")
+            if isinstance(driver, BrowserSession):
+                driver.suspect = True
+            if log_callback: log_callback(f"Nav Error: {e}", "red")
+            return None
+        if log_callback: log_callback(f"Walked {pages} page(s): {len(product_cards)} card(s), {fresh} not seen before.", "default")
+
+        # Same cards with the same title/price/stock as last pass: nothing to match or record
+        grid = grid_fingerprint(product_cards)
+        # A coordinator only refreshes what it is sent, so workers still report an unchanged grid now and then
+        if grid == last_grid and (reporter is None or time.monotonic() - last_reported < SEEN_REFRESH_INTERVAL):
+            METRICS.inc("unchanged", level="page")
+            new_items_found = 0
+            if seen is not None:
+                refresh_store_cards(product_cards, seen)
+        elif reporter is not None:
+            new_items_found = reporter.store_cards(product_cards)
+            last_reported = time.monotonic()
+            if not stop_event.is_set():
+                last_grid = grid
+        else:
+            new_items_found = process_store_cards(product_cards, matcher, seen, alert_policy, notifier,
+                                                  recipients=recipients, log_callback=log_callback,
+                                                  stop_event=stop_event, item_prints=item_prints)
+            if not stop_event.is_set():
+                last_grid = grid
+        if driver is not None and not stop_event.is_set():
+            with METRICS.span("scroll"):
+                human_like_scroll(driver)
+        return new_items_found
 
     while not stop_event.is_set():
         try:
             # --- TARGET MODE ---
             if scan_mode == 'target':
-                if log_callback: log_callback(f"\nChecking {len(target_urls)} target URL(s)...", "blue")
-                
-                for target_url in target_urls:
-                    if stop_event.is_set(): break
-                    try:
-                        match = re.search(r'pdp-i(\d+)\.html', target_url)
-                        title_key = f"target_{match.group(1)}" if match else f"target_{hash(target_url)}"
-                        title = f"[TARGET] Product ID {match.group(1)}" if match else f"[TARGET] {target_url.split('/')[-1]}"
-                        
-                        is_new_listing = title_key not in seen
-                        if log_callback: log_callback(f"* Deep checking: {title}...", "cyan")
-                        
-                        page_avail = check_product_availability_lazada(target_url, driver)
-                        now = now_iso()
-
-                        sold_out = True
-                        if page_avail is True: sold_out = False
-                        elif page_avail is False: sold_out = True
-                        
-                        # Save Data
-                        if is_new_listing:
-                            seen[title_key] = {"title": title, "url": target_url, "first_seen": now, "last_seen": now, "sold_out": sold_out}
-                        else:
-                            seen[title_key].update({"last_seen": now, "sold_out": sold_out})
-                        save_seen(seen, log_callback)
-
-                        # Notify if IN STOCK
-                        if not sold_out:
-                            subject = f"AVAILABLE: {title} @ {now}"
-                            body = f"Target product IN STOCK!\n\nTitle: {title}\nTime: {now}\nURL: {target_url}"
-                            send_notification_email(subject, body, email_config, log_callback)
-                            if log_callback: log_callback(f"!!! READY TO BUY !!! {title}", "green")
-                            play_alarm(log_callback)
-                        else:
-                            if log_callback: log_callback(f":: OUT OF STOCK :: {title}", "red")
-
-                    except Exception as e:
-                        if log_callback: log_callback(f"Error checking target: {e}", "red")
+                due = scheduler.pop_due()
+                if due:
+                    if log_callback: log_callback(f"\nChecking {len(due)} of {len(target_urls)} target URL(s)...", "blue")
+                    scan_targets(due, check_target, handle_target_result, stop_event, limiter=services.host_limiter,
+                                 executor=executor)
+                    save()
 
-                if not stop_event.is_set():
-                    human_like_wait(min_sec=10, max_sec=20, log_callback=log_callback)
+                wait_time = scheduler.next_wake()
+                if log_callback and due and wait_time >= 5:
+                    log_callback(f"Next target due in ~{wait_time:.1f} seconds...")
+                stop_event.wait(wait_time)
 
             # --- STORE MODE ---
             elif scan_mode == 'store':
                 if log_callback: log_callback(f"\nChecking store URL (Fast Scan)...", "blue")
-                try:
-                    driver.get(store_url)
-                    time.sleep(random.uniform(2, 4))
-                except Exception as e:
-                    if log_callback: log_callback(f"Nav Error: {e}", "red")
-                    continue
+                new_items_found = None
+                if catalog is not None and time.monotonic() >= catalog_retry_at:
+                    new_items_found = run_store_cycle(catalog.fetch_cards)
+                    if new_items_found is None:
+                        catalog_retry_at = time.monotonic() + STORE_CATALOG_RETRY
+                        if log_callback: log_callback(f"Catalog JSON unavailable, using the browser for the next {STORE_CATALOG_RETRY // 60} min.", "yellow")
+                if new_items_found is None:
+                    with pool.lease() as driver:
+                        if driver is None:
+                            raise RuntimeError("no browser session available")
+                        new_items_found = run_store_cycle(lambda page_url: fetch_store_cards(driver, page_url, archive), driver)
+                save()
 
-                product_cards = driver.find_elements(By.CSS_SELECTOR, "div[data-tracking='product-card'], div[data-qa-locator='productItem'], div.c2prKC")
-                new_items_found = 0
-
-                for card in product_cards:
-                    if stop_event.is_set(): break
-                    try:
-                        card_text = card.text or ""
-                        if not title_matches_any_keyword(card_text, keywords): continue
-
-                        title, url = extract_title_and_url(card)
-                        if not url: continue
-
-                        title_key = normalize_title(title)
-                        now = now_iso()
-
-                        if title_key not in seen:
-                            # New Item Found
-                            new_items_found += 1
-                            seen[title_key] = {"title": title, "url": url, "first_seen": now, "last_seen": now, "sold_out": False}
-                            save_seen(seen, log_callback)
-                            
-                            subject = f"NEW LISTING: {title}"
-                            body = f"NEW product detected!\n\nTitle: {title}\nTime: {now}\nURL: {url}"
-                            send_notification_email(subject, body, email_config, log_callback)
-                            
-                            if log_callback: log_callback(f"!!! NEW LISTING !!! {title}", "green")
-                            play_alarm(log_callback)
-                            break # Break to refresh immediately
-                        else:
-                             seen[title_key].update({"last_seen": now})
-                             save_seen(seen, log_callback)
-                             if log_callback: log_callback(f"Tracking: {title}", "default")
-
-                    except Exception: continue
-                
-                if new_items_found > 0:
-                     if log_callback: log_callback("New item found, re-scanning immediately...", "blue")
-                elif not stop_event.is_set():
-                    human_like_scroll(driver)
-                    human_like_wait(min_sec=8, max_sec=15, log_callback=log_callback)
+                if new_items_found:
+                    if log_callback: log_callback(f"{new_items_found} new item(s) found this pass.", "blue")
+                if not stop_event.is_set():
+                    min_sec, max_sec = (interval * 0.8, interval * 1.2) if interval else (8, 15)
+                    if new_items_found is None:
+                        # The store didn't load (blocked, captcha...): back off like a loop error, don't retry at once
+                        min_sec, max_sec = max(min_sec, 10), max(max_sec, 20)
+                    human_like_wait(min_sec=min_sec, max_sec=max_sec, log_callback=log_callback, stop_event=stop_event)
 
         except Exception as e:
+            METRICS.inc("errors", stage="loop")
             if log_callback: log_callback(f"Loop error: {e}", "red")
-            if not stop_event.is_set(): human_like_wait(10, 20)
+            if not stop_event.is_set(): human_like_wait(10, 20, stop_event=stop_event)
 
-    if log_callback: log_callback("Monitor stopped. Closing browser.", "blue")
-    driver.quit()
\ No newline at end of file
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+    if log_callback: log_callback("Monitor stopped.", "blue")
+    if owns_services:
+        services.close()
@@ -0,0 +1,203 @@
+import json
+import re
+from collections import namedtuple
+from urllib.parse import unquote, urlsplit
+
+from app.fingerprint import fingerprint
+from app.metrics import METRICS
+
+STOCK_RE = re.compile(r'"stock"\s*:\s*(\d+)', re.IGNORECASE)
+SOLD_OUT_RE = re.compile(r'"(?:issoldout|is_sold_out)"\s*:\s*true|"available"\s*:\s*false', re.IGNORECASE)
+STOCK_ZERO_URL_RE = re.compile(r"(?:[?&]|%3F|%26)stock(?:=|%3D)0", re.IGNORECASE)
+# Where the PDP's page state starts: the JSON object follows the marker
+STATE_MARKERS = ("var __moduleData__ = ", "window.__moduleData__ = ", "__moduleData__=")
+
+_decoder = json.JSONDecoder()
+
+# One purchasable variant of a product. stock is None when the page doesn't say.
+Variant = namedtuple("Variant", ["sku_id", "name", "stock", "price", "in_stock"])
+# stock is the product-level figure from the default "0" entry, when there is one
+ProductState = namedtuple("ProductState", ["item_id", "title", "sold_out", "stock", "variants"])
+
+
+def url_says_out_of_stock(url: str):
+    return bool(STOCK_ZERO_URL_RE.search(url or ""))
+
+
+def target_variant(url: str):
+    """
+    The variant a target URL asks for, from its fragment: "#sku=50012" or
+    "#variant=Ice Blue / 256GB" (a bare "#Ice Blue / 256GB" works too).
+    Returns (sku_id, name); both None for a whole-product target.
+    """
+    fragment = unquote(urlsplit(url or "").fragment).strip()
+    if not fragment:
+        return None, None
+    key, sep, value = fragment.partition("=")
+    if sep and key.strip().lower() == "sku":
+        return value.strip(), None
+    if sep and key.strip().lower() == "variant":
+        fragment = value
+    return None, " ".join(fragment.split()) or None
+
+
+def extract_state(page_src: str):
+    """Decodes just the embedded page state object, or returns None if the page has none."""
+    for marker in STATE_MARKERS:
+        start = page_src.find(marker)
+        if start < 0:
+            continue
+        try:
+            state, _ = _decoder.raw_decode(page_src, start + len(marker))
+        except ValueError:
+            continue
+        if isinstance(state, dict):
+            return state
+    return None
+
+
+def parse_product_state(page_src: str):
+    """
+    Reads the product and its per-SKU stock, price and variant names from the
+    embedded page state in one pass. Returns a ProductState, or None when the
+    page carries no state (captcha, login wall, client-rendered shell...).
+    """
+    state = extract_state(page_src) if page_src else None
+    try:
+        fields = state["data"]["root"]["fields"]
+    except (TypeError, KeyError):
+        return None
+    if not isinstance(fields, dict):
+        return None
+
+    product = fields.get("product") or {}
+    sold_out = bool(product.get("isSoldOut"))
+    sku_base = (fields.get("productOption") or {}).get("skuBase") or {}
+    values = {}
+    for prop in sku_base.get("properties") or ():
+        for value in prop.get("values") or ():
+            values[f"{prop.get('pid')}:{value.get('vid')}"] = value.get("name") or ""
+    infos = fields.get("skuInfos") or {}
+
+    variants = []
+    for sku in sku_base.get("skus") or ():
+        sku_id = str(sku.get("skuId") or "")
+        info = infos.get(sku_id) or {}
+        name = " / ".join(values.get(pair, pair) for pair in (sku.get("propPath") or "").split(";") if pair)
+        stock = _stock(info)
+        price = ((info.get("price") or {}).get("salePrice") or {}).get("text") or ""
+        in_stock = stock > 0 if stock is not None else (False if sold_out else None)
+        variants.append(Variant(sku_id, name, stock, price, in_stock))
+
+    item_id = (fields.get("primaryKey") or {}).get("itemId")
+    return ProductState(str(item_id) if item_id else None, product.get("title") or "", sold_out,
+                        _stock(infos.get("0") or {}), variants)
+
+
+def _stock(info):
+    stock = info.get("stock")
+    if isinstance(stock, bool):
+        return None
+    if isinstance(stock, int):
+        return stock
+    return int(stock) if isinstance(stock, str) and stock.isdigit() else None
+
+
+def variant_matches(variant, sku_id=None, name=None):
+    if sku_id is not None:
+        return variant.sku_id == sku_id
+    # Every word of the wanted name has to appear in the variant name ("blue 256gb" matches "Ice Blue / 256GB")
+    have = variant.name.lower().replace("/", " ").split()
+    return all(word in have for word in name.lower().replace("/", " ").split())
+
+
+def state_availability(state, sku_id=None, name=None):
+    """
+    True if the product (or the requested variant) can be bought, False if it
+    is sold out, None if the state doesn't say or no variant matches.
+    """
+    variants = state.variants
+    if sku_id is not None or name:
+        variants = [v for v in variants if variant_matches(v, sku_id, name)]
+        if not variants:
+            return None
+    if any(v.in_stock is True for v in variants):
+        return True
+    if variants and all(v.in_stock is False for v in variants):
+        return False
+    if sku_id is not None or name:
+        return None
+    # Whole product without per-SKU figures: the product-level stock or sold-out flag
+    if state.stock is not None:
+        return state.stock > 0
+    return False if state.sold_out else None
+
+
+def parse_availability(page_src: str, sku_id=None, variant=None):
+    """
+    Reads the stock state embedded in a Lazada product page, for the whole
+    product or for one variant (by SKU id or variant name).
+    Returns True (in stock), False (sold out) or None when the page carries
+    no usable state (captcha, login wall, client-rendered shell...).
+    """
+    if not page_src:
+        return None
+
+    state = parse_product_state(page_src)
+    if state is not None:
+        return state_availability(state, sku_id, variant)
+    if sku_id is not None or variant:
+        # Loose markup can't be tied to a variant
+        return None
+
+    m = STOCK_RE.search(page_src)
+    if m:
+        return int(m.group(1)) > 0
+
+    if SOLD_OUT_RE.search(page_src):
+        return False
+    return None
+
+
+def check_product_availability_http(url: str, client, cache=None, archive=None):
+    """
+    Fetches and parses a product page. With a FingerprintCache, the page is
+    revalidated with a conditional request and a 304 or a byte-identical
+    body returns the previous verdict without parsing. Pages that were
+    parsed are copied to the SnapshotArchive, if one is given.
+    """
+    if not url: return None
+    if url_says_out_of_stock(url):
+        return False
+    try:
+        with METRICS.span("http_fetch"):
+            resp = client.get(url, conditional=cache is not None)
+        page_fp = None
+        if cache is not None:
+            last_fp, last_verdict = cache.get(url)
+            if resp.not_modified:
+                if last_fp is not None:
+                    METRICS.inc("unchanged", level="not_modified")
+                    return last_verdict
+                # The validators outlived the cached verdict; fetch the full page again
+                client.forget(url)
+                with METRICS.span("http_fetch"):
+                    resp = client.get(url, conditional=True)
+            elif resp.status == 200:
+                page_fp = fingerprint(resp.body)
+                if page_fp == last_fp:
+                    METRICS.inc("unchanged", level="page")
+                    return last_verdict
+        if resp.status != 200:
+            return None
+        text = resp.text
+        with METRICS.span("parse"):
+            verdict = parse_availability(text, *target_variant(url))
+        if archive is not None:
+            archive.record("target", url, verdict, page=text)
+        if cache is not None:
+            cache.put(url, page_fp or fingerprint(resp.body), verdict)
+        return verdict
+    except Exception:
+        METRICS.inc("errors", stage="http_fetch")
+        return None
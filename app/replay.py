@@ -0,0 +1,72 @@
+import time
+from collections import namedtuple
+
+from app.catalog import CatalogUnavailable, catalog_card, parse_catalog
+from app.dom import Card, card_sold_out, classify_label
+from app.pdp import parse_availability, target_variant
+
+# One verdict that today's detectors give differently from when the snapshot was recorded.
+# label names the card for card sets ("" for product pages).
+Diff = namedtuple("Diff", ["t", "kind", "url", "label", "recorded", "replayed"])
+
+
+def snapshot_cards(snapshot):
+    """The listing cards of a "catalog" (catalog JSON) or "cards" (browser-extracted) snapshot."""
+    if snapshot["kind"] == "catalog":
+        return [catalog_card(item) for item in parse_catalog(snapshot.get("page") or "", snapshot["url"])]
+    return [Card(*row) for row in snapshot.get("cards") or ()]
+
+
+def evaluate_target(snapshot):
+    """
+    Re-reads an archived product page. Pages the browser fell back to button
+    classification on are re-scored from the recorded button label.
+    """
+    sku_id, variant = target_variant(snapshot["url"])
+    verdict = parse_availability(snapshot.get("page") or "", sku_id, variant)
+    evidence = snapshot.get("evidence")
+    if verdict is None and evidence and sku_id is None and not variant:
+        verdict = classify_label(evidence.get("label"))
+    return verdict
+
+
+def replay(snapshots, matcher=None):
+    """
+    Runs archived snapshots (see app.archive.read_snapshots) through the
+    current target and store detectors, without a browser or network.
+    Returns (stats, diffs): counts of what was replayed, and a Diff for
+    every verdict that no longer matches the recorded one. With a
+    KeywordMatcher, stats["matches"] counts the cards it would match.
+    """
+    stats = {"snapshots": 0, "pages": 0, "card_sets": 0, "cards": 0, "matches": 0, "errors": 0}
+    diffs = []
+    started = time.perf_counter()
+    for snapshot in snapshots:
+        stats["snapshots"] += 1
+        t, kind, url, recorded = snapshot.get("t"), snapshot.get("kind"), snapshot.get("url", ""), snapshot.get("verdict")
+        if kind == "target":
+            stats["pages"] += 1
+            replayed = evaluate_target(snapshot)
+            if replayed != recorded:
+                diffs.append(Diff(t, kind, url, "", recorded, replayed))
+            continue
+
+        stats["card_sets"] += 1
+        try:
+            cards = snapshot_cards(snapshot)
+        except CatalogUnavailable as e:
+            stats["errors"] += 1
+            diffs.append(Diff(t, kind, url, "", f"{len(recorded or ())} card(s)", f"unreadable: {e}"))
+            continue
+        stats["cards"] += len(cards)
+        recorded = recorded or []
+        if len(cards) != len(recorded):
+            diffs.append(Diff(t, kind, url, "", f"{len(recorded)} card(s)", f"{len(cards)} card(s)"))
+        for card, was_sold_out in zip(cards, recorded):
+            sold_out = card_sold_out(card)
+            if sold_out != was_sold_out:
+                diffs.append(Diff(t, kind, url, card.title or card.url, was_sold_out, sold_out))
+        if matcher is not None:
+            stats["matches"] += sum(1 for card in cards if card.url and matcher.find(card.text))
+    stats["seconds"] = time.perf_counter() - started
+    return stats, diffs
@@ -0,0 +1,100 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlsplit
+
+from app.config import TARGET_CONCURRENCY, TARGET_PER_HOST, TARGET_HOST_DELAY
+
+_SKIPPED = object()
+
+
+class HostLimiter:
+    """
+    Caps how many requests may be in flight per host and spaces out request
+    starts on the same host by at least `delay` seconds.
+    """
+
+    def __init__(self, per_host=TARGET_PER_HOST, delay=TARGET_HOST_DELAY):
+        self.per_host = max(1, per_host)
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._next_start = {}
+
+    def _slot(self, host):
+        with self._lock:
+            sem = self._slots.get(host)
+            if sem is None:
+                sem = self._slots[host] = threading.BoundedSemaphore(self.per_host)
+            return sem
+
+    def acquire(self, host, stop_event=None):
+        sem = self._slot(host)
+        while not sem.acquire(timeout=0.2):
+            if stop_event is not None and stop_event.is_set():
+                return False
+
+        # Reserve the next start time for this host, then sleep until it
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_start.get(host, 0.0))
+            self._next_start[host] = start_at + self.delay
+        pause = start_at - time.monotonic()
+        if pause > 0:
+            if stop_event is not None:
+                if stop_event.wait(pause):
+                    sem.release()
+                    return False
+            else:
+                time.sleep(pause)
+        return True
+
+    def release(self, host):
+        self._slot(host).release()
+
+
+def scan_targets(target_urls, check, on_result, stop_event, max_workers=TARGET_CONCURRENCY, limiter=None, executor=None):
+    """
+    Runs check(url) for every URL on a worker pool and hands each verdict to
+    on_result(url, verdict) on the calling thread, in completion order.
+    Returns the number of URLs that were checked. Pass the same `limiter`
+    and `executor` to every batch of a long-running scan, so host spacing
+    carries over and worker threads are reused; without them each call
+    makes (and tears down) its own.
+    """
+    limiter = limiter or HostLimiter()
+
+    def task(url):
+        host = urlsplit(url).netloc
+        if stop_event.is_set() or not limiter.acquire(host, stop_event):
+            return _SKIPPED
+        try:
+            return check(url)
+        finally:
+            limiter.release(host)
+
+    done_count = 0
+    pool = executor or ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="target")
+    pending = {}
+    try:
+        pending = {pool.submit(task, url): url for url in target_urls}
+        while pending and not stop_event.is_set():
+            done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for fut in done:
+                url = pending.pop(fut)
+                try:
+                    verdict = fut.result()
+                except Exception:
+                    verdict = None
+                if verdict is _SKIPPED:
+                    continue
+                done_count += 1
+                on_result(url, verdict)
+    finally:
+        if executor is None:
+            # Don't hold up a stop request on checks that are still in flight
+            pool.shutdown(wait=not stop_event.is_set(), cancel_futures=True)
+        else:
+            for fut in pending:
+                fut.cancel()
+    return done_count
@@ -0,0 +1,150 @@
+import heapq
+import random
+import threading
+import time
+
+from app.config import (
+    SCHED_MIN_INTERVAL, SCHED_MAX_INTERVAL, SCHED_HOT_INTERVAL,
+    SCHED_BACKOFF, SCHED_BUDGET_PER_MINUTE, SCHED_HISTORY, SCHED_BATCH_WINDOW
+)
+
+def record_change(record, when):
+    """Appends a stock-change timestamp (epoch seconds) to a seen record's history."""
+    changes = list(record.get("changes") or [])
+    changes.append(int(when))
+    return changes[-SCHED_HISTORY:]
+
+def changes_near_hour(changes, when, window_hours=1):
+    """True if any past change happened within window_hours of this time of day."""
+    hour = time.localtime(when).tm_hour
+    for ts in changes:
+        diff = abs(time.localtime(ts).tm_hour - hour)
+        if min(diff, 24 - diff) <= window_hours:
+            return True
+    return False
+
+
+class RequestBudget:
+    """
+    Token bucket capping checks per minute; a budget of 0 or less is
+    unlimited. One bucket is shared by every job in the process (see
+    MonitorServices), so the cap holds however many target jobs run.
+    """
+
+    def __init__(self, per_minute=SCHED_BUDGET_PER_MINUTE):
+        self.per_minute = max(0, per_minute or 0)
+        self._tokens = float(self.per_minute)
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(float(self.per_minute), self._tokens + (now - self._refilled) * self.per_minute / 60.0)
+        self._refilled = now
+
+    def take(self):
+        """Spends one check; False if the budget is used up for now."""
+        if self.per_minute <= 0:
+            return True
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def wait(self):
+        """Seconds until take() can succeed again."""
+        if self.per_minute <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            return 0.0 if self._tokens >= 1 else (1 - self._tokens) * 60.0 / self.per_minute
+
+
+class TargetScheduler:
+    """
+    Deadline heap of per-target next-check times.
+
+    Each target's interval starts from its stock-change history: items that
+    changed recently, or usually change around this time of day, are polled
+    at the minimum interval, quiet ones back off towards the maximum. Hot
+    targets are pinned to SCHED_HOT_INTERVAL. Checks are drawn from a
+    RequestBudget: the shared `budget` if given, else one of
+    `budget_per_minute` for this scheduler alone.
+    """
+
+    def __init__(self, urls, history_for, hot=(), min_interval=SCHED_MIN_INTERVAL,
+                 max_interval=SCHED_MAX_INTERVAL, hot_interval=SCHED_HOT_INTERVAL,
+                 budget_per_minute=SCHED_BUDGET_PER_MINUTE, budget=None):
+        self.history_for = history_for
+        self.hot = set(hot)
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.hot_interval = hot_interval
+        self.budget = budget if budget is not None else RequestBudget(budget_per_minute)
+        self._lock = threading.Lock()
+        self._heap = []
+        self._interval = {}
+
+        now = time.monotonic()
+        for url in dict.fromkeys(urls):
+            self._interval[url] = self.initial_interval(url)
+            heapq.heappush(self._heap, (now, url))
+
+    def initial_interval(self, url, now=None):
+        if url in self.hot:
+            return self.hot_interval
+        now = now or time.time()
+        changes = self.history_for(url) or []
+        if not changes:
+            return self.min_interval
+        if now - changes[-1] < 24 * 3600 or changes_near_hour(changes, now):
+            return self.min_interval
+        if len(changes) > 1:
+            gaps = sorted(b - a for a, b in zip(changes, changes[1:]))
+            median_gap = gaps[len(gaps) // 2]
+            return min(self.max_interval, max(self.min_interval, median_gap / 20))
+        return self.max_interval / 2
+
+    def pop_due(self, lookahead=SCHED_BATCH_WINDOW):
+        """
+        Removes and returns the targets due within `lookahead` seconds, within
+        the request budget, so near-simultaneous deadlines share one batch.
+        """
+        due = []
+        with self._lock:
+            now = time.monotonic() + lookahead
+            while self._heap and self._heap[0][0] <= now and self.budget.take():
+                _, url = heapq.heappop(self._heap)
+                due.append(url)
+        return due
+
+    def record(self, url, changed):
+        """Reschedules url after a check; a stock change snaps it back to the fastest interval."""
+        with self._lock:
+            if url not in self._interval:
+                return
+            if url in self.hot:
+                interval = self.hot_interval
+            elif changed:
+                interval = self.min_interval
+            elif changes_near_hour(self.history_for(url) or [], time.time()):
+                # This item has restocked around this time of day before
+                interval = self.min_interval
+            else:
+                interval = min(self.max_interval, self._interval[url] * SCHED_BACKOFF)
+            self._interval[url] = interval
+            jitter = random.uniform(0.9, 1.1)
+            heapq.heappush(self._heap, (time.monotonic() + interval * jitter, url))
+
+    def next_wake(self):
+        """Seconds until the next target is due (or the budget allows another check)."""
+        with self._lock:
+            if not self._heap:
+                return self.max_interval
+            return max(0.0, self._heap[0][0] - time.monotonic(), self.budget.wait())
+
+    def intervals(self):
+        with self._lock:
+            return dict(self._interval)
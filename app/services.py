@@ -0,0 +1,80 @@
+from app.config import HTTP_FAST_PATH, DRIVER_POOL_SIZE, METRICS_PORT, METRICS_LOG_INTERVAL, ARCHIVE_ENABLED, ARCHIVE_DIR
+from app.alerts import AlertPolicy
+from app.archive import SnapshotArchive
+from app.driver import DriverPool
+from app.email_service import NotificationDispatcher
+from app.fingerprint import FingerprintCache
+from app.http_client import HttpClient
+from app.metrics import METRICS, MetricsLogger, start_metrics_server
+from app.scanner import HostLimiter
+from app.scheduler import RequestBudget
+from app.storage import load_seen
+
+
+class MonitorServices:
+    """
+    Resources shared by every monitor job in the process: the seen store,
+    the HTTP client, the browser pool, the email dispatcher and the alert
+    policy (so the hourly alert cap is process-wide), and the per-host limit
+    and request budget of target checks. Also runs the optional
+    metrics endpoint and periodic metrics summary. With local_state=False
+    (cluster workers) there is no seen store, alert policy or email
+    dispatcher: results are recorded by the coordinator. With an
+    `archive_dir`, parsed pages and card sets go to a SnapshotArchive there.
+    """
+
+    def __init__(self, email_config, log_callback=None, headless=False, pool_size=DRIVER_POOL_SIZE,
+                 metrics_port=METRICS_PORT, metrics_log_interval=METRICS_LOG_INTERVAL, local_state=True,
+                 archive_dir=ARCHIVE_DIR if ARCHIVE_ENABLED else None):
+        self.log_callback = log_callback
+        self.seen = load_seen(log_callback) if local_state else None
+        self.http_client = HttpClient() if HTTP_FAST_PATH else None
+        self.page_cache = FingerprintCache()
+        self.host_limiter = HostLimiter()
+        self.request_budget = RequestBudget()
+        self.pool = DriverPool(size=pool_size, headless=headless, log_callback=log_callback)
+        self.notifier = NotificationDispatcher(email_config, log_callback).start() if local_state else None
+        self.alert_policy = AlertPolicy() if local_state else None
+        self.archive = None
+        if archive_dir:
+            try:
+                self.archive = SnapshotArchive(archive_dir, log_callback).start()
+                if log_callback: log_callback(f"Archiving page snapshots to {archive_dir}", "blue")
+            except OSError as e:
+                if log_callback: log_callback(f"Snapshot archive not started: {e}", "red")
+
+        self.metrics_server = None
+        if metrics_port:
+            try:
+                self.metrics_server = start_metrics_server(metrics_port)
+                if log_callback:
+                    host, port = self.metrics_server.server_address[:2]
+                    log_callback(f"Metrics at http://{host}:{port}/metrics (and /metrics.json)", "blue")
+            except OSError as e:
+                if log_callback: log_callback(f"Metrics endpoint not started: {e}", "red")
+        self.metrics_logger = None
+        if metrics_log_interval and log_callback:
+            self.metrics_logger = MetricsLogger(log_callback, metrics_log_interval).start()
+
+    def close(self):
+        if self.metrics_logger is not None:
+            self.metrics_logger.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+            self.metrics_server.server_close()
+        if self.log_callback:
+            self.log_callback(METRICS.summary(), "cyan")
+            stats = self.pool.stats()
+            self.log_callback(f"Browser pool: {stats['leases']} lease(s), {stats['replaced']} replaced, {stats['recycled']} recycled, "
+                              f"avg wait {stats['lease_wait_avg']:.2f}s, max wait {stats['lease_wait_max']:.2f}s", "default")
+            if self.archive is not None:
+                self.log_callback(f"Snapshot archive: {self.archive.written} written, {self.archive.dropped} dropped", "default")
+        if self.archive is not None:
+            self.archive.close()
+        if self.http_client is not None:
+            self.http_client.close()
+        self.pool.close()
+        if self.seen is not None:
+            self.seen.close()
+        if self.notifier is not None:
+            self.notifier.stop()
@@ -1,21 +1,414 @@
 import os
+import re
 import json
-from app.config import SEEN_FILE
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from itertools import compress
+from app.metrics import METRICS
+from app.utils import normalize_title
+from app.config import (
+    SEEN_FILE, SEEN_DB, SEEN_FLUSH_BATCH, SEEN_FLUSH_INTERVAL, SEEN_REFRESH_INTERVAL,
+    SEEN_RETENTION_DAYS, SEEN_EVICT_INTERVAL
+)
+
+ITEM_ID_RE = re.compile(r"-i(\d+)(?:-s\d+)?\.html")
+LEGACY_TARGET_KEY_RE = re.compile(r"target_(\d+)$")
+SOLD_OUT = 1
+# Target checks and store listings of the same item are tracked apart: target ids carry this bit
+TARGET_KEY_BIT = 1 << 62
 
 def ensure_data_dir():
-    os.makedirs(os.path.dirname(SEEN_FILE), exist_ok=True)
+    os.makedirs(os.path.dirname(SEEN_DB), exist_ok=True)
 
-def load_seen():
-    ensure_data_dir()
-    if os.path.exists(SEEN_FILE):
+def item_id_from_url(url):
+    m = ITEM_ID_RE.search(url or "")
+    return int(m.group(1)) if m else None
+
+def stable_key(text):
+    """Negative 63-bit digest for items without an item id; unlike hash(), the same in every run."""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return -(int.from_bytes(digest, "big") >> 1) - 1
+
+def seen_key(url=None, title=None):
+    """The Lazada item id from a product URL; without one, a stable digest of the title (or else the URL)."""
+    item_id = item_id_from_url(url)
+    if item_id is not None:
+        return item_id
+    return stable_key(normalize_title(title) if title else url or "")
+
+def target_key(url):
+    """The seen key of a whole-product target: its item id with TARGET_KEY_BIT set, else a digest of the URL."""
+    item_id = item_id_from_url(url)
+    if item_id is not None:
+        return item_id | TARGET_KEY_BIT
+    return stable_key(f"target:{url or ''}")
+
+def to_epoch(value):
+    """Integer epoch seconds from a number or a legacy "YYYY-mm-dd HH:MM:SS" string."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(datetime.strptime(value, "%Y-%m-%d %H:%M:%S").timestamp())
+    except (TypeError, ValueError):
+        return int(time.time())
+
+def _ints_text(values):
+    return ",".join(str(int(v)) for v in values) if values else None
+
+def _text_ints(text):
+    return [int(v) for v in text.split(",")] if text else []
+
+
+class SeenStore:
+    """
+    Dict-like store of seen items keyed by Lazada item id (see seen_key and target_key),
+    backed by SQLite in WAL mode.
+
+    Only what the scan loop reads is kept in memory: sorted parallel arrays
+    of id, last_seen and flags (13 bytes an item), a dict of items added
+    since the arrays were last merged, and a sparse dict for the few items
+    with change or alert history. Titles, URLs and first_seen live on disk.
+    Records come back as {"last_seen", "sold_out"[, "changes", "alerts"]}.
+
+    Changes are committed in batches, one row per changed item. Bookkeeping
+    updates made with refresh() ride along with the next real write, or go
+    out on their own every `refresh_interval` seconds. Items not seen for
+    `retention_days` are dropped at load and every SEEN_EVICT_INTERVAL.
+    """
+
+    MERGE_AT = 1024
+
+    def __init__(self, path=SEEN_DB, flush_batch=SEEN_FLUSH_BATCH, flush_interval=SEEN_FLUSH_INTERVAL,
+                 refresh_interval=SEEN_REFRESH_INTERVAL, retention_days=SEEN_RETENTION_DAYS):
+        self.path = path
+        self.flush_batch = flush_batch
+        self.flush_interval = flush_interval
+        self.refresh_interval = refresh_interval
+        self.retention_days = retention_days
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY, title TEXT, url TEXT, first_seen INTEGER, "
+            "last_seen INTEGER NOT NULL, sold_out INTEGER NOT NULL, changes TEXT, alerts TEXT)")
+        self._conn.commit()
+
+        self._keys = array("q")
+        self._last = array("I")
+        self._flags = bytearray()
+        self._recent = {}       # id -> [last_seen, flags] for items not merged into the arrays yet
+        self._history = {}      # id -> {"changes": [...], "alerts": [...]}
+        self._text = {}         # id -> title/url/first_seen waiting to be written
+        self._dirty = set()
+        self._refreshed = set()
+        self._last_flush = time.monotonic()
+        self._last_refresh_flush = self._last_flush
+        self._last_evict = self._last_flush
+        self.flushes = 0
+        self.rows_written = 0
+        self.bytes_written = 0
+        self.evicted = 0
+
+        self._split_target_keys()
+        self._load()
+        self._import_legacy_table()
+        if self.retention_days:
+            self.evict()
+
+    def _load(self):
+        keys, last, flags, history = self._keys, self._last, self._flags, self._history
+        rows = self._conn.execute("SELECT id, last_seen, sold_out, changes, alerts FROM items ORDER BY id")
+        for key, last_seen, sold_out, changes, alerts in rows:
+            keys.append(key)
+            last.append(last_seen)
+            flags.append(SOLD_OUT if sold_out else 0)
+            if changes or alerts:
+                history[key] = {"changes": _text_ints(changes), "alerts": _text_ints(alerts)}
+
+    def _split_target_keys(self):
+        # Stores written before targets got their own key space hold target rows under the bare item id
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] >= 1:
+            return
+        with self._conn:
+            self._conn.execute("UPDATE OR IGNORE items SET id = id | ? WHERE id > 0 AND id < ? AND title LIKE '[TARGET]%'",
+                               (TARGET_KEY_BIT, TARGET_KEY_BIT))
+            self._conn.execute("PRAGMA user_version = 1")
+
+    def _import_legacy_table(self):
+        # Databases from before item-id keys hold one JSON row per title / target_* key
+        if not self._conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='seen'").fetchone():
+            return
+        for key, data in self._conn.execute("SELECT key, data FROM seen").fetchall():
+            try:
+                self.import_legacy(key, json.loads(data))
+            except (ValueError, TypeError, AttributeError):
+                continue
+        self.flush()
+        with self._conn:
+            self._conn.execute("DROP TABLE seen")
+
+    def import_legacy(self, key, record):
+        """Adds a record from the old title / target_* keyed format unless its item is already known."""
+        url = record.get("url")
+        m = LEGACY_TARGET_KEY_RE.match(key)
+        if key.startswith("target_"):
+            if item_id_from_url(url) is not None:
+                item_id = target_key(url)
+            else:
+                item_id = int(m.group(1)) | TARGET_KEY_BIT if m else target_key(url or key)
+        else:
+            item_id = seen_key(url, record.get("title") or key)
+        if item_id not in self:
+            self[item_id] = record
+        return item_id
+
+    def _index(self, key):
+        i = bisect_left(self._keys, key)
+        return i if i < len(self._keys) and self._keys[i] == key else -1
+
+    def _state(self, key):
+        i = self._index(key)
+        if i >= 0:
+            return self._last[i], self._flags[i]
+        state = self._recent.get(key)
+        return (state[0], state[1]) if state else None
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._recent or self._index(key) >= 0
+
+    def __getitem__(self, key):
+        with self._lock:
+            state = self._state(key)
+            if state is None:
+                raise KeyError(key)
+            record = {"last_seen": state[0], "sold_out": bool(state[1] & SOLD_OUT)}
+            history = self._history.get(key)
+            if history:
+                record["changes"] = list(history["changes"])
+                record["alerts"] = list(history["alerts"])
+            return record
+
+    def __setitem__(self, key, record):
+        with self._lock:
+            last_seen = to_epoch(record.get("last_seen"))
+            flags = SOLD_OUT if record.get("sold_out") else 0
+            i = self._index(key)
+            if i >= 0:
+                self._last[i], self._flags[i] = last_seen, flags
+            else:
+                self._recent[key] = [last_seen, flags]
+            self._history.pop(key, None)
+            self._set_history(key, record)
+            self._text[key] = {
+                "title": record.get("title") or "",
+                "url": record.get("url") or "",
+                "first_seen": to_epoch(record.get("first_seen", last_seen)),
+            }
+            if len(self._recent) >= max(self.MERGE_AT, len(self._keys) >> 4):
+                self._merge()
+            self._mark(key)
+
+    def __len__(self):
+        return len(self._keys) + len(self._recent)
+
+    def get(self, key, default=None):
         try:
-            with open(SEEN_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return {}
-    return {}
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        with self._lock:
+            return list(self._keys) + list(self._recent)
+
+    def items(self):
+        return ((key, self[key]) for key in self.keys())
+
+    def touch(self, key, **fields):
+        """Updates fields of an existing item."""
+        with self._lock:
+            self._update(key, fields)
+            self._mark(key)
+
+    def refresh(self, key, **fields):
+        """Updates fields of an existing item without scheduling a write of its own."""
+        with self._lock:
+            self._update(key, fields)
+            self._refreshed.add(key)
+
+    def refresh_many(self, keys, **fields):
+        """refresh() for every key already in the store, under one lock; unknown keys are skipped."""
+        refreshed = 0
+        with self._lock:
+            for key in keys:
+                if key in self._recent or self._index(key) >= 0:
+                    self._update(key, fields)
+                    self._refreshed.add(key)
+                    refreshed += 1
+        return refreshed
+
+    def _update(self, key, fields):
+        i = self._index(key)
+        state = self._recent.get(key) if i < 0 else None
+        if i < 0 and state is None:
+            raise KeyError(key)
+        if "last_seen" in fields:
+            last_seen = to_epoch(fields["last_seen"])
+            if i >= 0: self._last[i] = last_seen
+            else: state[0] = last_seen
+        if "sold_out" in fields:
+            flags = SOLD_OUT if fields["sold_out"] else 0
+            if i >= 0: self._flags[i] = flags
+            else: state[1] = flags
+        self._set_history(key, fields)
+        text = {name: fields[name] for name in ("title", "url") if name in fields}
+        if text:
+            self._text.setdefault(key, {}).update(text)
 
-def save_seen(data):
+    def _set_history(self, key, fields):
+        for name in ("changes", "alerts"):
+            if name in fields:
+                history = self._history.setdefault(key, {"changes": [], "alerts": []})
+                history[name] = [int(v) for v in fields[name] or ()]
+                if not history["changes"] and not history["alerts"]:
+                    del self._history[key]
+
+    def _merge(self):
+        """Folds the recently added items into the sorted arrays in one pass."""
+        keys, last, flags = array("q"), array("I"), bytearray()
+        prev = 0
+        for key, (last_seen, flag) in sorted(self._recent.items()):
+            i = bisect_left(self._keys, key, prev)
+            keys += self._keys[prev:i]
+            last += self._last[prev:i]
+            flags += self._flags[prev:i]
+            keys.append(key)
+            last.append(last_seen)
+            flags.append(flag)
+            prev = i
+        keys += self._keys[prev:]
+        last += self._last[prev:]
+        flags += self._flags[prev:]
+        self._keys, self._last, self._flags = keys, last, flags
+        self._recent.clear()
+
+    def _mark(self, key):
+        self._dirty.add(key)
+        if len(self._dirty) >= self.flush_batch or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self, include_refreshed=False):
+        with self._lock:
+            now = time.monotonic()
+            self._last_flush = now
+            if self.retention_days and now - self._last_evict >= SEEN_EVICT_INTERVAL:
+                self.evict()
+            if include_refreshed or (self._refreshed and now - self._last_refresh_flush >= self.refresh_interval):
+                self._dirty |= self._refreshed
+                self._refreshed.clear()
+                self._last_refresh_flush = now
+            if not self._dirty:
+                return 0
+            self._refreshed -= self._dirty
+
+            inserts, updates = [], []
+            for key in self._dirty:
+                last_seen, flags = self._state(key)
+                history = self._history.get(key) or {}
+                row = (last_seen, flags & SOLD_OUT, _ints_text(history.get("changes")), _ints_text(history.get("alerts")))
+                text = self._text.pop(key, None)
+                if text is None:
+                    updates.append(row + (key,))
+                else:
+                    inserts.append((key, text.get("title"), text.get("url"), text.get("first_seen")) + row)
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO items (id, title, url, first_seen, last_seen, sold_out, changes, alerts) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET "
+                    "title=COALESCE(excluded.title, title), url=COALESCE(excluded.url, url), "
+                    "first_seen=COALESCE(first_seen, excluded.first_seen), last_seen=excluded.last_seen, "
+                    "sold_out=excluded.sold_out, changes=excluded.changes, alerts=excluded.alerts", inserts)
+                self._conn.executemany("UPDATE items SET last_seen=?, sold_out=?, changes=?, alerts=? WHERE id=?", updates)
+            self._dirty.clear()
+            rows = inserts + updates
+            self.flushes += 1
+            self.rows_written += len(rows)
+            self.bytes_written += sum(len(str(v).encode()) for row in rows for v in row if v is not None)
+            return len(rows)
+
+    def evict(self, max_age_days=None, now=None):
+        """Drops items not seen for `max_age_days` (default: retention_days). Returns how many went."""
+        days = self.retention_days if max_age_days is None else max_age_days
+        with self._lock:
+            self._last_evict = time.monotonic()
+            if not days:
+                return 0
+            if self._recent:
+                self._merge()
+            cutoff = (now or time.time()) - days * 86400
+            keep = [last_seen >= cutoff for last_seen in self._last]
+            if all(keep):
+                return 0
+            gone = list(compress(self._keys, [not k for k in keep]))
+            self._keys = array("q", compress(self._keys, keep))
+            self._last = array("I", compress(self._last, keep))
+            self._flags = bytearray(compress(self._flags, keep))
+            for key in gone:
+                self._history.pop(key, None)
+                self._text.pop(key, None)
+                self._dirty.discard(key)
+                self._refreshed.discard(key)
+            with self._conn:
+                self._conn.executemany("DELETE FROM items WHERE id=?", ((key,) for key in gone))
+            self.evicted += len(gone)
+            return len(gone)
+
+    def close(self):
+        with self._lock:
+            self.flush(include_refreshed=True)
+            self._conn.close()
+
+
+def migrate_json(store, json_path=SEEN_FILE, log_callback=None):
+    """Imports a legacy seen_items.json into the store and renames the file out of the way."""
+    if not os.path.exists(json_path):
+        return 0
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as e:
+        # Keep the broken file for inspection instead of silently starting empty
+        os.replace(json_path, json_path + ".corrupt")
+        if log_callback:
+            log_callback(f"Seen file was unreadable ({e}); moved to {json_path}.corrupt", "red")
+        return 0
+
+    for key, record in data.items():
+        store.import_legacy(key, record)
+    store.flush()
+    os.replace(json_path, json_path + ".migrated")
+    if log_callback:
+        log_callback(f"Migrated {len(data)} seen item(s) from {os.path.basename(json_path)}.", "blue")
+    return len(data)
+
+def load_seen(log_callback=None):
     ensure_data_dir()
-    with open(SEEN_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    store = SeenStore(SEEN_DB)
+    migrate_json(store, SEEN_FILE, log_callback=log_callback)
+    return store
+
+def save_seen(store, log_callback=None):
+    try:
+        with METRICS.span("save_seen"):
+            store.flush()
+    except Exception as e:
+        METRICS.inc("errors", stage="save_seen")
+        if log_callback:
+            log_callback(f"Failed saving seen file: {e}", "red")
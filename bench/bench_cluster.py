@@ -0,0 +1,142 @@
+# bench/bench_cluster.py
+# Cluster mode on one machine: a coordinator plus N local worker processes
+# checking target pages from the recorded corpus (see corpus_server.py).
+# For each worker count it reports recorded checks/sec and alerts sent. With
+# --kill it SIGKILLs one worker halfway through and reports how long its
+# targets went unchecked before the others took them over, and whether any
+# item alerted twice.
+#
+# Usage: python bench/bench_cluster.py [--workers 1,2,4] [--targets 200] [--seconds 30] [--kill]
+#
+# Each worker runs its own check budget (SCHED_BUDGET_PER_MINUTE), so checks/sec
+# grows with the worker count until the pages or the CPU run out.
+import argparse
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app.storage
+from app.alerts import AlertPolicy
+from app.cluster import Coordinator, LocalWorkers
+from app.jobs import MonitorJob
+from app.metrics import METRICS
+
+from corpus_server import start_server
+
+
+class AlertCounter:
+    """Stands in for the email dispatcher; counts alerts per item."""
+
+    def __init__(self):
+        self.sent = Counter()
+
+    def notify(self, subject, body, recipients=None):
+        self.sent[subject.split(" @ ")[0]] += 1
+
+    def stop(self, timeout=None):
+        pass
+
+
+def run_cluster(base_url, workers, args, workdir):
+    # The coordinator opens the seen store through load_seen(); point it at a scratch file
+    app.storage.SEEN_DB = os.path.join(workdir, f"seen_{workers}.db")
+    app.storage.SEEN_FILE = os.path.join(workdir, "none.json")
+    METRICS.reset()
+
+    # Every 7th corpus page is a script-only shell that would need a browser; skip those ids
+    ids = [i for i in range(1000, 1000 + args.targets * 2) if i % 7 != 6][:args.targets]
+    job = MonitorJob("bench", "target", target_urls=[f"{base_url}/products/item-i{i}.html" for i in ids], interval=1)
+    coordinator = Coordinator([job], {}, worker_timeout=args.worker_timeout)
+    notifier = coordinator.services.notifier
+    coordinator.services.notifier, coordinator.services.alert_policy = AlertCounter(), AlertPolicy(max_per_hour=0)
+    notifier.stop()
+
+    last_report = {}
+    record = coordinator.report_target
+    def timed_report(worker_id, job_name, target_url, verdict, checked_at):
+        result = record(worker_id, job_name, target_url, verdict, checked_at)
+        last_report.setdefault(target_url, []).append((time.monotonic(), worker_id))
+        return result
+    coordinator.report_target = timed_report
+
+    coordinator.start()
+    local = LocalWorkers(coordinator, workers, stdout=subprocess.DEVNULL).start()
+    result = {"workers": workers}
+    try:
+        deadline = time.monotonic() + args.warmup
+        while time.monotonic() < deadline:
+            local.check()
+            time.sleep(0.2)
+        recorded_before = METRICS.counter_total("cluster_reports", result="recorded")
+        started = time.monotonic()
+        killed = None
+        while time.monotonic() - started < args.seconds:
+            if args.kill and killed is None and workers > 1 and time.monotonic() - started >= args.seconds / 2:
+                victim, pid = sorted(local.pids().items())[0]
+                orphaned = [url for url, owner in ((u, coordinator._assignment.get(("bench", u))) for u in job.target_urls)
+                            if owner == victim]
+                os.kill(pid, signal.SIGKILL)
+                killed = (victim, time.monotonic(), orphaned)
+            local.check()
+            time.sleep(0.2)
+        elapsed = time.monotonic() - started
+        recorded = METRICS.counter_total("cluster_reports", result="recorded") - recorded_before
+        result["checks_per_sec"] = round(recorded / elapsed, 1)
+        result["stale_reports"] = METRICS.counter_total("cluster_reports", result="stale")
+        alerts = coordinator.services.notifier.sent
+        result["alerts"] = sum(alerts.values())
+        result["items_alerted_twice"] = sum(1 for n in alerts.values() if n > 1)
+        if killed:
+            victim, at, orphaned = killed
+            gaps = []
+            for url in orphaned:
+                after = [t for t, worker in last_report.get(url, ()) if t > at and worker != victim]
+                gaps.append(after[0] - at if after else None)
+            taken = [g for g in gaps if g is not None]
+            result["killed"] = victim
+            result["orphaned_targets"] = len(orphaned)
+            result["taken_over"] = len(taken)
+            result["takeover_max_s"] = round(max(taken), 1) if taken else None
+    finally:
+        local.stop()
+        coordinator.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coordinator/worker benchmark on one machine")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts to run")
+    parser.add_argument("--targets", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--worker-timeout", type=float, default=10)
+    parser.add_argument("--kill", action="store_true", help="SIGKILL one worker halfway through")
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args()
+
+    server, base_url = start_server()
+    workdir = tempfile.mkdtemp(prefix="lazwatch-cluster-")
+    report = []
+    try:
+        for workers in (int(n) for n in args.workers.split(",")):
+            result = run_cluster(base_url, workers, args, workdir)
+            print(json.dumps(result))
+            report.append(result)
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
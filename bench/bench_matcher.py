@@ -0,0 +1,50 @@
+# bench/bench_matcher.py
+# Per-card keyword matching cost as the watch list grows, with the automaton and
+# with the plain substring scan KeywordMatcher uses below KEYWORD_AUTOMATON_MIN keywords.
+# Usage: python bench/bench_matcher.py
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.matcher import KeywordMatcher
+
+KEYWORD_COUNTS = [1, 5, 10, 20, 50, 100, 1000, 5000]
+CARD_COUNT = 400
+rng = random.Random(7)
+
+def random_word():
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+
+def random_card():
+    words = [random_word() for _ in range(rng.randint(12, 30))]
+    return ' '.join(words) + "\n₱1,299.00\n4.8 (120)\nManila"
+
+def naive_match(text, keywords):
+    text = (text or "").lower()
+    return any(kw.lower() in text for kw in keywords)
+
+def per_card_us(fn, cards):
+    start = time.perf_counter()
+    for card in cards:
+        fn(card)
+    return (time.perf_counter() - start) / len(cards) * 1e6
+
+def main():
+    cards = [random_card() for _ in range(CARD_COUNT)]
+    print(f"{'keywords':>9} {'compile ms':>11} {'automaton us/card':>18} {'plain us/card':>14} {'naive us/card':>14}")
+    for count in KEYWORD_COUNTS:
+        keywords = [' '.join(random_word() for _ in range(rng.randint(1, 3))) for _ in range(count)]
+        start = time.perf_counter()
+        matcher = KeywordMatcher(keywords, automaton_min=0)
+        compile_ms = (time.perf_counter() - start) * 1000
+        compiled = per_card_us(matcher.find, cards)
+        plain = per_card_us(KeywordMatcher(keywords, automaton_min=len(keywords) + 1).find, cards)
+        naive = per_card_us(lambda c: naive_match(c, keywords), cards)
+        print(f"{count:>9} {compile_ms:>11.1f} {compiled:>18.1f} {plain:>14.1f} {naive:>14.1f}")
+
+if __name__ == "__main__":
+    main()
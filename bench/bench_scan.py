@@ -0,0 +1,425 @@
+# bench/bench_scan.py
+# End-to-end scan benchmark against the recorded pages in bench/corpus/,
+# served from localhost so it runs with no network access. Target and store
+# cycles go through the monitor's own fetch/parse/record code and the run
+# reports cycles/sec, per-stage latency percentiles, WebDriver round-trips,
+# peak RSS and writes to the seen store.
+#
+# Usage: python bench/bench_scan.py [--cycles 20] [--targets 200] [--browser]
+#                                   [--out baseline.json] [--compare baseline.json]
+#
+# --browser also runs the Selenium paths (needs a local Chrome + chromedriver).
+# --no-fingerprints / --no-etag turn off change detection / the server's 304s.
+# --compare exits with status 1 when a metric regressed by more than --tolerance.
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.alerts import AlertPolicy
+from app.catalog import CatalogSource
+from app.config import TARGET_PER_HOST, DRIVER_LEAN
+from app.crawler import StoreCrawler
+from app.dom import Card, extract_cards, wait_for_product_grid
+from app.fingerprint import FingerprintCache, grid_fingerprint
+from app.http_client import HttpClient
+from app.matcher import KeywordMatcher
+from app.metrics import METRICS
+from app.monitor import process_target_result, process_store_cards, check_product_availability_lazada
+from app.pdp import check_product_availability_http
+from app.scanner import HostLimiter, scan_targets
+from app.storage import SeenStore, save_seen
+
+from corpus_server import start_server
+
+# Metrics compared against a baseline; cycles_per_sec is the only one where higher is better
+COMPARED = ("cycles_per_sec", "p50_ms", "p90_ms", "round_trips_per_cycle",
+            "flushes", "rows_written", "bytes_written", "peak_rss_kb")
+TIMING_FLOOR_MS = 0.05
+# Percentiles over fewer samples than this are too noisy to gate on
+MIN_SAMPLES = 30
+ITEM_ID_RE = re.compile(r"-i(\d+)(?:-s\d+)?\.html")
+
+
+class Stages:
+    """Collects wall-clock samples per named stage."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def time(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.samples[name].append(seconds * 1000)
+
+    def summary(self):
+        return {name: percentiles(values) for name, values in self.samples.items()}
+
+
+def percentiles(values):
+    ordered = sorted(values)
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+    return {"count": len(ordered), "p50_ms": pick(0.50), "p90_ms": pick(0.90), "p99_ms": pick(0.99),
+            "max_ms": round(ordered[-1], 3), "total_ms": round(sum(ordered), 3)}
+
+
+class CountingNotifier:
+    """Stands in for the email dispatcher; only counts the alerts."""
+
+    def __init__(self):
+        self.sent = 0
+
+    def notify(self, subject, body, recipients=None):
+        self.sent += 1
+
+
+class CardParser(HTMLParser):
+    """
+    Browserless stand-in for EXTRACT_CARDS_JS over the recorded store pages,
+    so store cycles can run without Chrome.
+    """
+
+    def __init__(self, base_url):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.cards = []
+        self._depth = 0
+        self._card = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if self._card is None:
+            if tag == "div" and attrs.get("data-qa-locator") == "productItem":
+                self._card = {"text": [], "title": "", "url": "", "sold_out": False, "in_link": False}
+                self._depth = 1
+            return
+        if tag == "div":
+            self._depth += 1
+        card = self._card
+        if tag == "a" and "/products/" in (attrs.get("href") or ""):
+            if not card["url"]:
+                card["url"] = urljoin(self.base_url, attrs["href"])
+            card["in_link"] = True
+        elif tag == "img" and not card["title"]:
+            card["title"] = attrs.get("alt") or ""
+        if "sold-out" in (attrs.get("class") or "").lower():
+            card["sold_out"] = True
+
+    def handle_endtag(self, tag):
+        if self._card is None:
+            return
+        if tag == "a":
+            self._card["in_link"] = False
+        elif tag == "div":
+            self._depth -= 1
+            if self._depth == 0:
+                card, self._card = self._card, None
+                m = ITEM_ID_RE.search(card["url"])
+                self.cards.append(Card("\n".join(card["text"]), card["title"].strip(), card["url"],
+                                       m.group(1) if m else "", card["sold_out"]))
+
+    def handle_data(self, data):
+        if self._card is not None and data.strip():
+            self._card["text"].append(data.strip())
+            if self._card["in_link"]:
+                self._card["title"] = data.strip()
+
+
+def parse_cards(html, base_url):
+    parser = CardParser(base_url)
+    parser.feed(html)
+    parser.close()
+    return parser.cards
+
+
+def count_round_trips(driver, counter):
+    """Counts every WebDriver command the session sends (elements route through driver.execute too)."""
+    target = getattr(driver, "driver", driver)  # the WebDriver inside a pooled BrowserSession
+    if getattr(target, "_bench_counted", False):
+        return driver
+    execute = target.execute
+    def counted(command, params=None):
+        counter[command] += 1
+        return execute(command, params)
+    target.execute = counted
+    target._bench_counted = True
+    return driver
+
+
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1024 if sys.platform == "darwin" else 1
+    return {"self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+            "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale}
+
+
+def seen_writes(store, cycles):
+    size = sum(os.path.getsize(store.path + ext) for ext in ("", "-wal") if os.path.exists(store.path + ext))
+    return {"flushes": store.flushes, "rows_written": store.rows_written, "bytes_written": store.bytes_written,
+            "rows_per_cycle": round(store.rows_written / cycles, 2), "file_bytes": size}
+
+
+def app_stages():
+    """The monitor's own METRICS spans and change-detection counters for the phase just run."""
+    snap = METRICS.snapshot()
+    stages = {stage: {"count": s["count"], "avg_ms": round(s["avg"] * 1000, 3), "total_ms": round(s["sum"] * 1000, 3)}
+              for stage, s in snap["stages"].items()}
+    unchanged = {e["labels"]["level"]: e["value"] for e in snap["counters"].get("unchanged", [])}
+    return stages, unchanged
+
+
+def run_cycles(cycles, run_one, stages):
+    METRICS.reset()
+    started = time.perf_counter()
+    for _ in range(cycles):
+        with stages.time("cycle"):
+            run_one()
+    elapsed = time.perf_counter() - started
+    return {"cycles": cycles, "seconds": round(elapsed, 3), "cycles_per_sec": round(cycles / elapsed, 3)}
+
+
+def bench_targets(base_url, args, workdir, pool=None):
+    stages, verdicts, trips = Stages(), Counter(), Counter()
+    client = HttpClient()
+    page_cache = None if args.no_fingerprints else FingerprintCache()
+    seen = SeenStore(os.path.join(workdir, f"target{'_browser' if pool else ''}.db"))
+    policy, notifier = AlertPolicy(), CountingNotifier()
+    stop_event = threading.Event()
+    urls = [f"{base_url}/products/pdp-i{1001 + i}.html" for i in range(args.targets)]
+    limiter = HostLimiter(per_host=TARGET_PER_HOST, delay=args.host_delay)
+
+    def check(url):
+        with stages.time("check"):
+            verdict = check_product_availability_http(url, client, page_cache)
+        if verdict is None and pool is not None:
+            with stages.time("browser_fallback"), pool.lease() as driver:
+                if driver is not None:
+                    verdict = check_product_availability_lazada(url, count_round_trips(driver, trips))
+        return verdict
+
+    def on_result(url, verdict):
+        verdicts[{True: "in_stock", False: "sold_out", None: "unknown"}[verdict]] += 1
+        with stages.time("record"):
+            process_target_result(url, verdict, seen, policy, notifier)
+
+    def cycle():
+        scan_targets(urls, check, on_result, stop_event, max_workers=args.workers, limiter=limiter)
+        with stages.time("save_seen"):
+            save_seen(seen)
+
+    try:
+        result = run_cycles(args.cycles, cycle, stages)
+    finally:
+        client.close()
+        seen.close()
+    app, unchanged = app_stages()
+    result.update(stages=stages.summary(), app_stages=app, unchanged=unchanged, verdicts=dict(verdicts),
+                  alerts=notifier.sent, seen_writes=seen_writes(seen, args.cycles))
+    if pool is not None:
+        result["webdriver"] = {"round_trips": sum(trips.values()),
+                               "round_trips_per_cycle": round(sum(trips.values()) / args.cycles, 2),
+                               "by_command": dict(trips)}
+    return result
+
+
+def bench_store(base_url, args, workdir, keywords, driver=None, catalog=False):
+    """Store cycles over the rendered page (driver), the catalog JSON (catalog=True) or the raw HTML."""
+    stages, trips = Stages(), Counter()
+    client = HttpClient()
+    source = "browser" if driver is not None else "catalog" if catalog else "html"
+    seen = SeenStore(os.path.join(workdir, f"store_{source}.db"))
+    policy, notifier = AlertPolicy(), CountingNotifier()
+    crawler = StoreCrawler(f"{base_url}/shop/acme/")
+    matcher = KeywordMatcher(keywords)
+    fingerprints = not args.no_fingerprints
+    item_prints = FingerprintCache() if fingerprints else None
+    page_cards = {}
+    last_grid = None
+    catalog_source = CatalogSource(client, FingerprintCache()) if catalog else None
+    pages = Counter()
+    if driver is not None:
+        count_round_trips(driver, trips)
+
+    def fetch_cards_http(page_url):
+        with stages.time("fetch"):
+            resp = client.get(page_url, conditional=fingerprints)
+        if resp.not_modified and page_url in page_cards:
+            return page_cards[page_url]
+        with stages.time("extract"):
+            cards = page_cards[page_url] = parse_cards(resp.text, page_url)
+        return cards
+
+    def fetch_cards_browser(page_url):
+        with stages.time("navigate"):
+            driver.get(page_url)
+        with stages.time("wait"):
+            if DRIVER_LEAN:
+                wait_for_product_grid(driver)
+        with stages.time("extract"):
+            return extract_cards(driver)
+
+    def cycle():
+        nonlocal last_grid
+        if driver is not None:
+            fetch_cards = fetch_cards_browser
+        elif catalog_source is not None:
+            fetch_cards = catalog_source.fetch_cards
+        else:
+            fetch_cards = fetch_cards_http
+        cards, fresh, walked = crawler.crawl(fetch_cards)
+        pages["walked"] += walked
+        # Same short-circuit as run_store_cycle
+        grid = grid_fingerprint(cards) if fingerprints else None
+        if grid is not None and grid == last_grid:
+            return
+        last_grid = grid
+        with stages.time("match_record"):
+            process_store_cards(cards, matcher, seen, policy, notifier, item_prints=item_prints)
+        with stages.time("save_seen"):
+            save_seen(seen)
+
+    try:
+        result = run_cycles(args.cycles, cycle, stages)
+    finally:
+        client.close()
+        seen.close()
+    app, unchanged = app_stages()
+    result.update(stages=stages.summary(), app_stages=app, unchanged=unchanged, pages_walked=pages["walked"],
+                  alerts=notifier.sent, seen_writes=seen_writes(seen, args.cycles))
+    if driver is not None:
+        result["webdriver"] = {"round_trips": sum(trips.values()),
+                               "round_trips_per_cycle": round(sum(trips.values()) / args.cycles, 2),
+                               "by_command": dict(trips)}
+    return result
+
+
+def run_bench(args):
+    server, base_url = start_server(etag=not args.no_etag)
+    workdir = tempfile.mkdtemp(prefix="lazwatch-bench-")
+    report = {
+        "meta": {
+            "python": platform.python_version(), "platform": platform.platform(),
+            "cycles": args.cycles, "targets": args.targets, "workers": args.workers,
+            "host_delay": args.host_delay, "browser": args.browser,
+            "fingerprints": not args.no_fingerprints, "etag": not args.no_etag,
+            "started": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+    }
+    try:
+        keywords = server.manifest["keywords"]
+        report["target_http"] = bench_targets(base_url, args, workdir)
+        report["store_http"] = bench_store(base_url, args, workdir, keywords)
+        report["store_catalog"] = bench_store(base_url, args, workdir, keywords, catalog=True)
+
+        if args.browser:
+            from app.driver import DriverPool
+            pool = DriverPool(size=min(args.workers, 2), headless=True)
+            try:
+                report["target_browser"] = bench_targets(base_url, args, workdir, pool=pool)
+                with pool.lease() as driver:
+                    if driver is None:
+                        raise RuntimeError("Chrome failed to start")
+                    report["store_browser"] = bench_store(base_url, args, workdir, keywords, driver=driver)
+            finally:
+                pool.close()
+        report["requests_served"] = server.hits
+        report["not_modified_served"] = server.not_modified
+        report["peak_rss_kb"] = peak_rss_kb()
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def flatten(report, prefix=""):
+    flat = {}
+    for key, value in report.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(report, baseline, tolerance):
+    """Prints current vs baseline for the compared metrics; returns the regressed ones."""
+    current, previous = flatten(report), flatten(baseline)
+    regressions = []
+    for path in sorted(previous):
+        if path.startswith("meta.") or path not in current or not path.endswith(COMPARED):
+            continue
+        old, new = previous[path], current[path]
+        if path.endswith("_ms"):
+            count = current.get(path.rsplit(".", 1)[0] + ".count", 0)
+            if max(old, new) < TIMING_FLOOR_MS or count < MIN_SAMPLES:
+                continue
+        change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+        worse = -change if path.endswith("cycles_per_sec") else change
+        flag = "REGRESSED" if worse > tolerance else ""
+        if flag:
+            regressions.append(path)
+        print(f"{path:60} {old:>12g} -> {new:>12g}  {change:+7.1%} {flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline scan benchmark over the recorded corpus")
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--targets", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--host-delay", type=float, default=0.0,
+                        help="per-host politeness delay; 0 measures the scan code itself")
+    parser.add_argument("--browser", action="store_true", help="also run the Selenium paths")
+    parser.add_argument("--no-fingerprints", action="store_true", help="disable change detection")
+    parser.add_argument("--no-etag", action="store_true", help="server sends no validators or 304s")
+    parser.add_argument("--out", help="write the JSON report here (e.g. a new baseline)")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    report = run_bench(args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
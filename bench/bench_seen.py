@@ -0,0 +1,164 @@
+# bench/bench_seen.py
+# Memory and latency of the seen store at catalogue scale. Builds a seen
+# database of --items products (a third of them past the retention window),
+# loads it into SeenStore and reports the resident size, lookup, flush and
+# eviction times. For comparison it measures the old in-memory layout (a dict
+# of per-item dicts keyed by normalised title) at --legacy-items and scales
+# that to --items.
+#
+# Usage: python bench/bench_seen.py [--items 1000000] [--legacy-items 100000] [--out seen.json]
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.storage import SeenStore
+from app.utils import now_iso, normalize_title
+
+DAY = 86400
+
+
+def rss_kb():
+    """Current resident set size in KiB (Linux only)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+def build_db(path, items, retention_days, seed=1):
+    """Writes `items` rows straight into the items table; every third one is older than the retention window."""
+    rng = random.Random(seed)
+    now = int(time.time())
+    ids = rng.sample(range(100_000_000, 4_000_000_000), items)
+    SeenStore(path, retention_days=0).close()
+    conn = sqlite3.connect(path)
+
+    def rows():
+        for n, item_id in enumerate(ids):
+            age = (retention_days + 1 + rng.randrange(30)) * DAY if n % 3 == 0 else rng.randrange(retention_days * DAY)
+            history = ",".join(str(now - age - k * 3600) for k in range(3)) if n % 50 == 0 else None
+            yield (item_id, f"Acme gadget model {item_id} 128GB", f"https://www.lazada.com.ph/products/acme-gadget-i{item_id}.html",
+                   now - age - 30 * DAY, now - age, n % 2, history, None)
+
+    with conn:
+        conn.executemany("INSERT INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows())
+    conn.close()
+    return ids
+
+
+def measure(fn):
+    """Runs fn() and returns (result, seconds, traced bytes still held, RSS growth in KiB)."""
+    gc.collect()
+    rss_before = rss_kb()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    rss_after = rss_kb()
+    return result, elapsed, held, (rss_after - rss_before) if rss_before is not None else None
+
+
+def legacy_layout(items):
+    """The previous in-memory layout: {normalised title: record dict} with ISO timestamps."""
+    stamp = now_iso()
+    store = {}
+    for n in range(items):
+        item_id = 100_000_000 + n * 37
+        title = f"Acme gadget model {item_id} 128GB"
+        store[normalize_title(title)] = {
+            "title": title, "url": f"https://www.lazada.com.ph/products/acme-gadget-i{item_id}.html",
+            "first_seen": stamp[:-2] + f"{n % 60:02d}", "last_seen": stamp[:-2] + f"{(n + 7) % 60:02d}",
+            "sold_out": bool(n % 2),
+        }
+    return store
+
+
+def bench_store(path, ids, retention_days):
+    store, load_s, held, rss = measure(lambda: SeenStore(path, retention_days=0))
+    report = {
+        "items_loaded": len(store),
+        "load_s": round(load_s, 3),
+        "traced_mb": round(held / 2**20, 1),
+        "rss_mb": round(rss / 1024, 1) if rss is not None else None,
+        "bytes_per_item": round(held / len(store), 1),
+    }
+
+    probes = random.Random(2).sample(ids, 100_000)
+    started = time.perf_counter()
+    for item_id in probes:
+        store.get(item_id)
+    report["get_us"] = round((time.perf_counter() - started) / len(probes) * 1e6, 2)
+
+    now = int(time.time())
+    started = time.perf_counter()
+    for item_id in probes[:10_000]:
+        if item_id in store:
+            store.refresh(item_id, last_seen=now)
+    report["refresh_us"] = round((time.perf_counter() - started) / 10_000 * 1e6, 2)
+    started = time.perf_counter()
+    report["flushed_rows"] = store.flush(include_refreshed=True)
+    report["flush_s"] = round(time.perf_counter() - started, 3)
+
+    started = time.perf_counter()
+    for n in range(50_000):
+        store[4_100_000_000 + n] = {"title": f"New item {n}", "url": "", "first_seen": now, "last_seen": now, "sold_out": False}
+    store.flush()
+    report["insert_us"] = round((time.perf_counter() - started) / 50_000 * 1e6, 2)
+
+    started = time.perf_counter()
+    report["evicted"] = store.evict(retention_days)
+    report["evict_s"] = round(time.perf_counter() - started, 3)
+    report["items_after_evict"] = len(store)
+    store.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seen store memory/latency benchmark")
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--legacy-items", type=int, default=100_000)
+    parser.add_argument("--retention-days", type=int, default=90)
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="lazwatch-seen-")
+    try:
+        path = os.path.join(workdir, "seen.db")
+        started = time.perf_counter()
+        ids = build_db(path, args.items, args.retention_days)
+        report = {"items": args.items, "build_s": round(time.perf_counter() - started, 1),
+                  "db_mb": round(os.path.getsize(path) / 2**20, 1)}
+        report["store"] = bench_store(path, ids, args.retention_days)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    legacy, _, held, _ = measure(lambda: legacy_layout(args.legacy_items))
+    per_item = held / len(legacy)
+    del legacy
+    report["legacy"] = {"measured_items": args.legacy_items, "bytes_per_item": round(per_item, 1),
+                        f"projected_mb_at_{args.items}": round(per_item * args.items / 2**20, 1)}
+
+    for key, value in report.items():
+        print(f"{key:>10}: {value}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
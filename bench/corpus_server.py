@@ -0,0 +1,120 @@
+# bench/corpus_server.py
+# Serves the recorded pages in bench/corpus/ on localhost, so scans can be
+# benchmarked (or the GUI pointed at it) without network access.
+#   /products/<slug>-i<id>[-s<sku>].html  -> a PDP from manifest["pdp"], picked by item id
+#   /shop/<name>/?page=N                  -> store_pageN, the last page repeats like the live site
+#   /shop/<name>/?ajax=true&page=N        -> the catalog JSON for page N, empty past the last page
+# Responses carry an ETag and Last-Modified and honour If-None-Match (start with
+# etag=False / --no-etag to benchmark a site that doesn't).
+# Usage: python bench/corpus_server.py [--port 8800]
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+PDP_PATH_RE = re.compile(r"^/products/.*-i(\d+)(?:-s\d+)?\.html$")
+
+
+def load_corpus(corpus_dir=CORPUS_DIR):
+    with open(os.path.join(corpus_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    pages = {}
+    for name in set(manifest["pdp"]) | set(manifest["store_pages"]) | set(manifest.get("store_catalog", [])):
+        with open(os.path.join(corpus_dir, name), "rb") as f:
+            body = f.read()
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        pages[name] = (body, gzip.compress(body, 6), etag)
+    empty = json.dumps({"mods": {"listItems": []}, "mainInfo": {"pageSize": "40"}}).encode()
+    pages["empty.json"] = (empty, gzip.compress(empty, 6), '"empty"')
+    return manifest, pages
+
+
+class CorpusHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Without this, keep-alive responses stall on delayed ACKs and every request looks ~40 ms slow
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        manifest, pages = self.server.manifest, self.server.pages
+        parts = urlsplit(self.path)
+        name = None
+        m = PDP_PATH_RE.match(parts.path)
+        if m:
+            pdp = manifest["pdp"]
+            name = pdp[int(m.group(1)) % len(pdp)]
+        elif parts.path.startswith("/shop/"):
+            query = parse_qs(parts.query)
+            try:
+                page = max(int(query.get("page", ["1"])[0]), 1)
+            except ValueError:
+                page = 1
+            if query.get("ajax") == ["true"]:
+                catalog = manifest.get("store_catalog", [])
+                name = catalog[page - 1] if page <= len(catalog) else "empty.json"
+            else:
+                store = manifest["store_pages"]
+                name = store[min(page, len(store)) - 1]
+
+        if name is None:
+            self.send_error(404)
+            return
+        self.server.hits += 1
+        plain, packed, etag = pages[name]
+        if self.server.etag and self.headers.get("If-None-Match") == etag:
+            self.server.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        gzipped = "gzip" in (self.headers.get("Accept-Encoding") or "")
+        body = packed if gzipped else plain
+        self.send_response(200)
+        ctype = "application/json" if name.endswith(".json") else "text/html"
+        self.send_header("Content-Type", f"{ctype}; charset=utf-8")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        if self.server.etag:
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", self.server.last_modified)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=0, corpus_dir=CORPUS_DIR, etag=True):
+    """Starts the corpus server on a daemon thread. Returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), CorpusHandler)
+    server.daemon_threads = True
+    server.manifest, server.pages = load_corpus(corpus_dir)
+    server.hits = 0
+    server.not_modified = 0
+    server.etag = etag
+    server.last_modified = formatdate(usegmt=True)
+    threading.Thread(target=server.serve_forever, name="corpus-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the benchmark corpus on localhost")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--no-etag", action="store_true", help="don't send validators or 304s")
+    args = parser.parse_args()
+    server, base_url = start_server(args.port, etag=not args.no_etag)
+    print(f"Serving {CORPUS_DIR} at {base_url}")
+    print(f"  target: {base_url}/products/acme-phone-i1001.html")
+    print(f"  store:  {base_url}/shop/acme/")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
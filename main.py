@@ -1,10 +1,11 @@
 # main.py
 import os
 import sys
-from app.gui import create_gui
 
 # Ensure the app sees the local modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 if __name__ == "__main__":
+    # Headless servers: python -m app run --config jobs.toml
+    from app.gui import create_gui
     create_gui()
\ No newline at end of file
@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# The corpus server and its saved pages double as the HTTP stand-in for tests
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+
+class RecordingNotifier:
+    """Stands in for NotificationDispatcher; keeps every alert subject."""
+
+    def __init__(self):
+        self.subjects = []
+
+    def notify(self, subject, body, recipients=None):
+        self.subjects.append(subject)
+
+    def stop(self, timeout=None):
+        pass
+
+
+@pytest.fixture
+def notifier():
+    return RecordingNotifier()
+
+
+@pytest.fixture
+def seen(tmp_path):
+    from app.storage import SeenStore
+    store = SeenStore(str(tmp_path / "seen.db"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def smtp_server():
+    from smtp_server import LocalSMTPServer
+    server = LocalSMTPServer().start()
+    yield server
+    server.close()
+
+
+@pytest.fixture(scope="session")
+def corpus():
+    """The saved PDP and store pages (bench/corpus) on a local server: (server, base_url)."""
+    from corpus_server import start_server
+    server, base_url = start_server()
+    yield server, base_url
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,98 @@
+"""A minimal local SMTP server (EHLO, AUTH PLAIN, MAIL, RCPT, DATA) for dispatcher tests."""
+import socket
+import socketserver
+import threading
+from email import message_from_string
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            server.sockets.append(self.connection)
+        self.reply("220 localhost test SMTP")
+        mail_from, rcpts, data = None, [], None
+        while True:
+            try:
+                line = self.rfile.readline()
+            except OSError:
+                return
+            if not line:
+                return
+            if data is not None:
+                if line == b".\r\n":
+                    with server.lock:
+                        failing = server.fail_next > 0
+                        if failing:
+                            server.fail_next -= 1
+                        else:
+                            server.messages.append((mail_from, rcpts, message_from_string(b"".join(data).decode())))
+                    self.reply("451 try again later" if failing else "250 queued")
+                    mail_from, rcpts, data = None, [], None
+                else:
+                    data.append(line[1:] if line.startswith(b"..") else line)
+                continue
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb == "EHLO":
+                self.reply("250-localhost")
+                self.reply("250 AUTH PLAIN")
+            elif verb == "HELO":
+                self.reply("250 localhost")
+            elif verb == "AUTH":
+                self.reply("235 authenticated")
+            elif verb == "MAIL":
+                mail_from = command.split(":", 1)[1].strip().strip("<>")
+                self.reply("250 ok")
+            elif verb == "RCPT":
+                rcpts.append(command.split(":", 1)[1].strip().strip("<>"))
+                self.reply("250 ok")
+            elif verb == "DATA":
+                data = []
+                self.reply("354 end with .")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.sockets = []
+        self.messages = []      # (mail_from, rcpts, email.message.Message)
+        self.fail_next = 0      # answer this many DATA commands with 451
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def drop_connections(self):
+        """Closes every open session from the server side, as an idle timeout would."""
+        with self.lock:
+            sockets, self.sockets = self.sockets, []
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def email_config(self, recipients=("you@example.com",)):
+        host, port = self.server_address[:2]
+        return {"SENDER_EMAIL": "monitor@example.com", "SENDER_PASSWORD": "secret",
+                "RECIPIENT_EMAILS": list(recipients), "SMTP_SERVER": host, "SMTP_PORT": port}
+
+    def close(self):
+        self.shutdown()
+        self.drop_connections()
+        self.server_close()
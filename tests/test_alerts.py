@@ -0,0 +1,27 @@
+import threading
+
+from app.alerts import AlertPolicy
+
+
+def test_concurrent_cooldown_suppressions_are_all_counted():
+    policy = AlertPolicy(cooldown=3600, max_per_hour=0)
+    record = {"alerts": [1_000_000]}
+    per_thread = 2000
+
+    def check():
+        for _ in range(per_thread):
+            policy.check(record, True, False, now=1_000_060)
+
+    threads = [threading.Thread(target=check) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert policy.suppressed == 8 * per_thread
+
+
+def test_hourly_cap():
+    policy = AlertPolicy(cooldown=0, max_per_hour=2)
+    verdicts = [policy.check(None, None, False, now=1_000_000 + n)[1] for n in range(3)]
+    assert verdicts == ["new", "new", "hourly alert cap"]
+    assert policy.check(None, None, False, now=1_000_000 + 3600)[0]
@@ -0,0 +1,36 @@
+from app.archive import SnapshotArchive, read_snapshots
+
+
+def page(n, size):
+    return f"<html>{n}</html>".ljust(size, " ")
+
+
+def test_queue_is_capped_by_bytes(tmp_path):
+    # Not started, so nothing is taken off the queue
+    archive = SnapshotArchive(str(tmp_path), queue_mb=1)
+    for n in range(10):
+        archive.record("target", f"https://example.com/products/x-i{n}.html", True, page=page(n, 300 * 1024))
+    # Three 300 KB pages fit in 1 MB; the rest are dropped
+    assert archive.dropped == 7
+    assert archive._queued_bytes == 3 * 300 * 1024
+
+
+def test_oversized_page_is_kept_when_queue_is_empty(tmp_path):
+    archive = SnapshotArchive(str(tmp_path), queue_mb=1)
+    archive.record("target", "https://example.com/products/x-i1.html", True, page=page(1, 2 * 1024 * 1024))
+    archive.record("target", "https://example.com/products/x-i2.html", True, page=page(2, 1024))
+    assert archive.dropped == 1
+
+
+def test_written_snapshots_read_back(tmp_path):
+    archive = SnapshotArchive(str(tmp_path), queue_mb=1).start()
+    for n in range(5):
+        archive.record("target", f"https://example.com/products/x-i{n}.html", n % 2 == 0, page=page(n, 1024))
+    # Identical to the last snapshot of that URL: skipped
+    archive.record("target", "https://example.com/products/x-i0.html", True, page=page(0, 1024))
+    archive.close()
+
+    snapshots = list(read_snapshots(str(tmp_path)))
+    assert [s["verdict"] for s in snapshots] == [True, False, True, False, True]
+    assert archive.written == 5 and archive.dropped == 0
+    assert archive._queued_bytes == 0
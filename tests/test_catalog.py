@@ -0,0 +1,154 @@
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from app.alerts import AlertPolicy
+from app.catalog import CatalogSource, CatalogUnavailable, parse_catalog
+from app.crawler import StoreCrawler
+from app.http_client import HttpClient, HttpResponse
+from app.monitor import run_monitor
+from app.scanner import HostLimiter
+from app.scheduler import RequestBudget
+
+
+class RefusingClient:
+    """An HttpClient whose every request is refused, like a blocked catalog."""
+
+    def get(self, url, headers=None, conditional=False):
+        return HttpResponse(url, 403, {}, b"")
+
+    def forget(self, url):
+        pass
+
+
+class FailingDriver:
+    def __init__(self):
+        self.navigations = 0
+
+    def get(self, url):
+        self.navigations += 1
+        raise RuntimeError("net::ERR_CONNECTION_RESET")
+
+
+class OneDriverPool:
+    def __init__(self, driver):
+        self.driver = driver
+
+    @contextmanager
+    def lease(self, timeout=None):
+        yield self.driver
+
+
+def test_failed_store_pass_waits_before_retrying(seen, notifier):
+    driver = FailingDriver()
+    services = SimpleNamespace(seen=seen, http_client=RefusingClient(), pool=OneDriverPool(driver), notifier=notifier,
+                               alert_policy=AlertPolicy(), archive=None, page_cache=None,
+                               host_limiter=HostLimiter(), request_budget=RequestBudget())
+    stop_event = threading.Event()
+    job = threading.Thread(target=run_monitor, args=(stop_event, "store", [], "https://www.lazada.com.ph/shop/acme/",
+                                                     ["pokemon"], {}, None), kwargs={"services": services})
+    job.start()
+    stop_event.wait(1.0)
+    stop_event.set()
+    job.join(5)
+    assert not job.is_alive()
+    assert driver.navigations == 1
+
+
+# What an anti-bot interstitial returns in place of the catalog JSON
+CAPTCHA_PAYLOAD = b'{"rgv587_flag":"sm","url":"/_____tmd_____/punish?x5secdata=abc"}'
+
+
+class CaptchaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(CAPTCHA_PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(CAPTCHA_PAYLOAD)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def captcha_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CaptchaHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client():
+    client = HttpClient()
+    yield client
+    client.close()
+
+
+def fixture_items(corpus, name):
+    server, base_url = corpus
+    return parse_catalog(server.pages[name][0].decode("utf-8"), base_url)
+
+
+def test_crawl_walks_every_catalog_page(corpus, client):
+    server, base_url = corpus
+    crawler = StoreCrawler(f"{base_url}/shop/acme/", max_pages=10, known_run=1000)
+    cards, fresh, pages = crawler.crawl(CatalogSource(client).fetch_cards)
+
+    expected = [item.url for name in server.manifest["store_catalog"] for item in fixture_items(corpus, name)]
+    assert [card.url for card in cards] == expected
+    assert fresh == len(expected)
+    # The empty page past the last one ends the listing
+    assert pages == len(server.manifest["store_catalog"]) + 1
+
+
+def test_crawl_stops_after_a_known_page(corpus, client):
+    server, base_url = corpus
+    page1 = {item.url for item in fixture_items(corpus, server.manifest["store_catalog"][0])}
+    crawler = StoreCrawler(f"{base_url}/shop/acme/", max_pages=10, known_run=5, is_known=lambda card: card.url in page1)
+    cards, fresh, pages = crawler.crawl(CatalogSource(client).fetch_cards)
+    assert pages == 1
+    assert {card.url for card in cards} == page1
+    assert fresh == 0
+
+
+def test_captcha_payload_is_unavailable():
+    with pytest.raises(CatalogUnavailable, match="captcha"):
+        parse_catalog(CAPTCHA_PAYLOAD.decode(), "https://www.lazada.com.ph/shop/acme/")
+
+
+def test_captcha_response_fails_the_crawl(captcha_server, client):
+    _, base_url = captcha_server
+    with pytest.raises(CatalogUnavailable, match="captcha"):
+        StoreCrawler(f"{base_url}/shop/acme/").crawl(CatalogSource(client).fetch_cards)
+
+
+def test_not_modified_reuses_parsed_cards(corpus, client):
+    server, base_url = corpus
+    source = CatalogSource(client)
+    listing = f"{base_url}/shop/acme/"
+    first = source.fetch_cards(listing)
+    not_modified = server.not_modified
+    second = source.fetch_cards(listing)
+    assert server.not_modified == not_modified + 1
+    assert second is first
+    assert len(first) == len(fixture_items(corpus, server.manifest["store_catalog"][0]))
+
+
+def test_not_modified_without_cached_cards_refetches(corpus, client):
+    server, base_url = corpus
+    listing = f"{base_url}/shop/acme/"
+    CatalogSource(client).fetch_cards(listing)
+    # A fresh source has no parsed cards for the ETag the client still holds
+    hits = server.hits
+    cards = CatalogSource(client).fetch_cards(listing)
+    assert server.hits == hits + 2
+    assert len(cards) == len(fixture_items(corpus, server.manifest["store_catalog"][0]))
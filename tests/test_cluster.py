@@ -0,0 +1,139 @@
+import os
+import signal
+import subprocess
+import time
+from collections import Counter
+
+import pytest
+
+import app.storage
+from app.alerts import AlertPolicy
+from app.cluster import Coordinator, CoordinatorClient, LocalWorkers, owner_of
+from app.jobs import MonitorJob
+
+TARGETS = [f"https://shop.example/products/item-i{n}.html" for n in range(20)]
+
+
+class AlertCounter:
+    """Stands in for the coordinator's email dispatcher; counts alerts per item."""
+
+    def __init__(self):
+        self.sent = Counter()
+
+    def notify(self, subject, body, recipients=None):
+        self.sent[subject.split(" @ ")[0]] += 1
+
+    def stop(self, timeout=None):
+        pass
+
+
+@pytest.fixture
+def make_coordinator(tmp_path, monkeypatch):
+    # The coordinator opens the seen store through load_seen(); keep it in tmp_path
+    monkeypatch.setattr(app.storage, "SEEN_DB", str(tmp_path / "seen.db"))
+    monkeypatch.setattr(app.storage, "SEEN_FILE", str(tmp_path / "none.json"))
+    made = []
+
+    def make(jobs, **kwargs):
+        coordinator = Coordinator(jobs, {}, metrics_log_interval=0, **kwargs)
+        coordinator.services.notifier.stop()
+        coordinator.services.notifier, coordinator.services.alert_policy = AlertCounter(), AlertPolicy(max_per_hour=0)
+        made.append(coordinator)
+        return coordinator
+
+    yield make
+    for coordinator in made:
+        if not coordinator._stop.is_set():
+            coordinator.close()
+
+
+def connect(coordinator):
+    client = CoordinatorClient(address=coordinator.address, authkey=coordinator.authkey)
+    client.connect()
+    return client.coordinator()
+
+
+def test_rendezvous_assignment_moves_only_the_lost_share(make_coordinator):
+    coordinator = make_coordinator([MonitorJob("t", "target", target_urls=TARGETS)])
+    for worker in ("w1", "w2", "w3"):
+        coordinator.join(worker)
+    before = dict(coordinator._assignment)
+    assert set(before.values()) == {"w1", "w2", "w3"}
+    assert all(owner == owner_of(unit, ["w1", "w2", "w3"]) for unit, owner in before.items())
+
+    coordinator.drop_worker("w2", "test")
+    after = coordinator._assignment
+    assert set(after.values()) <= {"w1", "w3"}
+    assert all(after[unit] == owner for unit, owner in before.items() if owner != "w2")
+
+
+def test_stale_and_duplicate_reports_are_dropped(make_coordinator):
+    coordinator = make_coordinator([MonitorJob("t", "target", target_urls=TARGETS[:1])])
+    coordinator.join("w1")
+    coordinator.join("w2")
+    url = TARGETS[0]
+    owner = coordinator._assignment[("t", url)]
+    other = "w1" if owner == "w2" else "w2"
+
+    assert coordinator.report_target(other, "t", url, True, 10.0) == (False, None)
+    coordinator.report_target(owner, "t", url, False, 10.0)
+    # Older than the recorded check: dropped, so it can't fake a restock
+    assert coordinator.report_target(owner, "t", url, True, 9.0) == (False, None)
+    assert not coordinator.services.notifier.sent
+    assert coordinator.report_target(owner, "t", url, True, 11.0)[0] is True
+    assert sum(coordinator.services.notifier.sent.values()) == 1
+
+
+def test_coordinators_in_one_process_keep_their_own_registry(make_coordinator):
+    first = make_coordinator([]).start()
+    second = make_coordinator([]).start()
+    connect(first).join("a")
+    connect(second).join("b")
+    assert first.workers() == ["a"]
+    assert second.workers() == ["b"]
+
+
+def test_close_stops_serving(make_coordinator):
+    coordinator = make_coordinator([]).start()
+    proxy = connect(coordinator)
+    proxy.join("w1")
+    coordinator.close()
+    assert not any(thread.is_alive() for thread in coordinator._threads)
+    with pytest.raises((OSError, EOFError)):
+        proxy.poll("w1")
+    with pytest.raises(OSError):
+        connect(coordinator)
+
+
+def test_local_workers_alert_once_per_item_through_a_takeover(corpus, make_coordinator):
+    server, base_url = corpus
+    pdp = server.manifest["pdp"]
+    # Skip the script-only shell page: it would need a browser
+    ids = [i for i in range(2000, 2030) if pdp[i % len(pdp)] != "pdp_shell.html"]
+    in_stock = {i for i in ids if pdp[i % len(pdp)] == "pdp_in_stock.html"}
+    job = MonitorJob("t", "target", target_urls=[f"{base_url}/products/item-i{i}.html" for i in ids], interval=1)
+    coordinator = make_coordinator([job], worker_timeout=5).start()
+    alerts = coordinator.services.notifier.sent
+    local = LocalWorkers(coordinator, 2, stdout=subprocess.DEVNULL).start()
+
+    def run_until(done, timeout=40):
+        deadline = time.monotonic() + timeout
+        while not done() and time.monotonic() < deadline:
+            local.check()
+            time.sleep(0.2)
+        return done()
+
+    try:
+        assert run_until(lambda: len(coordinator.workers()) == 2 and len(alerts) == len(in_stock))
+        victim, pid = sorted(local.pids().items())[0]
+        os.kill(pid, signal.SIGKILL)
+        assert run_until(lambda: victim not in coordinator.workers())
+        survivor = coordinator.workers()[0]
+        # Every unit, including the dead worker's, is checked again by the survivor
+        checked = coordinator._last_checked.copy()
+        assert run_until(lambda: all(coordinator._last_checked.get(key, 0) > checked.get(key, 0) for key in checked))
+        assert set(coordinator._assignment.values()) == {survivor}
+    finally:
+        local.stop()
+    assert len(alerts) == len(in_stock)
+    assert set(alerts.values()) == {1}
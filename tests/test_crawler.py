@@ -0,0 +1,47 @@
+from app.crawler import StoreCrawler, listing_page_url
+from app.dom import Card
+
+STORE = "https://www.lazada.com.ph/shop/acme/"
+
+
+def card(n):
+    return Card(f"Item {n}", f"Item {n}", f"https://www.lazada.com.ph/products/item-i{n}.html", str(n), False)
+
+
+def fetcher(pages):
+    fetched = []
+
+    def fetch_cards(url):
+        fetched.append(url)
+        for page, cards in enumerate(pages, 1):
+            if url == listing_page_url(STORE, page):
+                return cards
+        return []
+    return fetch_cards, fetched
+
+
+def test_new_card_below_known_run_is_returned():
+    pages = [[card(n) for n in range(1, 41)], [card(n) for n in range(41, 81)]]
+    crawler = StoreCrawler(STORE, max_pages=5, known_run=8)
+    crawler.crawl(fetcher(pages)[0])
+
+    pages[0][20] = card(999)
+    fetch_cards, fetched = fetcher(pages)
+    cards, fresh, walked = crawler.crawl(fetch_cards)
+    assert fresh == 1 and len(cards) == 40 and card(999) in cards
+    # The known run on page 1 still skips page 2
+    assert walked == 1 and fetched == [listing_page_url(STORE, 1)]
+
+
+def test_known_cards_from_seen_store_survive_restart():
+    pages = [[card(n) for n in range(1, 41)], [card(n) for n in range(41, 81)]]
+    recorded = {c.item_id for page in pages for c in page}
+    crawler = StoreCrawler(STORE, known_run=8, is_known=lambda c: c.item_id in recorded)
+    cards, fresh, walked = crawler.crawl(fetcher(pages)[0])
+    assert (len(cards), fresh, walked) == (40, 0, 1)
+
+
+def test_first_pass_walks_until_repeat_or_empty():
+    pages = [[card(n) for n in range(1, 11)], [card(n) for n in range(11, 21)], [card(n) for n in range(11, 21)]]
+    cards, fresh, walked = StoreCrawler(STORE, max_pages=5).crawl(fetcher(pages)[0])
+    assert (len(cards), fresh, walked) == (20, 20, 3)
@@ -0,0 +1,69 @@
+import pytest
+
+pytest.importorskip("selenium")
+from selenium import webdriver
+from selenium.common.exceptions import SessionNotCreatedException, WebDriverException
+
+import app.driver
+from app.driver import DriverPool, setup_driver
+
+
+class FakeChrome:
+    def __init__(self, service=None, options=None):
+        self.service = service
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+    def set_script_timeout(self, seconds):
+        pass
+
+    def execute_cdp_cmd(self, cmd, params):
+        pass
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    calls = []
+    monkeypatch.setattr(app.driver, "resolve_driver_path", lambda refresh=False: calls.append(refresh) or "/bin/true")
+    return calls
+
+
+def chrome_failing_with(monkeypatch, error):
+    attempts = []
+    def chrome(service=None, options=None):
+        attempts.append(service)
+        if len(attempts) == 1:
+            raise error
+        return FakeChrome(service, options)
+    monkeypatch.setattr(webdriver, "Chrome", chrome)
+    return attempts
+
+
+def test_version_mismatch_refreshes_driver(monkeypatch, lookups):
+    chrome_failing_with(monkeypatch, SessionNotCreatedException(
+        "session not created: This version of ChromeDriver only supports Chrome version 114"))
+    assert isinstance(setup_driver(headless=True), FakeChrome)
+    assert lookups == [False, True]
+
+
+def test_other_start_failures_do_not_look_up_driver(monkeypatch, lookups):
+    attempts = chrome_failing_with(monkeypatch, WebDriverException("Chrome failed to start: crashed"))
+    logs = []
+    assert setup_driver(headless=True, log_callback=lambda m, c=None: logs.append(m)) is None
+    assert lookups == [False] and len(attempts) == 1
+    assert "Failed to initialize WebDriver" in logs[0]
+
+
+def test_pool_waits_before_starting_chrome_again(monkeypatch):
+    starts = []
+    monkeypatch.setattr(app.driver, "setup_driver", lambda **kwargs: starts.append(1))
+    pool = DriverPool(size=2, start_cooldown=60)
+    assert pool.acquire(timeout=1) is None
+    assert pool.acquire(timeout=1) is None
+    assert len(starts) == 1
+    assert pool.stats()["live"] == 0 and pool.stats()["in_use"] == 0
+
+    pool._start_retry_at = 0.0
+    assert pool.acquire(timeout=1) is None
+    assert len(starts) == 2
@@ -0,0 +1,84 @@
+import time
+
+from app.email_service import NotificationDispatcher
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def dispatcher(server, **kwargs):
+    kwargs.setdefault("coalesce_window", 0.2)
+    return NotificationDispatcher(server.email_config(), **kwargs).start()
+
+
+def test_alerts_within_window_go_out_as_one_digest(smtp_server):
+    d = dispatcher(smtp_server)
+    for i in range(3):
+        d.notify(f"AVAILABLE: item {i}", f"body {i}")
+    assert wait_for(lambda: d.sent == 1)
+    d.stop()
+
+    assert len(smtp_server.messages) == 1
+    mail_from, rcpts, msg = smtp_server.messages[0]
+    assert (mail_from, rcpts) == ("monitor@example.com", ["you@example.com"])
+    assert msg["Subject"] == "3 alerts: AVAILABLE: item 0 (+2 more)"
+    assert all(f"body {i}" in msg.get_payload() for i in range(3))
+
+
+def test_recipient_overrides_get_their_own_message(smtp_server):
+    d = dispatcher(smtp_server)
+    d.notify("a", "a")
+    d.notify("b", "b", recipients=["collector@example.com"])
+    assert wait_for(lambda: d.sent == 2)
+    d.stop()
+    assert sorted(rcpts for _, rcpts, _ in smtp_server.messages) == [["collector@example.com"], ["you@example.com"]]
+
+
+def test_session_is_reused_and_reopened_after_a_drop(smtp_server):
+    d = dispatcher(smtp_server, coalesce_window=0.05)
+    d.notify("first", "1")
+    assert wait_for(lambda: d.sent == 1)
+    d.notify("second", "2")
+    assert wait_for(lambda: d.sent == 2)
+    assert smtp_server.connections == 1
+
+    smtp_server.drop_connections()
+    d.notify("third", "3")
+    assert wait_for(lambda: d.sent == 3)
+    d.stop()
+    assert smtp_server.connections == 2 and d.failed == 0
+    assert [msg["Subject"] for _, _, msg in smtp_server.messages] == ["first", "second", "third"]
+
+
+def test_failed_sends_are_retried(smtp_server):
+    smtp_server.fail_next = 2
+    d = dispatcher(smtp_server, retry_backoff=0.01)
+    d.notify("retry me", "x")
+    assert wait_for(lambda: d.sent == 1)
+    d.stop()
+    assert d.failed == 0 and len(smtp_server.messages) == 1
+
+
+def test_gives_up_after_max_retries(smtp_server):
+    smtp_server.fail_next = 10
+    d = dispatcher(smtp_server, retry_backoff=0.01, max_retries=2)
+    d.notify("lost", "x")
+    assert wait_for(lambda: d.failed == 1)
+    d.stop()
+    assert d.sent == 0 and smtp_server.messages == []
+
+
+def test_stop_sends_what_is_still_queued(smtp_server):
+    d = dispatcher(smtp_server, coalesce_window=30)
+    d.notify("queued 1", "1")
+    d.notify("queued 2", "2")
+    started = time.monotonic()
+    d.stop()
+    assert time.monotonic() - started < 5
+    assert d.sent == 1 and smtp_server.messages[0][2]["Subject"] == "2 alerts: queued 1 (+1 more)"
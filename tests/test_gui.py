@@ -0,0 +1,35 @@
+import logging
+
+import pytest
+
+gui = pytest.importorskip("app.gui")
+from app import logs
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_import_starts_no_file_logger():
+    assert gui.FILE_LOG is None
+    assert logs._listener is None
+
+
+def test_alarm_bell_stays_out_of_the_file_log(monkeypatch):
+    logger = logging.getLogger("lazwatch.test_gui")
+    logger.setLevel(logging.INFO)
+    handler = ListHandler()
+    logger.addHandler(handler)
+    monkeypatch.setattr(gui, "FILE_LOG", logger)
+    try:
+        gui.log_to_gui("!!! READY TO BUY !!! Pokemon Box", "green")
+        gui.log_to_gui("\a", "yellow")
+        gui.log_to_gui("\nChecking store URL (Fast Scan)...", "blue")
+    finally:
+        logger.removeHandler(handler)
+    assert handler.messages == ["!!! READY TO BUY !!! Pokemon Box", "Checking store URL (Fast Scan)..."]
@@ -0,0 +1,54 @@
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.http_client import HttpClient
+
+PAGE = "<html><body>Pokémon Box — in stock</body></html>".encode("utf-8")
+
+
+def raw_deflate(body):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(body) + compressor.flush()
+
+
+BODIES = {"/zlib": zlib.compress(PAGE), "/raw": raw_deflate(PAGE)}
+
+
+class DeflateHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = BODIES[self.path]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Encoding", "deflate")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def deflate_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DeflateHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("path", sorted(BODIES))
+def test_deflate_bodies_are_decoded(deflate_server, path):
+    client = HttpClient()
+    try:
+        resp = client.get(deflate_server + path)
+    finally:
+        client.close()
+    assert resp.status == 200
+    assert resp.body == PAGE
@@ -0,0 +1,37 @@
+import random
+import string
+
+import pytest
+
+from app.matcher import KeywordMatcher
+
+rng = random.Random(11)
+WORDS = ["pokemon", "box", "ps5", "ps5x", "case", "iphone", "15", "pro", "max", "lego", "set"]
+
+
+def random_card():
+    words = [rng.choice(WORDS + ["".join(rng.choice(string.ascii_lowercase) for _ in range(4))]) for _ in range(12)]
+    glue = [rng.choice([" ", "  ", "\n", "-", ""]) for _ in words]
+    return "".join(w.upper() if rng.random() < 0.2 else w for pair in zip(words, glue) for w in pair) + "\n₱1,299.00"
+
+
+@pytest.mark.parametrize("word_boundary", [False, True])
+@pytest.mark.parametrize("keywords", [
+    ["pokemon"],
+    ["ps5", "-case"],
+    ["pokemon box", "iphone 15 pro", "lego", "-ps5x"],
+])
+def test_plain_scan_matches_automaton(keywords, word_boundary):
+    plain = KeywordMatcher(keywords, word_boundary=word_boundary)
+    automaton = KeywordMatcher(keywords, word_boundary=word_boundary, automaton_min=0)
+    assert not plain.use_automaton and automaton.use_automaton
+    for _ in range(500):
+        card = random_card()
+        assert plain.find(card) == automaton.find(card), card
+
+
+def test_find_reports_hits_and_honours_negatives():
+    matcher = KeywordMatcher(["Pokemon", "iPhone 15", "-case"], word_boundary=True)
+    assert matcher.find("POKEMON Scarlet\niPhone  15 bundle") == ["Pokemon", "iPhone 15"]
+    assert matcher.find("Pokemon phone case") == []
+    assert matcher.find("Pokemonz plush") == []
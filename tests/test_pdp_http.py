@@ -0,0 +1,140 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.dom import CLASSIFY_AVAILABILITY_JS
+from app.http_client import HttpClient
+from app.monitor import check_product_availability_lazada
+from app.pdp import check_product_availability_http, parse_availability
+
+# What each saved page says, as the fast path should read it
+FIXTURE_VERDICTS = {
+    "pdp_in_stock.html": True,
+    "pdp_sold_out.html": False,
+    "pdp_sold_out_flag.html": False,
+    "pdp_shell.html": None,     # script-only shell: no state in the HTML, needs the browser
+}
+
+
+def pdp_url(corpus, name):
+    server, base_url = corpus
+    item_id = next(i for i in range(1000, 1100) if server.manifest["pdp"][i % len(server.manifest["pdp"])] == name)
+    return f"{base_url}/products/item-i{item_id}.html"
+
+
+def count_connections(server):
+    counts = []
+    process_request = server.process_request
+    def counting(request, client_address):
+        counts.append(client_address)
+        return process_request(request, client_address)
+    server.process_request = counting
+    return counts
+
+
+@pytest.mark.parametrize("name,verdict", sorted(FIXTURE_VERDICTS.items()))
+def test_fixture_verdicts_over_http(corpus, name, verdict):
+    client = HttpClient()
+    try:
+        assert check_product_availability_http(pdp_url(corpus, name), client) is verdict
+    finally:
+        client.close()
+
+
+def test_fixture_verdicts_match_direct_parse(corpus):
+    server, _ = corpus
+    for name, verdict in FIXTURE_VERDICTS.items():
+        assert parse_availability(server.pages[name][0].decode("utf-8")) is verdict
+
+
+def test_stock_zero_url_needs_no_fetch(corpus):
+    server, base_url = corpus
+    hits = server.hits
+    assert check_product_availability_http(f"{base_url}/products/item-i1001.html?stock=0", HttpClient()) is False
+    assert server.hits == hits
+
+
+class FakeDriver:
+    """Just enough WebDriver for the browser fallback: the page source and a buy button."""
+
+    def __init__(self, page_source, button=(True, {"tag": "button", "label": "add to cart"})):
+        self.page_source = page_source
+        self.button = button
+        self.visited = []
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def execute_script(self, script, *args):
+        return list(self.button) if script == CLASSIFY_AVAILABILITY_JS else True
+
+
+def test_inconclusive_page_falls_back_to_browser(corpus):
+    server, _ = corpus
+    url = pdp_url(corpus, "pdp_shell.html")
+    client = HttpClient()
+    try:
+        driver = FakeDriver(server.pages["pdp_shell.html"][0].decode("utf-8"))
+        assert check_product_availability_lazada(url, driver, http_client=client) is True
+        assert driver.visited == [url]
+
+        # A conclusive page never reaches the browser
+        driver = FakeDriver("")
+        assert check_product_availability_lazada(pdp_url(corpus, "pdp_sold_out.html"), driver, http_client=client) is False
+        assert driver.visited == []
+    finally:
+        client.close()
+
+
+def test_keep_alive_connection_is_reused(corpus):
+    server, base_url = corpus
+    client = HttpClient()
+    connections = count_connections(server)
+    try:
+        for name in ("pdp_in_stock.html", "pdp_sold_out.html", "pdp_sold_out_flag.html"):
+            assert client.get(pdp_url(corpus, name)).status == 200
+    finally:
+        del server.process_request
+        client.close()
+    assert len(connections) == 1
+
+
+class ClosingHandler(BaseHTTPRequestHandler):
+    """Answers as keep-alive but drops the connection after every response, like an idle timeout."""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'<script>var __moduleData__ = {"data":{"root":{"fields":{"skuInfos":{"0":{"stock":3}}}}}};</script>'
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def closing_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ClosingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_stale_pooled_connection_is_retried(closing_server):
+    server, base_url = closing_server
+    connections = count_connections(server)
+    client = HttpClient()
+    try:
+        for _ in range(3):
+            assert check_product_availability_http(f"{base_url}/products/x-i1.html", client) is True
+    finally:
+        client.close()
+    # Each request after the first finds its pooled connection closed and retries on a new one
+    assert len(connections) == 3
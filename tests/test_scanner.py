@@ -0,0 +1,42 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.scanner import HostLimiter, scan_targets
+
+
+def test_host_spacing_holds_across_batches():
+    limiter = HostLimiter(per_host=4, delay=0.2)
+    starts, threads = [], set()
+
+    def check(url):
+        starts.append(time.monotonic())
+        threads.add(threading.current_thread().name)
+        return True
+
+    with ThreadPoolExecutor(4, thread_name_prefix="target") as executor:
+        for batch in range(3):
+            scan_targets([f"https://shop.example/p{batch}-{n}" for n in range(2)], check, lambda url, verdict: None,
+                         threading.Event(), limiter=limiter, executor=executor)
+    starts.sort()
+    assert len(starts) == 6
+    # Back-to-back batches on one host are still spaced out
+    assert all(b - a >= 0.19 for a, b in zip(starts, starts[1:]))
+    assert len(threads) <= 4
+
+
+def test_stop_cancels_queued_checks_on_shared_executor():
+    stop_event = threading.Event()
+    checked = []
+
+    def check(url):
+        checked.append(url)
+        stop_event.set()
+        return True
+
+    with ThreadPoolExecutor(1) as executor:
+        scan_targets([f"https://shop.example/p{n}" for n in range(5)], check, lambda url, verdict: None,
+                     stop_event, limiter=HostLimiter(delay=0), executor=executor)
+        # The executor stays usable for the next run
+        assert executor.submit(lambda: 1).result() == 1
+    assert len(checked) == 1
@@ -0,0 +1,30 @@
+import pytest
+
+from app.scheduler import RequestBudget, TargetScheduler
+
+URLS = [f"https://shop.example/products/p-i{n}.html" for n in range(10)]
+
+
+def test_budget_caps_checks_per_minute():
+    scheduler = TargetScheduler(URLS, lambda url: None, budget_per_minute=4)
+    assert len(scheduler.pop_due()) == 4
+    assert scheduler.pop_due() == []
+    # The next token is about 15s away
+    assert 14 < scheduler.next_wake() <= 15
+
+
+@pytest.mark.parametrize("budget", [0, -1])
+def test_zero_budget_is_unlimited(budget):
+    scheduler = TargetScheduler(URLS, lambda url: None, budget_per_minute=budget)
+    assert sorted(scheduler.pop_due()) == sorted(URLS)
+    for url in URLS:
+        scheduler.record(url, False)
+    assert scheduler.next_wake() > 0
+
+
+def test_jobs_sharing_a_budget_share_the_cap():
+    budget = RequestBudget(6)
+    first = TargetScheduler(URLS, lambda url: None, budget=budget)
+    second = TargetScheduler(URLS, lambda url: None, budget=budget)
+    assert len(first.pop_due()) + len(second.pop_due()) == 6
+    assert second.next_wake() > 9
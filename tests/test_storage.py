@@ -0,0 +1,84 @@
+import sqlite3
+import time
+
+from app.alerts import AlertPolicy
+from app.dom import Card
+from app.fingerprint import FingerprintCache
+from app.matcher import KeywordMatcher
+from app.monitor import process_store_cards, process_target_result, refresh_store_cards, target_identity
+from app.storage import SeenStore, TARGET_KEY_BIT, seen_key, target_key
+
+URL = "https://www.lazada.com.ph/products/pokemon-box-i123.html"
+
+
+def store_card(sold_out):
+    return Card("Pokemon Box\n₱1,299", "Pokemon Box", URL, "123", sold_out)
+
+
+def test_target_and_listing_keys_differ():
+    assert target_key(URL) == 123 | TARGET_KEY_BIT
+    assert seen_key(URL, "Pokemon Box") == 123
+    assert target_identity(URL)[0] == target_key(URL)
+    assert target_key("https://example.com/x") != seen_key("https://example.com/x")
+
+
+def test_store_pass_does_not_mask_target_restock(seen, notifier):
+    policy = AlertPolicy(max_per_hour=0)
+    process_target_result(URL, False, seen, policy, notifier)
+    process_store_cards([store_card(False)], KeywordMatcher(["pokemon"]), seen, policy, notifier)
+    notifier.subjects.clear()
+
+    assert process_target_result(URL, True, seen, policy, notifier)
+    assert [s for s in notifier.subjects if s.startswith("AVAILABLE")]
+
+
+def test_existing_target_still_raises_new_listing(seen, notifier):
+    policy = AlertPolicy(max_per_hour=0)
+    process_target_result(URL, False, seen, policy, notifier)
+
+    assert process_store_cards([store_card(False)], KeywordMatcher(["pokemon"]), seen, policy, notifier) == 1
+    assert notifier.subjects[-1] == "NEW LISTING: Pokemon Box"
+
+
+def test_legacy_target_rows_map_to_target_keys(seen):
+    assert seen.import_legacy("target_123", {"url": URL, "sold_out": True}) == target_key(URL)
+    assert seen.import_legacy("target_456", {"url": "", "sold_out": True}) == 456 | TARGET_KEY_BIT
+    assert seen.import_legacy("pokemon box", {"url": URL, "title": "Pokemon Box", "sold_out": False}) == 123
+
+
+def test_target_rows_under_bare_ids_are_rekeyed(tmp_path):
+    path = str(tmp_path / "seen.db")
+    SeenStore(path).close()
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("PRAGMA user_version = 0")
+        conn.execute("INSERT INTO items VALUES (123, '[TARGET] Product ID 123', ?, 1, 1, 1, NULL, NULL)", (URL,))
+        conn.execute("INSERT INTO items VALUES (124, 'Pokemon Box', ?, 1, 1, 0, NULL, NULL)", (URL,))
+    conn.close()
+
+    store = SeenStore(path, retention_days=0)
+    try:
+        assert target_key(URL) in store and store[target_key(URL)]["sold_out"] is True
+        assert 123 not in store and 124 in store
+    finally:
+        store.close()
+
+
+def test_quiet_store_listings_are_not_evicted(seen, notifier, monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    policy = AlertPolicy(max_per_hour=0)
+    matcher = KeywordMatcher(["pokemon"])
+    assert process_store_cards([store_card(False)], matcher, seen, policy, notifier, item_prints=FingerprintCache()) == 1
+
+    # The grid stays the same for longer than the retention period: every pass takes the unchanged path
+    for _ in range(seen.retention_days // 10 + 2):
+        now[0] += 10 * 86400
+        refresh_store_cards([store_card(False)], seen)
+        seen.evict()
+    assert seen_key(URL, "Pokemon Box") in seen
+
+    # The grid finally changes: the long-listed item is not new
+    notifier.subjects.clear()
+    assert process_store_cards([store_card(False)], matcher, seen, policy, notifier, item_prints=FingerprintCache()) == 0
+    assert not notifier.subjects